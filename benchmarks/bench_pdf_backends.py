@@ -0,0 +1,94 @@
+"""
+bench_pdf_backends.py
+
+Compares the PDF text backends (`scripts/pdf_backends.py`) on real and synthetic statement PDFs: extraction
+speed in pages/sec, and how closely each backend's sections agree with pdfplumber's after clean_text and
+split_into_sections_regex. pdfplumber is the reference because the cleaning/splitting rules were written
+against its output.
+
+Agreement is reported as the number of sections found, the share of sections identical to pdfplumber's, and
+their mean text similarity (difflib ratio). The "auto" column shows which backend auto mode would pick.
+
+Usage (from the repository root):
+>>> python -m benchmarks.bench_pdf_backends --input-dir pdf_inputs --synthetic-pages 50 --repeat 3
+"""
+
+import argparse
+import contextlib
+import difflib
+import io
+import os
+import tempfile
+import time
+
+from benchmarks.synthetic_pdf import make_statement_pdf
+from scripts.pdf_backends import BACKENDS, DEFAULT_BACKEND
+from scripts.preprocess_data import choose_backend, clean_text, count_pages, extract_full_text, split_into_sections_regex
+
+
+def time_backend(pdf_path, backend, repeat):
+    """Returns (best seconds over `repeat` runs, extracted text)."""
+    best, text = float("inf"), ""
+    for _ in range(repeat):
+        start = time.perf_counter()
+        text = extract_full_text(pdf_path, backend=backend)
+        best = min(best, time.perf_counter() - start)
+    return best, text
+
+
+def sections_of(text):
+    with contextlib.redirect_stdout(io.StringIO()):  # Hide the section count warning; it's reported below
+        return split_into_sections_regex(clean_text(text))
+
+
+def agreement(sections, reference):
+    """(share of sections identical to the reference, mean similarity) for sections paired in order."""
+    if not reference:
+        return 0.0, 0.0
+    pairs = list(zip(sections, reference))
+    identical = sum(section == expected for section, expected in pairs) / len(reference)
+    similarity = sum(difflib.SequenceMatcher(None, section, expected).ratio() for section, expected in pairs) / len(reference)
+    return identical, similarity
+
+
+def compare(pdf_path, repeat):
+    """Prints one row per backend for a PDF."""
+    pages = count_pages(pdf_path)
+    results = {name: time_backend(pdf_path, name, repeat) for name in BACKENDS}
+    reference = sections_of(results[DEFAULT_BACKEND][1])
+    with contextlib.redirect_stdout(io.StringIO()):
+        auto_choice = choose_backend(pdf_path)
+
+    print(f"\n📄 {os.path.basename(pdf_path)} ({pages} pages, auto picks {auto_choice})")
+    print(f"   {'backend':<11} {'pages/sec':>10} {'speedup':>8} {'sections':>9} {'identical':>10} {'similarity':>11}")
+    for name, (seconds, text) in results.items():
+        sections = sections_of(text)
+        identical, similarity = agreement(sections, reference)
+        print(f"   {name:<11} {pages / seconds:10.1f} {results[DEFAULT_BACKEND][0] / seconds:7.1f}x "
+              f"{len(sections):9d} {identical:10.0%} {similarity:11.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare PDF text backends on speed and section agreement.")
+    parser.add_argument("--input-dir", default="pdf_inputs", help="Folder of real PDFs to compare on.")
+    parser.add_argument("--synthetic-pages", type=int, default=50,
+                        help="Also compare on a synthetic statement PDF of about this many pages (0 to skip).")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per backend; the fastest is reported.")
+    args = parser.parse_args()
+
+    pdf_paths = []
+    if os.path.isdir(args.input_dir):
+        pdf_paths = [os.path.join(args.input_dir, name) for name in sorted(os.listdir(args.input_dir))
+                     if name.endswith(".pdf")]
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        if args.synthetic_pages:
+            synthetic_path = os.path.join(work_dir, f"synthetic_{args.synthetic_pages}_pages.pdf")
+            make_statement_pdf(synthetic_path, pages=args.synthetic_pages)
+            pdf_paths.append(synthetic_path)
+        for pdf_path in pdf_paths:
+            compare(pdf_path, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
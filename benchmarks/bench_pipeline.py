@@ -0,0 +1,222 @@
+"""
+bench_pipeline.py
+
+End-to-end pipeline benchmark on synthetic FWC-style statement PDFs, with GenAI extraction and summary served
+by a local mock endpoint (`mock_genai_server.py`) with a configurable latency.
+
+Each PDF goes through extract_full_text, clean_text, split_into_sections_regex, process_and_save_tables,
+validate_csv_numbers, generate_summary_report and save_markdown_to_pdf. Every stage is measured with
+`scripts.tracing` (wall time, CPU time, peak RSS, bytes, tokens), optionally plus its Python allocation peak.
+
+Results are appended to `benchmarks/results/pipeline.jsonl` and compared with the previous run that used the
+same parameters, so per-stage time and memory regressions show up run to run.
+
+Usage (from the repository root):
+>>> python -m benchmarks.bench_pipeline --pdfs 3 --pages 20 --rows 10 --latency 0.2
+>>> python -m benchmarks.bench_pipeline --extraction-mode batched --tracemalloc --label "after batching"
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.mock_genai_server import MockGenAIServer
+from benchmarks.synthetic_pdf import make_statement_pdf
+from scripts.generate_tables import process_and_save_tables, EXTRACTION_MODES
+from scripts.genai_summary import build_summary_prompt, generate_summary_report, save_markdown_to_pdf, SUMMARY_MODES
+from scripts.preprocess_data import extract_full_text, clean_text, split_into_sections_regex
+from scripts.rate_limit import RateLimiter
+from scripts.response_cache import configure_cache
+from scripts.section_index import configure_section_index, reuse_stats
+from scripts.tracing import configure_tracing, read_spans, trace_stage
+from scripts.validate import validate_csv_numbers
+
+RESULTS_FILE = os.path.join("benchmarks", "results", "pipeline.jsonl")
+STAGES = ("extract", "clean", "split", "tables", "validate", "summary", "render")
+PARAMETERS = ("pdfs", "pages", "rows", "latency", "concurrency", "extraction_mode", "no_local_parser",
+              "stream_responses", "summary_mode", "section_reuse", "tracemalloc")
+
+
+def run_pdf(pdf_path, work_dir, args, limiter):
+    """
+    Runs every stage for one PDF, each inside a traced span.
+
+    Returns:
+        dict: stage -> Python allocation peak above what was already allocated, in MB (empty without --tracemalloc).
+    """
+    base_name = os.path.splitext(os.path.basename(pdf_path))[0]
+    data_dir = os.path.join(work_dir, "data", base_name)
+    os.makedirs(data_dir, exist_ok=True)
+    allocation_peaks = {}
+    state = {}
+
+    stage_functions = {
+        "extract": lambda: state.update(raw=extract_full_text(pdf_path)),
+        "clean": lambda: state.update(cleaned=clean_text(state["raw"])),
+        "split": lambda: state.update(sections=split_into_sections_regex(state["cleaned"])),
+        "tables": lambda: process_and_save_tables(state["sections"], data_dir, max_concurrency=args.concurrency,
+                                                  limiter=limiter, mode=args.extraction_mode,
+                                                  local_parser=not args.no_local_parser,
+                                                  stream=args.stream_responses),
+        "validate": lambda: validate_csv_numbers(data_dir, debug=False),
+        "summary": lambda: state.update(summary=generate_summary_report(
+            *build_summary_prompt(data_dir, args.summary_mode),
+            stream_to=os.path.join(work_dir, f"{base_name}_summary.md") if args.stream_responses else None).text),
+        "render": lambda: save_markdown_to_pdf(state["summary"], os.path.join(work_dir, f"{base_name}_summary.pdf")),
+    }
+
+    for stage in STAGES:
+        if args.tracemalloc:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        with trace_stage(pdf_path, stage), contextlib.redirect_stdout(io.StringIO()):
+            stage_functions[stage]()
+        if args.tracemalloc:
+            allocation_peaks[stage] = (tracemalloc.get_traced_memory()[1] - baseline) / (1024 * 1024)
+    return allocation_peaks
+
+
+def summarise(spans, allocation_peaks, pdf_count):
+    """Aggregates spans into per-stage means (wall/CPU seconds) and maxima (memory)."""
+    stages = {}
+    for stage in STAGES:
+        stage_spans = [span for span in spans if span["stage"] == stage]
+        if not stage_spans:
+            continue
+        stages[stage] = {
+            "wall_seconds": sum(span["wall_seconds"] for span in stage_spans) / pdf_count,
+            "cpu_seconds": sum(span["cpu_seconds"] for span in stage_spans) / pdf_count,
+            "peak_rss_growth_mb": max(span["peak_rss_growth_mb"] for span in stage_spans),
+            "llm_calls": sum(span["llm_calls"] for span in stage_spans) / pdf_count,
+            "prompt_tokens": sum(span["prompt_tokens"] for span in stage_spans) / pdf_count,
+            "local_tables": sum(span.get("local_tables", 0) for span in stage_spans) / pdf_count,
+        }
+        peaks = [peaks[stage] for peaks in allocation_peaks if stage in peaks]
+        if peaks:
+            stages[stage]["alloc_peak_mb"] = max(peaks)
+    return stages
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def previous_result(results_file, parameters):
+    """The most recent saved result with the same parameters, or None."""
+    if not os.path.exists(results_file):
+        return None
+    previous = None
+    with open(results_file, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                if record.get("parameters") == parameters:
+                    previous = record
+    return previous
+
+
+def _change(current, before):
+    if not before:
+        return ""
+    return f"{(current - before) / before:+.0%}"
+
+
+def print_result(record, previous):
+    """Prints per-stage timings and memory, with the change from the previous comparable run."""
+    print(f"\n📊 {record['parameters']['pdfs']} PDFs x {record['pages_per_pdf']} pages in {record['total_seconds']:.2f}s "
+          f"({record['pdfs_per_minute']:.1f} PDFs/min, {record['pages_per_second']:.1f} pages/sec)")
+    if previous:
+        print(f"   compared with {previous.get('label') or previous['commit'] or 'previous run'} "
+              f"({previous['timestamp']})")
+    print(f"   {'stage':<9} {'wall s':>8} {'Δ':>6} {'cpu s':>8} {'Δ':>6} {'rss+ MB':>8} {'alloc MB':>9} {'Δ':>6} {'calls':>6}")
+    for stage, stats in record["stages"].items():
+        before = (previous or {}).get("stages", {}).get(stage, {})
+        alloc = stats.get("alloc_peak_mb")
+        print(f"   {stage:<9} {stats['wall_seconds']:8.3f} {_change(stats['wall_seconds'], before.get('wall_seconds')):>6} "
+              f"{stats['cpu_seconds']:8.3f} {_change(stats['cpu_seconds'], before.get('cpu_seconds')):>6} "
+              f"{stats['peak_rss_growth_mb']:8.0f} {'' if alloc is None else f'{alloc:9.1f}':>9} "
+              f"{_change(alloc, before.get('alloc_peak_mb')) if alloc is not None else '':>6} {stats['llm_calls']:6.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the full pipeline on synthetic statement PDFs.")
+    parser.add_argument("--pdfs", type=int, default=3, help="Number of synthetic PDFs.")
+    parser.add_argument("--pages", type=int, default=20, help="Approximate pages per PDF.")
+    parser.add_argument("--rows", type=int, default=10, help="Line items per subtotal group.")
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds per mock GenAI request.")
+    parser.add_argument("--concurrency", type=int, default=4, help="GenAI requests in flight per PDF.")
+    parser.add_argument("--extraction-mode", default="per-section", choices=EXTRACTION_MODES)
+    parser.add_argument("--no-local-parser", action="store_true",
+                        help="Send every table to the mock GenAI endpoint instead of parsing well-formed ones locally.")
+    parser.add_argument("--summary-mode", default="full", choices=SUMMARY_MODES,
+                        help="Summary prompt: every table, compact metrics, or retrieved rows.")
+    parser.add_argument("--stream-responses", action="store_true",
+                        help="Stream GenAI replies (summary written to disk as it arrives, extraction checked per chunk).")
+    parser.add_argument("--section-reuse", action="store_true",
+                        help="Reuse extractions of near-duplicate sections across the synthetic PDFs.")
+    parser.add_argument("--tracemalloc", action="store_true",
+                        help="Also record each stage's Python allocation peak (slows the CPU stages down).")
+    parser.add_argument("--results", default=RESULTS_FILE, help="JSON lines file results are appended to.")
+    parser.add_argument("--label", default="", help="Free text label stored with the result.")
+    args = parser.parse_args()
+
+    configure_cache(enabled=False)  # Every run must actually hit the (mock) endpoint
+    limiter = RateLimiter(requests_per_minute=1_000_000, tokens_per_minute=1_000_000_000)
+    if args.tracemalloc:
+        tracemalloc.start()
+
+    with tempfile.TemporaryDirectory() as work_dir, MockGenAIServer(latency=args.latency) as server:
+        os.environ["GEMINI_BASE_URL"] = server.base_url
+        os.environ.setdefault("GEMINI_KEYS", "benchmark-key")
+        trace_file = os.path.join(work_dir, "trace.jsonl")
+        configure_tracing(trace_file)
+        # A fresh index per run, so only this run's PDFs can be reused
+        configure_section_index(enabled=args.section_reuse, path=os.path.join(work_dir, "section_index.sqlite"))
+
+        pdf_paths, pages = [], 0
+        for idx in range(args.pdfs):
+            pdf_path = os.path.join(work_dir, f"synthetic_{idx:03d}.pdf")
+            pages += make_statement_pdf(pdf_path, pages=args.pages, rows=args.rows, seed=idx)
+            pdf_paths.append(pdf_path)
+
+        start = time.perf_counter()
+        allocation_peaks = [run_pdf(pdf_path, work_dir, args, limiter) for pdf_path in pdf_paths]
+        total_seconds = time.perf_counter() - start
+        spans = read_spans(trace_file)
+        mock_requests = server.requests
+
+    record = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": _git_commit(),
+        "label": args.label,
+        "parameters": {name: getattr(args, name) for name in PARAMETERS},
+        "pages_per_pdf": pages / max(args.pdfs, 1),
+        "total_seconds": total_seconds,
+        "pdfs_per_minute": args.pdfs / total_seconds * 60,
+        "pages_per_second": pages / total_seconds,
+        "mock_requests": mock_requests,
+        "section_reuse": reuse_stats(),
+        "stages": summarise(spans, allocation_peaks, args.pdfs),
+    }
+
+    previous = previous_result(args.results, record["parameters"])
+    print_result(record, previous)
+
+    os.makedirs(os.path.dirname(args.results) or ".", exist_ok=True)
+    with open(args.results, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+    print(f"\n💾 Result appended to {args.results}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+bench_validate.py
+
+Measures validation throughput (rows/sec) over a synthetic `data/`-style tree made of copies of the sample
+statement CSVs, for the single-process directory validator and the parallel tree validator.
+
+Usage (from the repository root):
+>>> python -m benchmarks.bench_validate --companies 500 --workers 8
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import time
+
+from scripts.validate import validate_csv_numbers, validate_tree
+
+SAMPLE_DIR = os.path.join("data", "fwc_sample_financial_statement_1")
+
+
+def build_tree(root: str, companies: int):
+    """Copies the sample statement CSVs into `companies` per-company folders under `root`."""
+    for idx in range(companies):
+        company_dir = os.path.join(root, f"company_{idx:05d}")
+        os.makedirs(company_dir)
+        for name in os.listdir(SAMPLE_DIR):
+            if name.endswith(".csv"):
+                shutil.copy(os.path.join(SAMPLE_DIR, name), company_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark CSV validation throughput.")
+    parser.add_argument("--companies", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        build_tree(root, args.companies)
+
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):  # Per-file lines would dominate the timing
+            for company in sorted(os.listdir(root)):
+                validate_csv_numbers(os.path.join(root, company), debug=False)
+        serial = time.perf_counter() - start
+
+        start = time.perf_counter()
+        results = validate_tree(root, workers=args.workers)
+        parallel = time.perf_counter() - start
+
+    rows = sum(result.rows for result in results)
+    print(f"{len(results)} CSVs, {rows} rows")
+    print(f"  per-directory (1 process)     {serial:7.2f}s  {rows / serial:10.0f} rows/sec")
+    print(f"  validate_tree ({args.workers} workers)   {parallel:7.2f}s  {rows / parallel:10.0f} rows/sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+fake_genai.py
+
+A local stand-in for `google.genai.Client` so extraction throughput can be measured without network access
+or API quota.
+
+Classes:
+- FakeGenAIClient: Exposes `client.models.generate_content`, `client.models.generate_content_stream` and
+  `client.aio.models.generate_content` with a configurable latency, error rate and stall rate, and records call statistics.
+- FakeAPIError: Raised for simulated failures; carries an HTTP-style `code` like the real SDK errors.
+
+Usage:
+>>> from benchmarks.fake_genai import FakeGenAIClient
+>>> client = FakeGenAIClient(latency=0.5, error_rate=0.1)
+>>> process_and_save_tables(segmented_tables, output_dir, client=client)
+"""
+
+import asyncio
+import json
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+STALL_SECONDS = 3600  # How long a stalled stream hangs (abandoned streams are read in daemon threads)
+
+
+class FakeAPIError(Exception):
+    """Simulated API failure with an HTTP status code (429 by default)."""
+
+    def __init__(self, code: int = 429, message: str = "Resource exhausted (simulated)"):
+        super().__init__(f"{code} {message}")
+        self.code = code
+
+
+def _echo_table(section: str) -> dict:
+    lines = [line for line in section.splitlines() if line.strip()]
+    table_name = lines[0] if lines else "Financial Table"
+    csv_data = "\n".join(f'"{line}"' for line in lines[1:])
+    return {"table_name": table_name, "csv_data": csv_data}
+
+
+def default_responder(system_instruction: str, contents: str) -> str:
+    """
+    Echoes each section back as a one-column CSV inside the JSON shape the extraction prompt asks for: one
+    fenced object per request, or a plain list with `section_index` for batched ("=== SECTION n ===") requests.
+    """
+    parts = re.split(r"^=== SECTION (\d+) ===$", str(contents), flags=re.MULTILINE)
+    if len(parts) > 1:
+        return json.dumps([dict(section_index=int(idx), **_echo_table(section))
+                           for idx, section in zip(parts[1::2], parts[2::2])])
+    return "```json\n" + json.dumps(_echo_table(str(contents))) + "\n```"
+
+
+def _usage(system_instruction: str, contents: str, text: str):
+    prompt_tokens = (len(system_instruction or "") + len(str(contents))) // 4
+    reply_tokens = len(text) // 4
+    return SimpleNamespace(
+        prompt_token_count=prompt_tokens,
+        candidates_token_count=reply_tokens,
+        total_token_count=prompt_tokens + reply_tokens,
+    )
+
+
+class _FakeModels:
+    def __init__(self, client):
+        self._client = client
+
+    def generate_content(self, model, contents, config=None):
+        self._client._start_call()
+        try:
+            time.sleep(self._client.latency)
+            return self._client._respond(config, contents)
+        finally:
+            self._client._end_call()
+
+    def generate_content_stream(self, model, contents, config=None):
+        """Yields the reply in `chunk_chars` pieces, spreading the latency across them (or stalls after the first)."""
+        self._client._start_call()
+        try:
+            response = self._client._respond(config, contents)
+            pieces = [response.text[idx:idx + self._client.chunk_chars]
+                      for idx in range(0, len(response.text), self._client.chunk_chars)] or [""]
+            stalls = random.random() < self._client.stall_rate
+            for idx, piece in enumerate(pieces):
+                time.sleep(self._client.latency / len(pieces))
+                if stalls and idx == 1:
+                    threading.Event().wait(STALL_SECONDS)
+                last = idx == len(pieces) - 1
+                yield SimpleNamespace(text=piece, usage_metadata=response.usage_metadata if last else None)
+        finally:
+            self._client._end_call()
+
+
+class _FakeAsyncModels:
+    def __init__(self, client):
+        self._client = client
+
+    async def generate_content(self, model, contents, config=None):
+        self._client._start_call()
+        try:
+            await asyncio.sleep(self._client.latency)
+            return self._client._respond(config, contents)
+        finally:
+            self._client._end_call()
+
+
+class FakeGenAIClient:
+    """
+    A fake GenAI client with the same call surface the pipeline uses.
+
+    Args:
+        latency (float): Seconds each call takes.
+        error_rate (float): Fraction of calls that fail with `error_code`.
+        error_code (int): HTTP-style code for simulated failures (429 rate limit by default).
+        responder (callable): `responder(system_instruction, contents) -> str` producing the reply text.
+        stall_rate (float): Fraction of streamed replies that stop sending after their first chunk.
+        chunk_chars (int): Characters per streamed chunk.
+    """
+
+    def __init__(self, latency: float = 0.5, error_rate: float = 0.0, error_code: int = 429, responder=None,
+                 stall_rate: float = 0.0, chunk_chars: int = 200):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_code = error_code
+        self.stall_rate = stall_rate
+        self.chunk_chars = chunk_chars
+        self.responder = responder or default_responder
+        self.models = _FakeModels(self)
+        self.aio = SimpleNamespace(models=_FakeAsyncModels(self))
+        self.calls = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._lock = threading.Lock()
+
+    def _start_call(self):
+        with self._lock:
+            self.calls += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def _end_call(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def _respond(self, config, contents):
+        if random.random() < self.error_rate:
+            with self._lock:
+                self.errors += 1
+            raise FakeAPIError(self.error_code)
+        system_instruction = getattr(config, "system_instruction", "") or ""
+        text = self.responder(system_instruction, contents)
+        return SimpleNamespace(text=text, usage_metadata=_usage(system_instruction, contents, text))
@@ -0,0 +1,169 @@
+"""
+mock_genai_server.py
+
+A local HTTP server that answers the Gemini `generateContent` and `streamGenerateContent` (server-sent events)
+REST calls, so benchmarks can drive the real
+`google.genai` client (and the pooled, keep-alive HTTP path in `scripts/config.py`) without network access
+or API quota. Point the pipeline at it with `GEMINI_BASE_URL`.
+
+Classes:
+- MockGenAIServer: Threaded server with a configurable latency per request (spread across the chunks of
+  streamed replies); usable as a context manager.
+
+Functions:
+- statement_responder(system_instruction, contents): Turns FWC-style statement text into the CSV/JSON replies
+  the extraction prompts ask for, and returns a small markdown report for summary prompts.
+
+Usage (from the repository root):
+>>> from benchmarks.mock_genai_server import MockGenAIServer
+>>> with MockGenAIServer(latency=0.5) as server:
+...     os.environ["GEMINI_BASE_URL"] = server.base_url
+"""
+
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+AMOUNT = r"(?:\(?[\d,]+\)?|-)"
+ROW_PATTERN = re.compile(rf"^(?P<label>.*?)\s+(?:\d+[A-Z]\s+)?(?P<last>{AMOUNT})\s+(?P<previous>{AMOUNT})$")
+SECTION_MARKER = re.compile(r"^=== SECTION (\d+) ===$", re.MULTILINE)
+STREAM_CHUNK_CHARS = 200  # Reply text per server-sent event
+
+
+def _amount(value: str) -> str:
+    """"1,000" -> "1000", "(500)" -> "-500", "-" -> "0" (as the extraction prompt asks)."""
+    value = value.replace(",", "")
+    if value == "-":
+        return "0"
+    return f"-{value[1:-1]}" if value.startswith("(") else value
+
+
+def _section_to_table(section: str) -> dict:
+    """Converts one statement's text to {table_name, csv_data}, the way the extraction prompt asks for."""
+    lines = [line.strip() for line in section.splitlines() if line.strip()]
+    table_name = lines[0] if lines else "Financial Table"
+    rows = ["Item,Last Year,Previous Year"]
+    for line in lines[1:]:
+        if line.startswith(("For the year", "As at", "Last Year", "Notes")) or "above statement" in line.lower():
+            continue
+        match = ROW_PATTERN.match(line)
+        if match:
+            rows.append(f'"{match["label"]}",{_amount(match["last"])},{_amount(match["previous"])}')
+        else:
+            rows.append(f'"{line}",,')  # A subtable header
+    return {"table_name": table_name, "csv_data": "\n".join(rows)}
+
+
+def statement_responder(system_instruction: str, contents: str) -> str:
+    """Answers extraction prompts (per-section or batched) with parsed CSVs, and anything else with a short report."""
+    if "csv_data" not in (system_instruction or ""):
+        return "# Financial Summary Report\n\n| Metric | Value | Notes |\n|---|---|---|\n| Revenue | n/a | mock |\n\nMock summary."
+    parts = SECTION_MARKER.split(contents)
+    if len(parts) > 1:
+        return json.dumps([dict(section_index=int(idx), **_section_to_table(section))
+                           for idx, section in zip(parts[1::2], parts[2::2])])
+    return "```json\n" + json.dumps(_section_to_table(contents)) + "\n```"
+
+
+def _reply(text: str, prompt_tokens: int, reply_tokens: int) -> dict:
+    return {
+        "candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "finishReason": "STOP"}],
+        "usageMetadata": {"promptTokenCount": prompt_tokens, "candidatesTokenCount": reply_tokens,
+                          "totalTokenCount": prompt_tokens + reply_tokens},
+    }
+
+
+def _text_of(content) -> str:
+    if not content:
+        return ""
+    return "".join(part.get("text", "") for part in content.get("parts", []))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like the real endpoint
+
+    def do_POST(self):
+        server = self.server.mock
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        system_instruction = _text_of(body.get("systemInstruction") or body.get("system_instruction"))
+        contents = "".join(_text_of(content) for content in body.get("contents", []))
+        server._record_request()
+
+        text = server.responder(system_instruction, contents)
+        prompt_tokens = (len(system_instruction) + len(contents)) // 4
+        if ":streamGenerateContent" in self.path:
+            self._stream(server, text, prompt_tokens)
+            return
+
+        time.sleep(server.latency)
+        reply = json.dumps(_reply(text, prompt_tokens, len(text) // 4)).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(reply)))
+        self.end_headers()
+        self.wfile.write(reply)
+
+    def _stream(self, server, text, prompt_tokens):
+        """Sends the reply as server-sent events, `STREAM_CHUNK_CHARS` of text per event, in a chunked response."""
+        pieces = [text[idx:idx + STREAM_CHUNK_CHARS] for idx in range(0, len(text), STREAM_CHUNK_CHARS)] or [""]
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        sent = 0
+        for piece in pieces:
+            time.sleep(server.latency / len(pieces))
+            sent += len(piece)
+            event = f"data: {json.dumps(_reply(piece, prompt_tokens, sent // 4))}\r\n\r\n".encode("utf-8")
+            self.wfile.write(f"{len(event):x}\r\n".encode("ascii") + event + b"\r\n")
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+    def log_message(self, format, *args):
+        pass  # Keep benchmark output readable
+
+
+class MockGenAIServer:
+    """
+    Serves `POST .../models/<model>:generateContent` (and `:streamGenerateContent`) on 127.0.0.1.
+
+    Args:
+        latency (float): Seconds each request takes.
+        responder (callable): `responder(system_instruction, contents) -> str` (default: statement_responder).
+        port (int): Port to listen on (default: any free port).
+    """
+
+    def __init__(self, latency: float = 0.5, responder=None, port: int = 0):
+        self.latency = latency
+        self.responder = responder or statement_responder
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+        self._server.daemon_threads = True
+        self._server.mock = self
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}/"
+
+    def _record_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,94 @@
+"""
+synthetic_pdf.py
+
+Generates synthetic financial statement PDFs in the FWC sample layout (FS 023 header/footer lines, "Last Year /
+Previous Year" columns, statements ending in "The above statement should be read in conjunction with the notes.",
+and a closing copyright block), so the pipeline can be benchmarked on documents of any size.
+
+Every "Total ..." row is the sum of the line items above it, so the generated tables pass `validate_csv_numbers`.
+
+Functions:
+- statement_lines(name, groups, rows, rng): The text lines of one statement.
+- make_statement_pdf(path, pages, rows, seed): Writes a PDF of roughly `pages` pages.
+
+Usage (from the repository root):
+>>> from benchmarks.synthetic_pdf import make_statement_pdf
+>>> make_statement_pdf("/tmp/synthetic.pdf", pages=50, rows=20)
+"""
+
+import random
+
+import fitz  # PyMuPDF, already installed as a dependency of markdown-pdf
+
+STATEMENT_NAMES = (
+    "Statement of comprehensive income",
+    "Statement of financial position",
+    "Statement of changes in equity",
+    "Statement of cash flows",
+)
+GROUP_NAMES = ("Revenue", "Expenses", "Current Assets", "Non-Current Assets", "Current Liabilities",
+               "Non-Current Liabilities", "Cash Received", "Cash Used")
+LINES_PER_PAGE = 48
+LINE_HEIGHT = 14
+FONT_SIZE = 9
+HEADER = "Fact Sheet FS 023 | 10 March 2023"
+COPYRIGHT = ("© Commonwealth of Australia 2023\n"
+             "This fact sheet is not intended to be comprehensive. It is designed to assist in gaining an\n"
+             "understanding of the Fair Work Commission. The Fair Work Commission does not provide legal advice.")
+
+
+def _money(value: int) -> str:
+    return f"{value:,}" if value else "-"
+
+
+def statement_lines(name: str, groups: int, rows: int, rng: random.Random) -> list:
+    """Builds the lines of one statement: `groups` subtotalled groups of `rows` line items each."""
+    lines = [name, "For the year ended 30 June", "Last Year Previous Year", "Notes $ $"]
+    for group_idx in range(groups):
+        group = GROUP_NAMES[(group_idx + rng.randrange(len(GROUP_NAMES))) % len(GROUP_NAMES)]
+        lines.append(group)
+        last_total = previous_total = 0
+        for row in range(rows):
+            last, previous = rng.randrange(0, 5_000) * 1000, rng.randrange(0, 5_000) * 1000
+            last_total += last
+            previous_total += previous
+            note = f"{group_idx + 3}{chr(ord('A') + row % 26)} " if row % 3 == 0 else ""
+            lines.append(f"{group} item {row + 1} {note}{_money(last)} {_money(previous)}")
+        lines.append(f"Total {group} {_money(last_total)} {_money(previous_total)}")
+    lines.append("The above statement should be read in conjunction with the notes.")
+    return lines
+
+
+def make_statement_pdf(path: str, pages: int = 5, rows: int = 10, seed: int = 0) -> int:
+    """
+    Writes a synthetic FWC-style statement PDF of about `pages` pages (whole statements are kept, so the last
+    page may be short), with `rows` line items per subtotal group.
+
+    Returns:
+        int: The number of pages written.
+    """
+    rng = random.Random(seed)
+    lines = [HEADER, "Sample financial statements"]
+    statement_idx = 0
+    while len(lines) < pages * (LINES_PER_PAGE - 1) - len(COPYRIGHT.splitlines()):
+        name = STATEMENT_NAMES[statement_idx % len(STATEMENT_NAMES)]
+        if statement_idx >= len(STATEMENT_NAMES):
+            name += f" ({statement_idx // len(STATEMENT_NAMES) + 1})"
+        lines += statement_lines(name, groups=2, rows=rows, rng=rng)
+        statement_idx += 1
+    lines += COPYRIGHT.splitlines()
+
+    doc = fitz.open()
+    body_lines = LINES_PER_PAGE - 1  # The last line of each page is the footer
+    for page_number, start in enumerate(range(0, len(lines), body_lines), start=1):
+        page = doc.new_page(width=595, height=842)  # A4
+        y = 40
+        for line in lines[start:start + body_lines]:
+            page.insert_text((40, y), line, fontsize=FONT_SIZE)
+            y += LINE_HEIGHT
+        page.insert_text((40, y + LINE_HEIGHT), f"FS 023 Sample financial statement 10 March 2023 | p. {page_number}",
+                         fontsize=FONT_SIZE)
+    page_count = doc.page_count
+    doc.save(path)
+    doc.close()
+    return page_count
@@ -30,58 +30,544 @@ Run the script in the terminal:
 >>> python main.py
 """
 
+import argparse
+import functools
+import json
 import os
-from scripts.preprocess_data import extract_full_text, clean_text, split_into_sections_regex
-from scripts.generate_tables import process_and_save_tables
+import time
+from scripts.preprocess_data import extract_full_text, clean_text, split_into_sections_regex, iter_page_text, stream_sections, choose_backend
+from scripts.pdf_backends import PDF_BACKENDS, DEFAULT_BACKEND
+from scripts.local_tables import LOCAL_PARSER_VERSION, MIN_CONFIDENCE
+from scripts.render import render_report, start_render_pool, stop_render_pool, REPORT_FORMATS, REPORT_STYLE_VERSION
+from scripts.generate_tables import process_and_save_tables, EXTRACTION_MODEL, EXTRACTION_INSTRUCTION, BATCH_EXTRACTION_INSTRUCTION, EXTRACTION_MODES
 from scripts.validate import validate_csv_numbers
-from scripts.genai_summary import read_csv_files, generate_summary_report, save_markdown_to_pdf
-from scripts.path_utils import setup_directory_structure
+from scripts.genai_summary import build_summary_prompt, generate_summary_report, SUMMARY_MODEL, SUMMARY_INSTRUCTION, COMPACT_SUMMARY_INSTRUCTION, RETRIEVAL_SUMMARY_INSTRUCTION, SUMMARY_MODES
+from scripts.retrieval import build_index, RETRIEVAL_INDEX_VERSION, RETRIEVAL_TOP_K, SUMMARY_QUERIES
+from scripts.path_utils import setup_directory_structure, get_base_name
+from scripts.batch import run_batch
+from scripts.response_cache import configure_cache, cache_stats
+from scripts.section_index import configure_section_index, reuse_stats
+from scripts.config import client_pool_stats
+from scripts.tracing import (configure_tracing, trace_stage, file_size, write_prometheus_metrics, new_span, write_span,
+                            traced_iter)
+from scripts.watch import warm_up, watch_folder
+from scripts.job_queue import JobQueue, run_worker, print_status, check_lease, DEFAULT_LEASE_SECONDS
+from scripts.manifest import PipelineManifest, PIPELINE_STAGES, hash_file, hash_text
 
-def process_financial_statement(pdf_path: str):
-    """Process a single financial statement PDF."""
-    
-    # Setup directory structure for this PDF
-    data_dir, report_dir, base_name = setup_directory_structure(pdf_path)
-    
+# Anything that changes a stage's output without changing its input belongs in its version string,
+# so the manifest knows to re-run it (e.g. editing the summary prompt re-runs just summary + render).
+STAGE_VERSIONS = {
+    "extract": "pdfplumber",
+    "clean": "1",
+    "split": "1",
+    "tables": f"{EXTRACTION_MODEL}|{EXTRACTION_INSTRUCTION}",
+    "summary": f"{SUMMARY_MODEL}|{SUMMARY_INSTRUCTION}",
+    "render": f"markdown_pdf|style-{REPORT_STYLE_VERSION}",
+}
+# The compact summary prompt is built by scripts/financial_metrics.py; bump the suffix when its output changes
+COMPACT_SUMMARY_VERSION = f"{SUMMARY_MODEL}|{COMPACT_SUMMARY_INSTRUCTION}|metrics-1"
+RETRIEVAL_SUMMARY_VERSION = (f"{SUMMARY_MODEL}|{RETRIEVAL_SUMMARY_INSTRUCTION}|index-{RETRIEVAL_INDEX_VERSION}"
+                             f"@{RETRIEVAL_TOP_K}|{'/'.join(SUMMARY_QUERIES)}")
+BATCHED_TABLES_VERSION = f"{EXTRACTION_MODEL}|{BATCH_EXTRACTION_INSTRUCTION}|batched"
+LOCAL_TABLES_VERSION = f"local-{LOCAL_PARSER_VERSION}@{MIN_CONFIDENCE}"
+
+def _stage_version(stage, summary_mode="full", extraction_mode="per-section", pdf_backend=DEFAULT_BACKEND,
+                   local_parser=True, report_format="pdf"):
+    """
+    The version string of a stage, which for the tables/summary depends on the extraction/prompt mode
+    (and whether the local table parser is used), for the extract stage is the PDF backend, and for
+    the render stage depends on the report format.
+    """
+    if stage == "extract":
+        return pdf_backend  # Already resolved from "auto" (see `_resolve_backend`), so the manifest names the library used
+    if stage == "render" and report_format != "pdf":
+        return f"{report_format}|style-{REPORT_STYLE_VERSION}"
+    if stage == "summary" and summary_mode == "compact":
+        return COMPACT_SUMMARY_VERSION
+    if stage == "summary" and summary_mode == "retrieval":
+        return RETRIEVAL_SUMMARY_VERSION
+    if stage == "tables":
+        version = BATCHED_TABLES_VERSION if extraction_mode == "batched" else STAGE_VERSIONS["tables"]
+        return f"{version}|{LOCAL_TABLES_VERSION}" if local_parser else version
+    return STAGE_VERSIONS[stage]
+
+def _resolve_backend(pdf_path, pdf_backend):
+    """The backend "auto" picks for a PDF (see `choose_backend`); any other backend name is returned unchanged."""
+    return choose_backend(pdf_path) if pdf_backend == "auto" else pdf_backend
+
+def _is_current(manifest, stage, input_hash, force_stages):
+    """True if a stage can be skipped: not forced and unchanged since its last run."""
+    if stage in force_stages or "all" in force_stages:
+        return False
+    return manifest.is_fresh(stage, input_hash)
+
+def _read_text(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+def _write_text(path, text):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+def _run_text_stage(pdf_path, manifest, stage, upstream_hash, input_paths, output_path, compute, force_stages, timings,
+                    version=None):
+    """
+    Runs (or skips) a stage whose output is a single text file, tracing it as it goes.
+
+    Returns:
+        str: The stage's output text, either freshly computed or read back from disk.
+    """
+    input_hash = manifest.input_hash(stage, upstream_hash, version or STAGE_VERSIONS[stage])
+    with trace_stage(pdf_path, stage) as span:
+        span.bytes_in = file_size(*input_paths)
+        if _is_current(manifest, stage, input_hash, force_stages):
+            print(f"⏩ Skipping {stage}: unchanged since last run.")
+            span.status = "skipped"
+            return _read_text(output_path)
+
+        check_lease()  # Queue workers stop here once their job has passed to another worker
+        start = time.perf_counter()
+        text = compute()
+        check_lease()
+        _write_text(output_path, text)
+        manifest.record(stage, input_hash, [output_path])
+        span.bytes_out = file_size(output_path)
+        timings[stage] = time.perf_counter() - start
+        return text
+
+def preprocess_financial_statement(pdf_path: str, force_stages=(), pdf_backend: str = DEFAULT_BACKEND):
+    """
+    Runs the CPU-bound preprocessing steps (1-3) for a single PDF, skipping steps whose inputs are unchanged.
+
+    Args:
+        pdf_path (str): Path to the input PDF.
+        force_stages (iterable): Stage names to re-run regardless of the manifest ("all" forces every stage).
+        pdf_backend (str): PDF library for text extraction, or "auto" (see `choose_backend`).
+
+    Returns:
+        tuple: (segmented_tables, timings) where timings maps each stage that ran to its wall seconds.
+    """
+    timings = {}
+    data_dir, _, _ = setup_directory_structure(pdf_path)
+    manifest = PipelineManifest(data_dir)
     print(f"\n🔄 Processing {os.path.basename(pdf_path)}...")
-    
+    pdf_backend = _resolve_backend(pdf_path, pdf_backend)
+
     print(" Step 1: Extracting text from PDF...")
-    raw_text = extract_full_text(pdf_path)
+    raw_path = os.path.join(data_dir, "raw_text.txt")
+    raw_text = _run_text_stage(pdf_path, manifest, "extract", hash_file(pdf_path), [pdf_path], raw_path,
+                               lambda: extract_full_text(pdf_path, backend=pdf_backend), force_stages, timings,
+                               version=_stage_version("extract", pdf_backend=pdf_backend))
     print("✅ Extraction complete!")
 
     print(" Step 2: Cleaning extracted text...")
-    cleaned_text = clean_text(raw_text)
+    cleaned_path = os.path.join(data_dir, "cleaned_text.txt")
+    cleaned_text = _run_text_stage(pdf_path, manifest, "clean", manifest.output_hash("extract"), [raw_path], cleaned_path,
+                                   lambda: clean_text(raw_text), force_stages, timings)
     print("✅ Cleaning complete!")
 
     print(" Step 3: Splitting into sections...")
-    segmented_tables = split_into_sections_regex(cleaned_text)
+    sections_json = _run_text_stage(pdf_path, manifest, "split", manifest.output_hash("clean"), [cleaned_path],
+                                    os.path.join(data_dir, "sections.json"),
+                                    lambda: json.dumps(split_into_sections_regex(cleaned_text), indent=2),
+                                    force_stages, timings)
+    segmented_tables = json.loads(sections_json)
     print(f"✅ Split into {len(segmented_tables)} sections.")
 
+    return segmented_tables, timings
+
+def generate_financial_outputs(pdf_path: str, segmented_tables, force_stages=(), summary_mode: str = "full",
+                               extraction_mode: str = "per-section", local_parser: bool = True,
+                               report_format: str = "pdf", stream_responses: bool = False):
+    """
+    Runs the GenAI and reporting steps (4-6) for a single, already preprocessed PDF,
+    skipping steps whose inputs are unchanged.
+
+    `summary_mode` "compact" summarises locally computed metrics instead of every table, and "retrieval" only the
+    rows the PDF's retrieval index ranks highest (see `build_summary_prompt`). The index is rebuilt with the tables.
+    `extraction_mode` "batched" extracts every table in one schema-constrained request (see `process_and_save_tables`).
+    `local_parser` converts well-formed sections without GenAI (see `scripts/local_tables.py`).
+    `report_format` "html" or "md" skips the PDF (see `scripts/render.py`).
+    `stream_responses` streams GenAI replies, writing the summary Markdown as it arrives (see `scripts/llm_stream.py`).
+
+    Returns:
+        dict: Maps each stage that ran to its wall seconds.
+    """
+    timings = {}
+
+    # Setup directory structure for this PDF
+    data_dir, report_dir, base_name = setup_directory_structure(pdf_path)
+    manifest = PipelineManifest(data_dir)
+
     print(" Step 4: Processing tables with GenAI and saving CSVs...")
-    process_and_save_tables(segmented_tables, output_dir=data_dir)
-    print("✅ All tables processed and saved as CSVs!")
-    validate_csv_numbers(data_dir, debug=True)
+    sections_hash = manifest.output_hash("split") or hash_text(json.dumps(segmented_tables, indent=2))
+    input_hash = manifest.input_hash("tables", sections_hash,
+                                     _stage_version("tables", extraction_mode=extraction_mode, local_parser=local_parser))
+    with trace_stage(pdf_path, "tables") as span:
+        span.bytes_in = sum(len(table.encode("utf-8")) for table in segmented_tables)
+        if _is_current(manifest, "tables", input_hash, force_stages):
+            print("⏩ Skipping tables: sections and extraction prompt unchanged since last run.")
+            span.status = "skipped"
+        else:
+            check_lease()
+            start = time.perf_counter()
+            manifest.remove_outputs("tables")  # Table names come from the model, so old CSVs may not be overwritten
+            counts = process_and_save_tables(segmented_tables, output_dir=data_dir, mode=extraction_mode,
+                                             local_parser=local_parser, stream=stream_responses)
+            check_lease()
+            print("✅ All tables processed and saved as CSVs!")
+            validate_csv_numbers(data_dir, debug=True)
+            build_index(data_dir, segmented_tables)
+            csv_paths = [os.path.join(data_dir, name) for name in os.listdir(data_dir) if name.endswith(".csv")]
+            manifest.record("tables", input_hash, csv_paths, failed=counts["failed"])
+            span.bytes_out = file_size(*csv_paths)
+            timings["tables"] = time.perf_counter() - start
 
     print(" Step 5: Generating financial summary report...")
-    csv_text = read_csv_files(data_dir)
-    report_response = generate_summary_report(csv_text)
+    summary_path = os.path.join(report_dir, f"{base_name}_summary.md")
+    markdown_text = _run_text_stage(pdf_path, manifest, "summary", manifest.output_hash("tables"),
+                                    manifest.outputs("tables"), summary_path,
+                                    lambda: generate_summary_report(*build_summary_prompt(data_dir, summary_mode),
+                                                                    stream_to=summary_path if stream_responses else None).text,
+                                    force_stages, timings, version=_stage_version("summary", summary_mode))
 
     # Create report filename based on input PDF name
-    report_path = os.path.join(report_dir, f"{base_name}_summary.pdf")
+    report_path = os.path.join(report_dir, f"{base_name}_summary.{report_format}")
     
-    print(" Step 6: Saving summary report as PDF...")
-    save_markdown_to_pdf(report_response.text, output_path=report_path, debug=True)
+    print(f" Step 6: Saving summary report as {report_format.upper()}...")
+    input_hash = manifest.input_hash("render", manifest.output_hash("summary"),
+                                     _stage_version("render", report_format=report_format))
+    with trace_stage(pdf_path, "render") as span:
+        span.bytes_in = len(markdown_text.encode("utf-8"))
+        if _is_current(manifest, "render", input_hash, force_stages):
+            report_path = manifest.outputs("render")[0]
+            print(f"⏩ Skipping render: summary unchanged, report is still {report_path}.")
+            span.status = "skipped"
+        else:
+            check_lease()
+            start = time.perf_counter()
+            if report_format != "md":  # The summary stage already saved the Markdown
+                report_path = render_report(markdown_text, report_path, fmt=report_format, unique=True)
+            manifest.record("render", input_hash, [report_path])
+            span.bytes_out = file_size(report_path)
+            timings["render"] = time.perf_counter() - start
     print(f"✅ Financial summary saved to {report_path}!")
 
+    return timings
+
+def stream_financial_statement(pdf_path: str, pdf_backend: str = DEFAULT_BACKEND, local_parser: bool = True,
+                               stream_responses: bool = False):
+    """
+    Runs steps 1-4 for a single PDF as one overlapped stream: pages are parsed one at a time, each section is
+    sent to GenAI as soon as its end marker is seen, and later pages keep parsing while those requests are in
+    flight. The extract/clean/split/tables stages are recorded in the manifest once the stream finishes.
+
+    Each stage still gets its own trace span. Extract and split are timed page by page and section by section
+    as the tables stage pulls them, so the tables span's wall time covers the whole stream while its CPU time
+    leaves theirs out.
+
+    With `pdf_backend` "auto" the backend is chosen from a few sample pages before streaming starts, since
+    sections already sent to GenAI can't be taken back.
+
+    Returns:
+        tuple: (segmented_tables, timings)
+    """
+    timings = {}
+    data_dir, _, _ = setup_directory_structure(pdf_path)
+    manifest = PipelineManifest(data_dir)
+    print(f"\n🔄 Processing {os.path.basename(pdf_path)} (streaming)...")
+    print(" Steps 1-4: Extracting, cleaning and splitting pages while sending finished tables to GenAI...")
+
+    page_texts, segmented_tables = [], []
+    pdf_backend = _resolve_backend(pdf_path, pdf_backend)
+    # Extract and split run lazily inside the tables stage, each timed while it produces its next page/section
+    extract_span, split_span = new_span(pdf_path, "extract"), new_span(pdf_path, "split")
+
+    def pages():
+        for text in traced_iter(iter_page_text(pdf_path, backend=pdf_backend), extract_span):
+            page_texts.append(text)
+            yield text
+
+    def sections():
+        for section in traced_iter(stream_sections(pages()), split_span):
+            check_lease()  # Before each section's table is requested and saved
+            segmented_tables.append(section)
+            print(f"✅ Section {len(segmented_tables)} ready after {len(page_texts)} pages.")
+            yield section
+
+    raw_path, cleaned_path, sections_path = (os.path.join(data_dir, name)
+                                             for name in ("raw_text.txt", "cleaned_text.txt", "sections.json"))
+    try:
+        with trace_stage(pdf_path, "tables") as span:
+            start = time.perf_counter()
+            manifest.remove_outputs("tables")
+            counts = process_and_save_tables(sections(), output_dir=data_dir, local_parser=local_parser,
+                                             stream=stream_responses)
+            check_lease()
+            timings["stream"] = time.perf_counter() - start
+            print(f"✅ Split into {len(segmented_tables)} sections and saved their CSVs!")
+            validate_csv_numbers(data_dir, debug=True)
+
+            # Persist the intermediate outputs so later runs can skip these stages
+            raw_text = "".join(text + "\n" for text in page_texts)
+            _write_text(raw_path, raw_text)
+            _write_text(sections_path, json.dumps(segmented_tables, indent=2))
+            build_index(data_dir, segmented_tables)
+            csv_paths = [os.path.join(data_dir, name) for name in os.listdir(data_dir) if name.endswith(".csv")]
+            span.bytes_in = sum(len(section.encode("utf-8")) for section in segmented_tables)
+            span.bytes_out = file_size(*csv_paths)
+    finally:
+        split_span.wall_seconds -= extract_span.wall_seconds  # Each section's timing includes the pages it pulled
+        split_span.cpu_seconds -= extract_span.cpu_seconds
+        extract_span.bytes_in = file_size(pdf_path)
+        extract_span.bytes_out = sum(len(text.encode("utf-8")) + 1 for text in page_texts)
+        split_span.bytes_out = sum(len(section.encode("utf-8")) for section in segmented_tables)
+        for stage_span in (extract_span, split_span):
+            stage_span.status = span.status
+            write_span(stage_span)
+
+    # The stream cleans each page as it goes; the whole text is cleaned again here for cleaned_text.txt
+    with trace_stage(pdf_path, "clean") as span:
+        span.bytes_in = file_size(raw_path)
+        _write_text(cleaned_path, clean_text(raw_text))
+        span.bytes_out = file_size(cleaned_path)
+
+    upstream_hash = hash_file(pdf_path)
+    for stage, output_path in (("extract", raw_path), ("clean", cleaned_path), ("split", sections_path)):
+        version = _stage_version(stage, pdf_backend=pdf_backend)
+        upstream_hash = manifest.record(stage, manifest.input_hash(stage, upstream_hash, version), [output_path])
+    version = _stage_version("tables", local_parser=local_parser)
+    manifest.record("tables", manifest.input_hash("tables", upstream_hash, version), csv_paths,
+                    failed=counts["failed"])
+
+    return segmented_tables, timings
+
+def process_financial_statement(pdf_path: str, force_stages=(), stream: bool = True, summary_mode: str = "full",
+                                extraction_mode: str = "per-section", pdf_backend: str = DEFAULT_BACKEND,
+                                local_parser: bool = True, report_format: str = "pdf", stream_responses: bool = False):
+    """
+    Process a single financial statement PDF.
+
+    When the PDF needs re-extracting and `stream` is True, steps 1-4 are overlapped via
+    `stream_financial_statement`; otherwise each step runs (or is skipped) in turn. Batched extraction
+    needs every section up front, so it never streams.
+    """
+    data_dir, _, _ = setup_directory_structure(pdf_path)
+    manifest = PipelineManifest(data_dir)
+    pdf_backend = _resolve_backend(pdf_path, pdf_backend)  # Once, so the freshness check and the run agree
+    extract_hash = manifest.input_hash("extract", hash_file(pdf_path), _stage_version("extract", pdf_backend=pdf_backend))
+
+    if stream and extraction_mode == "per-section" and not _is_current(manifest, "extract", extract_hash, force_stages):
+        segmented_tables, timings = stream_financial_statement(pdf_path, pdf_backend, local_parser, stream_responses)
+    else:
+        segmented_tables, timings = preprocess_financial_statement(pdf_path, force_stages, pdf_backend)
+    timings.update(generate_financial_outputs(pdf_path, segmented_tables, force_stages, summary_mode, extraction_mode,
+                                              local_parser, report_format, stream_responses))
+    return timings
+
+def plan_financial_statement(pdf_path: str, force_stages=(), summary_mode: str = "full",
+                             extraction_mode: str = "per-section", pdf_backend: str = DEFAULT_BACKEND,
+                             local_parser: bool = True, report_format: str = "pdf"):
+    """
+    Works out which stages a run would execute for a PDF, without running or creating anything.
+
+    Returns:
+        list: (stage, reason) pairs, in pipeline order. Reasons starting with "skip" would not run.
+    """
+    manifest = PipelineManifest(os.path.join("data", get_base_name(pdf_path)))
+    pdf_backend = _resolve_backend(pdf_path, pdf_backend)
+    upstream_hash = hash_file(pdf_path)
+    upstream_runs = False
+    plan = []
+
+    for stage in PIPELINE_STAGES:
+        if upstream_runs:
+            plan.append((stage, "may run (an upstream stage re-runs)"))
+            continue
+
+        version = _stage_version(stage, summary_mode, extraction_mode, pdf_backend, local_parser, report_format)
+        input_hash = manifest.input_hash(stage, upstream_hash, version)
+        if stage in force_stages or "all" in force_stages:
+            reason = "run (forced)"
+        elif not manifest.stage(stage):
+            reason = "run (never run)"
+        elif not manifest.is_fresh(stage, input_hash):
+            reason = "run (input, prompt/model version or outputs changed)"
+        else:
+            reason = "skip (unchanged)"
+
+        plan.append((stage, reason))
+        upstream_runs = not reason.startswith("skip")
+        upstream_hash = manifest.output_hash(stage)
+
+    return plan
+
+def print_plan(pdf_paths, force_stages=(), summary_mode="full", extraction_mode="per-section",
+               pdf_backend=DEFAULT_BACKEND, local_parser=True, report_format="pdf"):
+    """Prints the dry-run "what would run" listing for every PDF."""
+    for pdf_path in pdf_paths:
+        print(f"\n📋 {os.path.basename(pdf_path)}")
+        plan = plan_financial_statement(pdf_path, force_stages, summary_mode, extraction_mode, pdf_backend, local_parser,
+                                        report_format)
+        for stage, reason in plan:
+            print(f"  {stage:<8} {reason}")
+
+def parse_args():
+    """Parses command line options."""
+    parser = argparse.ArgumentParser(description="Extract and summarise financial statement PDFs.")
+    parser.add_argument("--input-dir", default="./pdf_inputs", help="Directory containing the PDFs to process.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of PDFs to process in parallel. 1 processes them one at a time.")
+    parser.add_argument("--no-cache", action="store_true", help="Do not read or write the GenAI response cache.")
+    parser.add_argument("--refresh", action="store_true",
+                        help="Ignore cached GenAI responses and overwrite them with fresh ones.")
+    parser.add_argument("--force-stage", action="append", default=[], choices=PIPELINE_STAGES + ("all",),
+                        help="Re-run this stage even if the manifest says it is up to date (repeatable).")
+    parser.add_argument("--no-stream", action="store_true",
+                        help="Finish extracting the whole PDF before sending any table to GenAI.")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="List which stages would run for each PDF, without running them.")
+    parser.add_argument("--summary-mode", default="full", choices=SUMMARY_MODES,
+                        help="'compact' sends locally computed metrics to the summary model instead of every table; "
+                             "'retrieval' sends only the table rows most relevant to the report.")
+    parser.add_argument("--extraction-mode", default="per-section", choices=EXTRACTION_MODES,
+                        help="'batched' extracts all of a PDF's tables in one schema-constrained GenAI request, "
+                             "retrying only failed tables one at a time.")
+    parser.add_argument("--no-local-parser", action="store_true",
+                        help="Send every table to GenAI, instead of parsing well-formed statement tables locally.")
+    parser.add_argument("--no-section-reuse", action="store_true",
+                        help="Extract every table afresh, instead of reusing the extraction of a near-duplicate "
+                             "section seen in an earlier filing.")
+    parser.add_argument("--report-format", default="pdf", choices=REPORT_FORMATS,
+                        help="Render the summary report as PDF, HTML, or keep just the Markdown.")
+    parser.add_argument("--stream-responses", action="store_true",
+                        help="Stream GenAI replies: the summary Markdown is written as it is generated, and stalled or "
+                             "malformed replies are abandoned and retried early.")
+    parser.add_argument("--pdf-backend", default=DEFAULT_BACKEND, choices=PDF_BACKENDS,
+                        help="PDF library for text extraction. 'auto' uses PyMuPDF when its cleaned text matches "
+                             "pdfplumber's on a few sample pages, falling back to pdfplumber.")
+    parser.add_argument("--trace-file", default=os.path.join("data", "trace.jsonl"),
+                        help="JSON lines file that per-stage timings, memory, bytes and token usage are appended to.")
+    parser.add_argument("--metrics-file", help="Also write this run's per-stage totals in Prometheus text format.")
+    parser.add_argument("--profile", action="store_true",
+                        help="Profile the CPU-bound stages with cProfile (saved under data/profiles/).")
+    parser.add_argument("--watch", action="store_true",
+                        help="Keep running and process PDFs as they land in the spool folder, moving each to "
+                             "done/ or failed/ afterwards.")
+    parser.add_argument("--spool-dir", help="Folder watched in --watch mode (default: --input-dir).")
+    parser.add_argument("--poll-interval", type=float, default=5.0,
+                        help="Seconds between spool folder scans in --watch mode, or between claims of an "
+                             "empty --queue.")
+    parser.add_argument("--queue", metavar="DB",
+                        help="Take PDFs from this shared SQLite job queue instead of --input-dir, so workers on "
+                             "several hosts can split a corpus (run every worker from the same shared directory).")
+    parser.add_argument("--enqueue", action="store_true",
+                        help="Add the PDFs in --input-dir to --queue and exit.")
+    parser.add_argument("--retry-failed", action="store_true",
+                        help="With --enqueue, queue finished or failed PDFs again.")
+    parser.add_argument("--queue-status", action="store_true",
+                        help="Show --queue's depth, in-flight jobs and throughput per worker, and exit.")
+    parser.add_argument("--lease-seconds", type=float, default=DEFAULT_LEASE_SECONDS,
+                        help="Seconds a --queue job stays claimed without a heartbeat before another worker retries it.")
+    parser.add_argument("--until-empty", action="store_true",
+                        help="Stop a --queue worker once no job is queued or running.")
+    return parser.parse_args()
+
 def main():
     """Main function to process all PDFs in the input directory."""
-    pdf_dir = "./pdf_inputs"
-    
-    # Process all PDFs in the input directory
-    for filename in os.listdir(pdf_dir):
-        if filename.endswith('.pdf'):
-            pdf_path = os.path.join(pdf_dir, filename)
-            process_financial_statement(pdf_path)
+    args = parse_args()
+    pdf_dir = args.input_dir
+    configure_cache(enabled=not args.no_cache, refresh=args.refresh)
+    configure_section_index(enabled=not args.no_section_reuse)
+
+    # Queue workers take their PDFs from the queue, so their host needn't have --input-dir
+    pdf_paths = [] if args.queue and not args.enqueue else \
+        [os.path.join(pdf_dir, filename) for filename in sorted(os.listdir(pdf_dir)) if filename.endswith('.pdf')]
+
+    if args.queue and (args.enqueue or args.queue_status):
+        queue = JobQueue(args.queue, lease_seconds=args.lease_seconds)
+        if args.enqueue:
+            added = queue.enqueue(pdf_paths, retry=args.retry_failed)
+            print(f"📥 Queued {added} of {len(pdf_paths)} PDFs from {pdf_dir}.")
+        print_status(queue.status())
+        return
+
+    if args.dry_run:
+        print_plan(pdf_paths, args.force_stage, args.summary_mode, args.extraction_mode, args.pdf_backend,
+                   not args.no_local_parser, args.report_format)
+        return
+
+    run_id = configure_tracing(args.trace_file, profile_dir=os.path.join("data", "profiles") if args.profile else None)
+
+    if args.queue:
+        def on_processed(pdf_path, ok):
+            if args.metrics_file:
+                write_prometheus_metrics(args.trace_file, args.metrics_file, run_id)
+
+        warm_up()
+        run_worker(JobQueue(args.queue, lease_seconds=args.lease_seconds),
+                   functools.partial(process_financial_statement, force_stages=args.force_stage,
+                                     stream=not args.no_stream, summary_mode=args.summary_mode,
+                                     extraction_mode=args.extraction_mode, pdf_backend=args.pdf_backend,
+                                     local_parser=not args.no_local_parser, report_format=args.report_format,
+                                     stream_responses=args.stream_responses),
+                   poll_interval=args.poll_interval, until_empty=args.until_empty, on_processed=on_processed)
+    elif args.watch:
+        def on_processed(pdf_path, ok):
+            if args.metrics_file:
+                write_prometheus_metrics(args.trace_file, args.metrics_file, run_id)
+
+        warm_up()
+        watch_folder(args.spool_dir or pdf_dir,
+                     functools.partial(process_financial_statement, force_stages=args.force_stage,
+                                       stream=not args.no_stream, summary_mode=args.summary_mode,
+                                       extraction_mode=args.extraction_mode, pdf_backend=args.pdf_backend,
+                                       local_parser=not args.no_local_parser, report_format=args.report_format,
+                                       stream_responses=args.stream_responses),
+                     poll_interval=args.poll_interval, on_processed=on_processed)
+    else:
+        # With several workers, reports render in their own processes, in parallel with extraction for the PDFs
+        # still in flight; a single worker processes the PDFs in turn, streaming each one
+        if args.workers > 1:
+            start_render_pool(args.workers)
+        try:
+            run_batch(pdf_paths,
+                      functools.partial(preprocess_financial_statement, force_stages=args.force_stage,
+                                        pdf_backend=args.pdf_backend),
+                      functools.partial(generate_financial_outputs, force_stages=args.force_stage,
+                                        summary_mode=args.summary_mode, extraction_mode=args.extraction_mode,
+                                        local_parser=not args.no_local_parser, report_format=args.report_format,
+                                        stream_responses=args.stream_responses),
+                      workers=args.workers,
+                      process_fn=functools.partial(process_financial_statement, force_stages=args.force_stage,
+                                                   stream=not args.no_stream, summary_mode=args.summary_mode,
+                                                   extraction_mode=args.extraction_mode, pdf_backend=args.pdf_backend,
+                                                   local_parser=not args.no_local_parser,
+                                                   report_format=args.report_format,
+                                                   stream_responses=args.stream_responses))
+        finally:
+            stop_render_pool()
+
+    stats = cache_stats()
+    print(f"🗄️ GenAI response cache: {stats['hits']} hits, {stats['misses']} misses.")
+    reuse = reuse_stats()
+    if reuse["sections"]:
+        print(f"♻️ Near-duplicate sections: {reuse['reused'] + reuse['diff_prompts']} of {reuse['sections']} "
+              f"GenAI-bound tables reused an earlier extraction "
+              f"({(reuse['reused'] + reuse['diff_prompts']) / reuse['sections']:.0%}); {reuse['reused']} GenAI calls "
+              f"saved, {reuse['diff_prompts']} sent as a diff prompt.")
+    pool_stats = client_pool_stats()
+    if pool_stats:
+        print(f"🔌 GenAI clients: {pool_stats['clients_created']} created, {pool_stats['client_reuses']} reuses; "
+              f"{pool_stats['connections_reused']} of {pool_stats['http_requests']} HTTP requests reused a connection.")
+        for key in pool_stats["keys"]:
+            print(f"   key {key['key']}: {key['requests']} requests, {key['tokens']} tokens, "
+                  f"{key['rate_limited']} rate limited")
+
+    print(f"🧭 Stage traces for run {run_id} appended to {args.trace_file}.")
+    if args.metrics_file:
+        write_prometheus_metrics(args.trace_file, args.metrics_file, run_id)
+        print(f"📈 Prometheus metrics written to {args.metrics_file}.")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
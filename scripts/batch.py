@@ -0,0 +1,150 @@
+"""
+batch.py
+
+This script handles:
+- Running the pipeline over many PDFs at once.
+- Running the CPU-heavy preprocessing stages (extract, clean, split) in a process pool.
+- Overlapping GenAI extraction and report rendering for finished PDFs in a thread pool,
+  so network waits for earlier PDFs happen while later PDFs are still being parsed.
+- Isolating failures so one bad PDF does not stop the rest of the batch, including with a single worker,
+  where the PDFs are processed one after another in this process.
+- Printing a throughput summary (PDFs/min, per-stage wall time) at the end.
+
+Functions:
+- run_batch(pdf_paths, preprocess_fn, generate_fn, workers, process_fn): Processes a list of PDFs concurrently.
+- print_batch_summary(results, elapsed): Prints throughput and per-stage timings for a batch.
+
+Usage:
+>>> from scripts.batch import run_batch
+>>> results = run_batch(pdf_paths, preprocess_financial_statement, generate_financial_outputs, workers=4)
+"""
+
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+
+
+@dataclass
+class BatchResult:
+    """Outcome of processing a single PDF within a batch."""
+    pdf_path: str
+    ok: bool = False
+    error: str = ""
+    timings: dict = field(default_factory=dict)
+
+
+def _run_generation(generate_fn, pdf_path, segmented_tables, timings):
+    """Runs the GenAI/report stages for one PDF, capturing any failure in the result."""
+    result = BatchResult(pdf_path=pdf_path, timings=dict(timings))
+    try:
+        result.timings.update(generate_fn(pdf_path, segmented_tables))
+        result.ok = True
+    except Exception as e:
+        result.error = f"{type(e).__name__}: {e}"
+        traceback.print_exc()
+    return result
+
+
+def _run_in_process(pdf_path, preprocess_fn, generate_fn, process_fn):
+    """Runs every stage for one PDF in this process, capturing any failure in the result."""
+    if process_fn is None:
+        try:
+            segmented_tables, timings = preprocess_fn(pdf_path)
+        except Exception as e:
+            traceback.print_exc()
+            return BatchResult(pdf_path=pdf_path, error=f"{type(e).__name__}: {e}")
+        return _run_generation(generate_fn, pdf_path, segmented_tables, timings)
+    return _run_generation(lambda path, _: process_fn(path), pdf_path, None, {})
+
+
+def run_batch(pdf_paths, preprocess_fn, generate_fn, workers: int = 4, process_fn=None):
+    """
+    Processes many PDFs concurrently.
+
+    The preprocessing stages run in a process pool (they are CPU bound and hold the GIL),
+    and as soon as a PDF finishes preprocessing its GenAI extraction and report rendering
+    are submitted to a thread pool (they are mostly waiting on the network). With a single worker
+    the PDFs are processed one after another in this process instead, with the same failure
+    isolation and summary.
+
+    Args:
+        pdf_paths (list): Paths of the PDFs to process.
+        preprocess_fn (callable): `preprocess_fn(pdf_path) -> (segmented_tables, timings)`.
+            Must be picklable (a module level function).
+        generate_fn (callable): `generate_fn(pdf_path, segmented_tables) -> timings`.
+        workers (int): Number of worker processes, and of GenAI threads.
+        process_fn (callable): With one worker, `process_fn(pdf_path) -> timings` runs all of a PDF's stages
+            (e.g. the streaming path) instead of `preprocess_fn` followed by `generate_fn`.
+
+    Returns:
+        list[BatchResult]: One result per PDF, in the order of `pdf_paths`.
+    """
+    start = time.perf_counter()
+    results = {}
+
+    if workers <= 1:
+        for pdf_path in pdf_paths:
+            result = _run_in_process(pdf_path, preprocess_fn, generate_fn, process_fn)
+            results[pdf_path] = result
+            if not result.ok:
+                print(f"❌ Failed to process {os.path.basename(pdf_path)}: {result.error}")
+        ordered = [results[path] for path in pdf_paths]
+        print_batch_summary(ordered, time.perf_counter() - start)
+        return ordered
+
+    with ProcessPoolExecutor(max_workers=workers) as cpu_pool, \
+            ThreadPoolExecutor(max_workers=workers) as io_pool:
+        preprocess_futures = {cpu_pool.submit(preprocess_fn, path): path for path in pdf_paths}
+        generation_futures = []
+
+        for future in as_completed(preprocess_futures):
+            pdf_path = preprocess_futures[future]
+            try:
+                segmented_tables, timings = future.result()
+            except Exception as e:
+                print(f"❌ Preprocessing failed for {os.path.basename(pdf_path)}: {e}")
+                results[pdf_path] = BatchResult(pdf_path=pdf_path, error=f"{type(e).__name__}: {e}")
+                continue
+            generation_futures.append(
+                io_pool.submit(_run_generation, generate_fn, pdf_path, segmented_tables, timings)
+            )
+
+        for future in as_completed(generation_futures):
+            result = future.result()
+            results[result.pdf_path] = result
+            if not result.ok:
+                print(f"❌ Failed to process {os.path.basename(result.pdf_path)}: {result.error}")
+
+    ordered = [results[path] for path in pdf_paths]
+    print_batch_summary(ordered, time.perf_counter() - start)
+    return ordered
+
+
+def print_batch_summary(results, elapsed: float):
+    """
+    Prints throughput and per-stage wall time for a finished batch.
+
+    Args:
+        results (list[BatchResult]): Results returned by `run_batch`.
+        elapsed (float): Total wall time of the batch in seconds.
+    """
+    succeeded = [r for r in results if r.ok]
+    failed = [r for r in results if not r.ok]
+    per_minute = len(succeeded) / elapsed * 60 if elapsed > 0 else 0.0
+
+    print("\n📊 Batch summary")
+    print(f"  Processed {len(succeeded)}/{len(results)} PDFs in {elapsed:.1f}s ({per_minute:.2f} PDFs/min)")
+
+    stage_totals, stage_counts = {}, {}
+    for result in results:
+        for stage, seconds in result.timings.items():
+            stage_totals[stage] = stage_totals.get(stage, 0.0) + seconds
+            stage_counts[stage] = stage_counts.get(stage, 0) + 1
+
+    for stage, total in stage_totals.items():
+        print(f"  {stage:<10} total {total:8.2f}s   mean {total / stage_counts[stage]:6.2f}s/PDF")
+
+    for result in failed:
+        print(f"  ❌ {os.path.basename(result.pdf_path)}: {result.error}")
@@ -2,28 +2,230 @@
 config.py
 
 This script:
-- Loads API keys and environment variables from `.env`
+- Loads API keys and environment variables from `.env` (once per process)
 - Ensures that required variables (like GEMINI API key) are set
-- Provides a function to initialize the GenAI client
+- Keeps a process-wide pool of GenAI clients, one per API key, that are reused for every request
+  and rotated round-robin so load is spread across keys
+
+Several keys can be given as a comma separated `GEMINI_KEYS`; a single `GEMINI_KEY` still works.
+`GEMINI_BASE_URL` points the clients at a different endpoint (e.g. a proxy or the benchmarks' mock server).
+A key that hits a rate limit (429) is rested for a cooldown period while the other keys carry on.
+
+Classes:
+- GenAIClientPool: Round-robin pool of reusable clients with per-key usage/quota tracking.
 
 Functions:
-- get_genai_client(): Returns a configured GenAI client instance.
+- load_api_keys(): Returns the configured API keys (reads `.env` on first call only).
+- get_client_pool(): Returns the process-wide GenAIClientPool.
+- get_genai_client(): Returns the next configured GenAI client instance from the pool.
+- record_client_usage(client, tokens) / record_client_error(client, error): Per-key accounting.
+- client_pool_stats(): Per-key usage and connection reuse statistics (None if no client was used).
 """
 
+import functools
+import json
 import os
+import threading
+import time
+from dataclasses import dataclass
+
 from dotenv import load_dotenv
-from google import genai
 
+from scripts.rate_limit import is_rate_limit_error
 
+KEY_COOLDOWN_SECONDS = 60  # How long a key rests after a 429 before it is used again
+HTTP_POOL_SIZE = 16  # Keep-alive connections per key (should cover the extraction concurrency)
+SHARED_SESSION_SDK_VERSION = "1.1.0"  # The google-genai release `_share_session`'s request code was copied from
 
-def get_genai_client():
-    """Returns an authenticated GenAI client instance."""
+
+@functools.lru_cache(maxsize=None)
+def load_api_keys() -> tuple:
+    """Returns the configured API keys, from `GEMINI_KEYS` (comma separated) and/or `GEMINI_KEY`."""
     # Load environment variables from .env file
     load_dotenv()
 
-    # Fetch API key from environment
-    api_key = os.getenv("GEMINI_KEY")
-    if not api_key:
-        raise ValueError("❌ No API key found. Please check your .env file.")
+    keys = [key.strip() for key in os.getenv("GEMINI_KEYS", "").split(",") if key.strip()]
+    single_key = os.getenv("GEMINI_KEY")
+    if single_key and single_key not in keys:
+        keys.append(single_key)
+    return tuple(keys)
+
+
+@dataclass
+class KeyStats:
+    """Usage of a single API key."""
+    requests: int = 0
+    tokens: int = 0
+    rate_limited: int = 0
+    errors: int = 0
+    cooldown_until: float = 0.0
+
+
+def _share_session(client, session):
+    """
+    Makes a client send its requests through one persistent `requests.Session`, so TCP/TLS connections are
+    kept alive between calls. google-genai 1.1.0 opens a new session per request.
+
+    The replacement mirrors that release's private `_request_unauthorized`, so it is only installed on exactly
+    that version; any other version keeps the SDK's own request code (and a new connection per request).
+    """
+    from google import genai
+
+    if getattr(genai, "__version__", None) != SHARED_SESSION_SDK_VERSION:
+        return False
+    api_client = getattr(client, "_api_client", None)
+    if api_client is None or not hasattr(api_client, "_request_unauthorized"):
+        return False
+
+    def request_unauthorized(http_request, stream=False):
+        from google.genai import errors
+        from google.genai._api_client import HttpResponse
+
+        data = http_request.data
+        if data and not isinstance(data, bytes):
+            data = json.dumps(data)
+        response = session.request(method=http_request.method, url=http_request.url, headers=http_request.headers,
+                                   data=data or None, timeout=http_request.timeout, stream=stream)
+        errors.APIError.raise_for_response(response)
+        return HttpResponse(response.headers, response if stream else [response.text])
+
+    api_client._request_unauthorized = request_unauthorized
+    return True
+
+
+class GenAIClientPool:
+    """
+    One reusable GenAI client (and keep-alive HTTP session) per API key, handed out round-robin.
+
+    Args:
+        api_keys (list): The API keys to rotate through.
+        cooldown (float): Seconds a key is skipped for after a rate limit error.
+        base_url (str): Optional endpoint to send requests to instead of the public API.
+    """
+
+    def __init__(self, api_keys, cooldown: float = KEY_COOLDOWN_SECONDS, base_url: str = None):
+        if not api_keys:
+            raise ValueError("❌ No API key found. Please check your .env file.")
+        self._keys = list(api_keys)
+        self._clients = [None] * len(self._keys)
+        self._sessions = [None] * len(self._keys)
+        self._key_stats = [KeyStats() for _ in self._keys]
+        self._index_by_client = {}
+        self._next = 0
+        self._lock = threading.Lock()
+        self.cooldown = cooldown
+        self.base_url = base_url
+        self.clients_created = 0
+        self.checkouts = 0
+
+    def __len__(self):
+        return len(self._keys)
+
+    def _client_for(self, idx):
+        if self._clients[idx] is None:
+            # Imported on first use; the SDK takes a while to load
+            import requests
+            from google import genai
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_SIZE))
+            http_options = {"base_url": self.base_url} if self.base_url else None
+            client = genai.Client(api_key=self._keys[idx], http_options=http_options)
+            if _share_session(client, session):
+                self._sessions[idx] = session
+            self._clients[idx] = client
+            self._index_by_client[id(client)] = idx
+            self.clients_created += 1
+        return self._clients[idx]
+
+    def get_client(self):
+        """Returns the next client in round-robin order, skipping keys that are cooling down after a 429."""
+        with self._lock:
+            now = time.monotonic()
+            order = [(self._next + offset) % len(self._keys) for offset in range(len(self._keys))]
+            available = [idx for idx in order if self._key_stats[idx].cooldown_until <= now]
+            # If every key is resting, use the one that recovers first (the rate limiter/backoff absorbs the wait)
+            idx = available[0] if available else min(order, key=lambda i: self._key_stats[i].cooldown_until)
+            self._next = (idx + 1) % len(self._keys)
+            self.checkouts += 1
+            self._key_stats[idx].requests += 1
+            return self._client_for(idx)
+
+    def record_usage(self, client, tokens: int):
+        """Adds a successful call's token usage to the client's key."""
+        idx = self._index_by_client.get(id(client))
+        if idx is not None:
+            with self._lock:
+                self._key_stats[idx].tokens += tokens
+
+    def record_error(self, client, error):
+        """Counts a failed call against the client's key, resting the key if it was rate limited."""
+        idx = self._index_by_client.get(id(client))
+        if idx is None:
+            return
+        with self._lock:
+            stats = self._key_stats[idx]
+            stats.errors += 1
+            if is_rate_limit_error(error):
+                stats.rate_limited += 1
+                stats.cooldown_until = time.monotonic() + self.cooldown
+
+    def stats(self) -> dict:
+        """Per-key usage plus how many HTTP requests reused an already open connection."""
+        connections = http_requests = 0
+        for session in self._sessions:
+            if session is None:
+                continue
+            for adapter in session.adapters.values():
+                for key in adapter.poolmanager.pools.keys():
+                    pool = adapter.poolmanager.pools[key]
+                    connections += pool.num_connections
+                    http_requests += pool.num_requests
+        with self._lock:
+            keys = [{"key": f"…{key[-4:]}", "requests": s.requests, "tokens": s.tokens,
+                     "rate_limited": s.rate_limited, "errors": s.errors}
+                    for key, s in zip(self._keys, self._key_stats)]
+        return {
+            "keys": keys,
+            "clients_created": self.clients_created,
+            "client_reuses": self.checkouts - self.clients_created,
+            "http_requests": http_requests,
+            "connections_opened": connections,
+            "connections_reused": http_requests - connections,
+        }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_client_pool() -> GenAIClientPool:
+    """Returns the process-wide client pool, creating it from the configured keys on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = GenAIClientPool(load_api_keys(), base_url=os.getenv("GEMINI_BASE_URL"))
+        return _pool
+
+
+def get_genai_client():
+    """Returns an authenticated GenAI client instance (the next one in the process-wide pool)."""
+    return get_client_pool().get_client()
+
+
+def record_client_usage(client, tokens: int):
+    """Records a successful call's token usage against its key. Clients not from the pool are ignored."""
+    if _pool is not None:
+        _pool.record_usage(client, tokens)
+
+
+def record_client_error(client, error):
+    """Records a failed call against its key. Clients not from the pool are ignored."""
+    if _pool is not None:
+        _pool.record_error(client, error)
+
 
-    return genai.Client(api_key=api_key)
+def client_pool_stats():
+    """Returns the pool's statistics, or None if no pooled client has been used in this process."""
+    return _pool.stats() if _pool is not None else None
@@ -0,0 +1,221 @@
+"""
+financial_metrics.py
+
+This script handles:
+- Computing key financial metrics locally (revenue, expenses, net income, assets, liabilities, cash flow)
+  from the extracted CSV tables, for every reported period.
+- Deriving liquidity/solvency/profitability ratios and year-over-year changes.
+- Building a compact summary prompt from those metrics plus a few selected total rows, so the summary
+  model no longer has to read every table verbatim.
+
+Everything here is deterministic; no GenAI calls are made.
+
+Functions:
+- load_tables(directory): Reads every CSV in a directory into {table name: (periods, rows)}.
+- compute_metrics(directory): Computes metrics, ratios and year-over-year changes.
+- select_key_rows(directory): Picks the "Total ..." / "Net ..." rows of each table, with the group each sits in.
+- build_compact_prompt(directory): Formats metrics and key rows as a short markdown prompt.
+
+Usage:
+>>> from scripts.financial_metrics import build_compact_prompt
+>>> prompt = build_compact_prompt("data/fwc_sample_financial_statement_1")
+"""
+
+import csv
+import glob
+import os
+import re
+
+from scripts.statement_store import normalise_line_item, parse_number
+
+# Metric name -> line item patterns (matched against normalised labels, first match wins)
+METRIC_PATTERNS = {
+    "Revenue": [r"^total revenue$", r"^total income$", r"^revenue$"],
+    "Total expenses": [r"^total expenses$"],
+    "Net income": [r"^surplus deficit for the year$", r"^net (income|profit|surplus)", r"^profit for the year$",
+                   r"^surplus for the year$"],
+    "Total comprehensive income": [r"^total comprehensive income"],
+    "Current assets": [r"^total current assets$"],
+    "Total assets": [r"^total assets$"],
+    "Current liabilities": [r"^total current liabilities$"],
+    "Total liabilities": [r"^total liabilities$"],
+    "Net assets": [r"^net assets$"],
+    "Total equity": [r"^total equity$"],
+    "Cash": [r"^cash and cash equivalents$", r"^cash and cash equivalents at the end"],
+    "Operating cash flow": [r"^net cash (from|used in|provided by) operating activities$"],
+}
+
+
+def load_tables(directory: str) -> dict:
+    """
+    Reads every CSV in a directory.
+
+    Returns:
+        dict: table name -> (period labels, list of (label, [values per period])).
+    """
+    tables = {}
+    for path in sorted(glob.glob(os.path.join(directory, "*.csv"))):
+        with open(path, "r", encoding="utf-8") as f:
+            rows = list(csv.reader(f))
+        if not rows:
+            continue
+        periods = [header.strip() for header in rows[0][1:]]
+        parsed = []
+        for row in rows[1:]:
+            if not row:
+                continue
+            values = [parse_number(row[i + 1]) if i + 1 < len(row) and row[i + 1].strip() else None
+                      for i in range(len(periods))]
+            parsed.append((row[0].strip(), values))
+        tables[os.path.splitext(os.path.basename(path))[0]] = (periods, parsed)
+    return tables
+
+
+def _find_metric(tables: dict, patterns: list):
+    """Returns (periods, values) of the first row whose label matches one of the patterns, or None."""
+    for pattern in patterns:
+        for periods, rows in tables.values():
+            for label, values in rows:
+                if re.search(pattern, normalise_line_item(label)) and any(v is not None for v in values):
+                    return periods, values
+    return None
+
+
+def _ratio(numerator, denominator):
+    if numerator is None or denominator in (None, 0):
+        return None
+    return numerator / denominator
+
+
+def compute_metrics(directory: str) -> dict:
+    """
+    Computes key metrics, ratios and year-over-year changes from a PDF's extracted CSVs.
+
+    Periods are taken from the table headers, most recent first (e.g. "Last Year", "Previous Year").
+
+    Returns:
+        dict: {"periods": [...], "metrics": {name: [value per period]}, "ratios": {name: [...]},
+               "changes": {name: fractional change from the previous period to the latest}}
+    """
+    tables = load_tables(directory)
+    periods, metrics = [], {}
+    for name, patterns in METRIC_PATTERNS.items():
+        found = _find_metric(tables, patterns)
+        if found is None:
+            continue
+        found_periods, values = found
+        if len(found_periods) > len(periods):
+            periods = found_periods
+        metrics[name] = values
+
+    width = len(periods)
+
+    def column(name, i):
+        values = metrics.get(name, [])
+        return values[i] if i < len(values) else None
+
+    ratios = {name: [] for name in ("Current ratio", "Debt to equity", "Net margin", "Expense ratio", "Equity ratio")}
+    for i in range(width):
+        ratios["Current ratio"].append(_ratio(column("Current assets", i), column("Current liabilities", i)))
+        ratios["Debt to equity"].append(_ratio(column("Total liabilities", i),
+                                               column("Total equity", i) or column("Net assets", i)))
+        ratios["Net margin"].append(_ratio(column("Net income", i), column("Revenue", i)))
+        ratios["Expense ratio"].append(_ratio(column("Total expenses", i), column("Revenue", i)))
+        ratios["Equity ratio"].append(_ratio(column("Total equity", i) or column("Net assets", i),
+                                             column("Total assets", i)))
+    ratios = {name: values for name, values in ratios.items() if any(v is not None for v in values)}
+
+    changes = {}
+    if width >= 2:
+        for name, values in metrics.items():
+            latest, previous = values[0], values[1] if len(values) > 1 else None
+            if latest is not None and previous not in (None, 0):
+                changes[name] = (latest - previous) / abs(previous)
+
+    return {"periods": periods, "metrics": metrics, "ratios": ratios, "changes": changes}
+
+
+def _group_key(label: str) -> str:
+    return normalise_line_item(label).replace(" ", "")
+
+
+def select_key_rows(directory: str) -> dict:
+    """
+    Returns, per table, the rows whose labels start with "Total" or "Net" (the subtotals worth quoting).
+
+    Each total comes with the label of the group it belongs to, found the way `validate.check_sums` groups
+    rows: rows without values open a group, and "Total <header>" closes it. A total that closes a group gets
+    the group around it (e.g. "Total Cash Received" within operating activities), and any other total the
+    group it is in (e.g. a bare "Total" under "Current Assets"), so repeated labels can be told apart.
+    "Net ..." rows name what they are, so they get no group.
+
+    Returns:
+        dict: table name -> (period labels, list of (group label or "", label, [values per period])).
+    """
+    selected = {}
+    for table_name, (periods, rows) in load_tables(directory).items():
+        keep, groups = [], []  # groups: labels of the open subtable headers, outermost first
+        for label, values in rows:
+            key = _group_key(label)
+            if not any(v is not None for v in values):
+                if not key.startswith("total"):  # An empty total (e.g. "Total Cash Used" with no values) isn't a header
+                    groups.append(label)
+                continue
+            if key.startswith("total"):
+                closes = next((idx for idx in range(len(groups) - 1, -1, -1)
+                               if _group_key(groups[idx]) == key[len("total"):]), None)
+                if closes is None:
+                    keep.append((groups[-1] if groups else "", label, values))
+                else:
+                    keep.append((groups[closes - 1] if closes else "", label, values))
+                    del groups[closes:]
+            elif re.match(r"^net\b", normalise_line_item(label)):
+                keep.append(("", label, values))
+        if keep:
+            selected[table_name] = (periods, keep)
+    return selected
+
+
+def _fmt(value, percent=False):
+    if value is None:
+        return "n/a"
+    if percent:
+        return f"{value * 100:.1f}%"
+    return f"{value:,.2f}" if abs(value) < 100 else f"{value:,.0f}"
+
+
+def build_compact_prompt(directory: str) -> str:
+    """
+    Formats locally computed metrics, ratios, year-over-year changes and each table's total rows as
+    short markdown tables, to send to the summary model instead of every CSV in full.
+    """
+    result = compute_metrics(directory)
+    periods = result["periods"] or ["Value"]
+    lines = ["### Key Metrics ###", "| Metric | " + " | ".join(periods) + " | Change |",
+             "|---|" + "---|" * len(periods) + "---|"]
+    for name, values in result["metrics"].items():
+        cells = [_fmt(values[i] if i < len(values) else None) for i in range(len(periods))]
+        change = _fmt(result["changes"].get(name), percent=True)
+        lines.append(f"| {name} | " + " | ".join(cells) + f" | {change} |")
+
+    if result["ratios"]:
+        lines += ["", "### Ratios ###", "| Ratio | " + " | ".join(periods) + " |", "|---|" + "---|" * len(periods)]
+        for name, values in result["ratios"].items():
+            percent = name in ("Net margin", "Expense ratio", "Equity ratio")
+            lines.append(f"| {name} | " + " | ".join(_fmt(v, percent) for v in values) + " |")
+
+    metric_patterns = [pattern for patterns in METRIC_PATTERNS.values() for pattern in patterns]
+    for table_name, (table_periods, rows) in select_key_rows(directory).items():
+        # Rows already shown as key metrics aren't repeated
+        rows = [(group, label, values) for group, label, values in rows
+                if not any(re.search(pattern, normalise_line_item(label)) for pattern in metric_patterns)]
+        if not rows:
+            continue
+        lines += ["", f"### {table_name.replace('_', ' ').title()} (totals) ###",
+                  "," + ",".join(table_periods)]
+        for group, label, values in rows:
+            # Totals are prefixed with their group, since e.g. "Total Cash Received" recurs once per activity
+            name = f"{group} > {label}" if group else label
+            lines.append(f'"{name}",' + ",".join("" if v is None else f"{v:.0f}" for v in values))
+
+    return "\n".join(lines) + "\n"
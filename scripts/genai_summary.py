@@ -9,7 +9,12 @@ This script handles:
 
 Functions:
 - read_csv_files(directory): Reads all CSV files from a given directory and returns them as a single formatted string.
-- generate_summary_report(tables): Uses GenAI to generate a financial summary based on extracted CSV data.
+- build_summary_prompt(directory, mode): Builds the summary prompt: every table in full, the compact locally
+  computed metrics (see `financial_metrics.py`), or only the retrieved relevant rows (see `retrieval.py`).
+- generate_summary_report(tables, instruction, stream_to): Uses GenAI to generate a financial summary based on extracted
+  CSV data, optionally streaming the Markdown into a file as it is generated.
+- answer_question(question, data_root, companies, k): Answers an ad-hoc question from the top-k retrieved chunks
+  across every processed PDF.
 - save_markdown_to_pdf(markdown_text, output_path, debug): Saves the summary report as a PDF file.
 
 Usage:
@@ -21,10 +26,33 @@ Usage:
 
 
 import glob
-import google.genai.types as types
+import time
 import os 
-from scripts.config import get_genai_client
-from markdown_pdf import MarkdownPdf, Section
+from scripts.config import get_genai_client, record_client_usage
+from scripts.financial_metrics import build_compact_prompt
+from scripts.llm_stream import stream_generate, StreamAbortedError, STALL_TIMEOUT
+from scripts.rate_limit import estimate_tokens
+from scripts.render import render_report
+from scripts.retrieval import build_question_prompt, build_retrieval_prompt, QUESTION_TOP_K
+from scripts.response_cache import lookup_response, store_response
+from scripts.tracing import current_span
+
+SUMMARY_MODEL = "gemini-2.0-flash"
+SUMMARY_INSTRUCTION = ("Generate a summary report in markdown that highlights the financial health of the company, given the following tables. The report should include:"
+    "Key financial metrics (revenue, net income, etc.). You can display this in markdown tables, with an extra column for notes."
+    "Any notable trends or observations"
+    "A short narrative summary in natural language at the end.")
+# In compact mode the metrics arrive pre-computed, so the model only has to interpret them
+COMPACT_SUMMARY_INSTRUCTION = (SUMMARY_INSTRUCTION + " The key metrics, ratios and year-over-year changes have already"
+    " been computed from the full statements; use them as given rather than recalculating them.")
+# In retrieval mode only the rows most relevant to the report are sent (see `scripts/retrieval.py`)
+RETRIEVAL_SUMMARY_INSTRUCTION = (SUMMARY_INSTRUCTION + " Only the table rows most relevant to the report are given,"
+    " grouped by table under their header rows; base the report on them and don't speculate about rows not shown.")
+QUESTION_INSTRUCTION = ("Answer the question using only the financial statement excerpts below, which are grouped by"
+    " table and company. Name the company and table each figure comes from, and say so if the excerpts don't"
+    " contain the answer.")
+SUMMARY_MODES = ("full", "compact", "retrieval")
+SUMMARY_STREAM_RETRIES = 2  # Streamed summaries abandoned as stalled are restarted this many times
 
 def read_csv_files(directory="../data"):
     """
@@ -48,70 +76,132 @@ def read_csv_files(directory="../data"):
     return all_csv_text
 
 
-def generate_summary_report(tables: str):
+def build_summary_prompt(directory: str, mode: str = "full"):
+    """
+    Builds the contents and system instruction of the summary request for one PDF's tables.
+
+    Args:
+        directory (str): The directory containing the PDF's CSV files.
+        mode (str): "full" sends every table verbatim; "compact" sends locally computed metrics, ratios,
+            year-over-year changes and each table's total rows instead; "retrieval" sends only the rows the
+            PDF's retrieval index ranks highest for each thing the report covers.
+
+    Returns:
+        tuple: (contents, system instruction)
+    """
+    if mode == "full":
+        return read_csv_files(directory), SUMMARY_INSTRUCTION
+    if mode == "compact":
+        contents, instruction = build_compact_prompt(directory), COMPACT_SUMMARY_INSTRUCTION
+    elif mode == "retrieval":
+        contents, instruction = build_retrieval_prompt(directory), RETRIEVAL_SUMMARY_INSTRUCTION
+    else:
+        raise ValueError(f"❌ Unknown summary mode '{mode}', expected one of {SUMMARY_MODES}.")
+
+    full_tokens = estimate_tokens(SUMMARY_INSTRUCTION, read_csv_files(directory))
+    tokens = estimate_tokens(instruction, contents)
+    print(f"📉 {mode.capitalize()} summary prompt: ~{tokens} tokens instead of ~{full_tokens} for the full tables "
+          f"({1 - tokens / max(full_tokens, 1):.0%} smaller).")
+    return contents, instruction
+
+
+def _stream_summary(client, config, tables: str, stream_to: str, stall_timeout: float, span):
+    """Streams the summary into `stream_to`, restarting the file if the stream stalls."""
+    for attempt in range(SUMMARY_STREAM_RETRIES + 1):
+        with open(stream_to, "w", encoding="utf-8") as f:
+            def write(text):
+                f.write(text)
+                f.flush()  # So the report can be followed while it is being written
+
+            try:
+                response = stream_generate(client, SUMMARY_MODEL, tables, config, write, stall_timeout)
+            except StreamAbortedError as e:
+                if span is not None:
+                    span.aborted_streams += 1
+                if attempt == SUMMARY_STREAM_RETRIES:
+                    raise
+                print(f"⏳ Summary stream abandoned ({e}), restarting (attempt {attempt+1}/{SUMMARY_STREAM_RETRIES})")
+                continue
+        print(f"⚡ First summary output after {response.first_chunk_seconds or 0:.1f}s, streamed to {stream_to}")
+        return response
+
+
+def generate_summary_report(tables: str, instruction: str = SUMMARY_INSTRUCTION, stream_to: str = None,
+                            stall_timeout: float = STALL_TIMEOUT):
     """
     Generates a financial summary report using GenAI based on structured CSV data.
 
     Args:
-        tables (str): The formatted CSV data as a single string.
+        tables (str): The formatted CSV data (or compact metrics) as a single string.
+        instruction (str): The system instruction (default: SUMMARY_INSTRUCTION).
+        stream_to (str): If set, the reply is streamed and its Markdown written to this file as it arrives
+            (cached replies are not written; the caller saves the returned text either way).
+        stall_timeout (float): With `stream_to`, seconds without a chunk before the stream is abandoned and restarted.
 
     Returns:
-        google.genai.types.GenerateContentResponse: The GenAI-generated markdown response.
+        google.genai.types.GenerateContentResponse: The GenAI-generated markdown response
+        (a `CachedResponse` if this exact request was answered before, or a `StreamedResponse` with `stream_to`).
     """
+    cached = lookup_response(SUMMARY_MODEL, instruction, tables)
+    span = current_span()
+    if cached is not None:
+        print("♻️ Reusing cached summary report (no tokens used).")
+        if span is not None:
+            span.cache_hits += 1
+        return cached
+
+    import google.genai.types as types  # Imported on first use; the SDK takes a while to load
 
     client = get_genai_client()
     
-    response =  client.models.generate_content(
-    model="gemini-2.0-flash", 
-    config=types.GenerateContentConfig(
-        system_instruction="Generate a summary report in markdown that highlights the financial health of the company, given the following tables. The report should include:"
-        "Key financial metrics (revenue, net income, etc.). You can display this in markdown tables, with an extra column for notes."
-        "Any notable trends or observations"
-        "A short narrative summary in natural language at the end."
-        ),
-    contents=tables,
-    )
-
-    print(f"Used {response.usage_metadata.total_token_count} tokens in total to generate summary report.")
-
+    config = types.GenerateContentConfig(system_instruction=instruction)
+
+    start = time.perf_counter()
+    if stream_to:
+        response = _stream_summary(client, config, tables, stream_to, stall_timeout, span)
+    else:
+        response = client.models.generate_content(model=SUMMARY_MODEL, config=config, contents=tables)
+    latency = time.perf_counter() - start
+
+    usage = getattr(response, "usage_metadata", None)  # None for a streamed reply whose chunks reported no usage
+    total_tokens = getattr(usage, "total_token_count", 0) or 0
+    record_client_usage(client, total_tokens)
+    if span is not None:
+        span.record_llm_call(usage)
+    print(f"Used {total_tokens} tokens in total ({getattr(usage, 'prompt_token_count', 0) or 0} prompt) "
+          f"to generate summary report in {latency:.1f}s.")
+
+    store_response(SUMMARY_MODEL, instruction, tables, response)
     return response
 
 
-def save_markdown_to_pdf(markdown_text, output_path="../reports/summary_report.pdf", debug=False):
+def answer_question(question: str, data_root: str = "data", companies=None, k: int = QUESTION_TOP_K):
     """
-    Converts Markdown text to a PDF with proper formatting and saves it.
+    Answers an ad-hoc question about the processed filings, sending GenAI only the question's top `k`
+    retrieved chunks across every company (see `scripts/retrieval.py`) rather than every table.
 
     Args:
-        markdown_text (str): The markdown-formatted summary report.
-        output_path (str): The file path to save the generated PDF (default: "../reports/summary_report.pdf").
-        debug (bool): If True, prevents overwriting existing files by creating unique filenames.
+        question (str): The question, e.g. "Which company had the largest increase in cash?".
+        data_root (str): Directory holding one data directory per processed PDF.
+        companies (list): Only search these companies' data (default: all).
+        k (int): Number of chunks to send.
 
     Returns:
-        None
+        The GenAI response (`.text` is the Markdown answer), as for `generate_summary_report`.
     """
-    # Ensure the markdown starts with a Level 1 header (H1) to prevent TOC errors
-    if not markdown_text.strip().startswith("# "):
-        markdown_text = "# Financial Summary Report\n\n" + markdown_text  # Add default title
-
+    return generate_summary_report(build_question_prompt(question, data_root, companies, k), QUESTION_INSTRUCTION)
 
-    # If debug mode is on, check if the file exists and create a unique filename
-    if debug and os.path.exists(output_path):
-        base, ext = os.path.splitext(output_path)  # Split filename and extension
-        counter = 1
 
-        # Keep incrementing filename until we find a free one
-        while os.path.exists(f"{base}{counter}{ext}"):
-            counter += 1
-
-        output_path = f"{base}{counter}{ext}"
-
-
-    pdf = MarkdownPdf(toc_level=3)  # Include headings up to level 3 in TOC
-
-    # Add the markdown content as a section
-    pdf.add_section(Section(markdown_text))
+def save_markdown_to_pdf(markdown_text, output_path="../reports/summary_report.pdf", debug=False):
+    """
+    Converts Markdown text to a PDF with proper formatting and saves it (see `scripts/render.py`).
 
-    # Save the PDF
-    pdf.save(output_path)
+    Args:
+        markdown_text (str): The markdown-formatted summary report.
+        output_path (str): The file path to save the generated PDF (default: "../reports/summary_report.pdf").
+        debug (bool): If True, prevents overwriting existing files by creating unique filenames.
 
-    print(f"✅ Summary saved as {output_path}")
\ No newline at end of file
+    Returns:
+        str: The path the PDF was actually saved to (differs from `output_path` in debug mode if it already existed).
+    """
+    return render_report(markdown_text, output_path, fmt="pdf", unique=debug)
\ No newline at end of file
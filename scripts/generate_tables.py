@@ -7,10 +7,19 @@ This script handles:
 - Saving structured CSVs to the `/data` directory.
 
 Functions:
-- gemini_financial_extraction(tabular_text, model): Calls GenAI to extract structured financial tables.
+- gemini_financial_extraction(tabular_text, model, client, stream): Calls GenAI to extract structured financial tables.
+- gemini_financial_extraction_async(tabular_text, model, client): Async version of the above.
+- extract_tables_async(segmented_tables, ...): Extracts all tables concurrently under a rate limit, with retries.
+- extract_tables_batched_async(segmented_tables, ...): Extracts all tables in as few requests as possible using a
+  declared response schema, falling back to per-section requests for tables that fail.
 - clean_json_response(text): Ensures valid JSON extraction by stripping unnecessary formatting.
+- has_table(text): Checks that a per-section reply parses into a non-empty table (only such replies are cached).
 - save_csv(table_name, csv_content, directory): Saves structured CSV data properly.
-- process_and_save_tables(segmented_tables): Processes all tables, extracts financial data, and saves CSVs.
+- process_and_save_tables(segmented_tables, output_dir, mode, local_parser, stream): Processes all tables, extracts financial data,
+  and saves CSVs. Well-formed sections are parsed locally (`scripts/local_tables.py`), near-duplicates of sections
+  extracted before reuse that extraction (`scripts/section_index.py`), and only the rest go to GenAI.
+  With `stream`, replies are streamed and checked as they arrive (`scripts/llm_stream.py`), so stalled or
+  malformed replies are abandoned and retried early.
 
 Usage:
 >>> from scripts.generate_tables import process_and_save_tables
@@ -20,39 +29,351 @@ Usage:
 
 
 from dotenv import load_dotenv
+import asyncio
+import csv
+import io
 import os
-import google.genai.types as types
+import functools
 import json
 import re
+import threading
 
-from scripts.config import get_genai_client
+from scripts.config import get_genai_client, load_api_keys, record_client_usage, record_client_error
+from scripts.rate_limit import RateLimiter, estimate_tokens, is_retryable_error, backoff_delay
+from scripts.local_tables import parse_section, MIN_CONFIDENCE
+from scripts.llm_stream import stream_generate, ExtractionStreamParser, StreamAbortedError, STALL_TIMEOUT
+from scripts.response_cache import lookup_response, store_response
+from scripts.section_index import plan_reuse, remember_section, record_reuse
+from scripts.statement_store import remove_company, write_statement
+from scripts.tracing import current_span
+from scripts.validate import validate_csv_data
 
 
 ## Using free tier so 15RPM w/ 1 million context window
-def gemini_financial_extraction(tabular_text: str, model: str = "gemini-2.0-flash"):
+EXTRACTION_MODEL = "gemini-2.0-flash"
+EXTRACTION_INSTRUCTION = "Extract financial information from the following text and return it in a JSON FORMAT with two primary keys:\n 1. `table_name`: (The name of the financial table (e.g 'Income Statement')).\n 2. `csv_data`:The extracted financial data in valid CSV format. .\n Ignore notes if they exist and replace any '-' sections with a 0. DO NOT ADD OR REMOVE NEGATIVE SIGNS THAT DO NOT EXIST."
+REQUESTS_PER_MINUTE = 15
+TOKENS_PER_MINUTE = 1_000_000
+
+# Batched mode: every section of a PDF in one request, answered as JSON matching `batch_response_schema()`
+EXTRACTION_MODES = ("per-section", "batched")
+BATCH_EXTRACTION_INSTRUCTION = (EXTRACTION_INSTRUCTION + "\n The text contains several sections, each starting with a"
+    " line like '=== SECTION 0 ==='. Return one item per financial table, with `section_index` set to the number of"
+    " the section it came from.")
+# gemini-2.0-flash replies are capped at 8192 tokens and the CSVs are about as long as the sections,
+# so large PDFs are split across several batched requests
+BATCH_MAX_TOKENS = 6000
+
+# Shared by every extraction in this process so concurrent PDFs (batch mode) share one quota
+_default_limiter = None
+_default_limiter_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=None)
+def batch_response_schema():
+    """The response schema of batched extraction: a list of {section_index, table_name, csv_data}."""
+    import google.genai.types as types  # Imported on first use; the SDK takes a while to load
+
+    return types.Schema(
+        type=types.Type.ARRAY,
+        items=types.Schema(
+            type=types.Type.OBJECT,
+            properties={
+                "section_index": types.Schema(type=types.Type.INTEGER),
+                "table_name": types.Schema(type=types.Type.STRING),
+                "csv_data": types.Schema(type=types.Type.STRING),
+            },
+            required=["section_index", "table_name", "csv_data"],
+        ),
+    )
+
+
+def get_default_limiter():
+    """Returns the process-wide rate limiter (free tier limits, times the number of API keys in rotation)."""
+    global _default_limiter
+    with _default_limiter_lock:
+        if _default_limiter is None:
+            keys = max(len(load_api_keys()), 1)
+            _default_limiter = RateLimiter(REQUESTS_PER_MINUTE * keys, TOKENS_PER_MINUTE * keys)
+        return _default_limiter
+
+
+def gemini_financial_extraction(tabular_text: str, model: str = EXTRACTION_MODEL, client=None, stream: bool = False,
+                                stall_timeout: float = STALL_TIMEOUT):
     """
     Extracts financial data from raw table text using GenAI and returns structured JSON.
 
     Args:
         tabular_text (str): The financial table text.
         model (str): The AI model to use (default: "gemini-2.0-flash").
+        client: GenAI client to use (default: a client from `get_genai_client()`).
+        stream (bool): Stream the reply, raising `StreamAbortedError` as soon as it stalls for `stall_timeout`
+            seconds or can no longer be valid JSON (see `ExtractionStreamParser`).
+        stall_timeout (float): With `stream`, seconds without a chunk before the reply is abandoned.
 
     Returns:
-        google.genai.types.GenerateContentResponse: AI-generated structured financial data in JSON format.
+        google.genai.types.GenerateContentResponse: AI-generated structured financial data in JSON format
+        (or a `CachedResponse` if this exact request was answered before).
     """
-    client = get_genai_client()
-    
-    response =  client.models.generate_content(
-    model=model, 
-    config=types.GenerateContentConfig(
-        system_instruction="Extract financial information from the following text and return it in a JSON FORMAT with two primary keys:\n 1. `table_name`: (The name of the financial table (e.g 'Income Statement')).\n 2. `csv_data`:The extracted financial data in valid CSV format. .\n Ignore notes if they exist and replace any '-' sections with a 0. DO NOT ADD OR REMOVE NEGATIVE SIGNS THAT DO NOT EXIST.",
-        ),
-    contents=tabular_text
-    )
+    cached = lookup_response(model, EXTRACTION_INSTRUCTION, tabular_text)
+    if cached is not None:
+        return cached
+
+    import google.genai.types as types
 
+    client = client or get_genai_client()
+    config = types.GenerateContentConfig(system_instruction=EXTRACTION_INSTRUCTION)
+
+    if stream:
+        response = stream_generate(client, model, tabular_text, config, ExtractionStreamParser(tabular_text).feed,
+                                   stall_timeout)
+    else:
+        response = client.models.generate_content(model=model, config=config, contents=tabular_text)
+
+    record_client_usage(client, getattr(response.usage_metadata, "total_token_count", 0) or 0)
+    if has_table(response.text):
+        store_response(model, EXTRACTION_INSTRUCTION, tabular_text, response)
     return response
 
 
+async def gemini_financial_extraction_async(tabular_text: str, model: str = EXTRACTION_MODEL, client=None, config=None):
+    """
+    Async version of `gemini_financial_extraction`, using the client's `aio` interface.
+
+    `config` overrides the default request config (e.g. to declare a response schema).
+    """
+    import google.genai.types as types
+
+    client = client or get_genai_client()
+
+    return await client.aio.models.generate_content(
+        model=model,
+        config=config or types.GenerateContentConfig(system_instruction=EXTRACTION_INSTRUCTION),
+        contents=tabular_text,
+    )
+
+
+async def _generate_with_retry(label, contents, config, client, limiter, semaphore, max_retries, model,
+                               stream=False, stall_timeout=STALL_TIMEOUT, make_parser=None, accept=None):
+    """
+    Sends one request, waiting on the rate limiter and backing off on 429/5xx errors.
+
+    With `stream`, the reply is streamed in a worker thread (see `stream_generate`) and fed to a fresh
+    `make_parser()` per attempt, so stalled or malformed replies are abandoned and retried early.
+    The reply is only cached if `accept(response)` is true (default: always), so an unusable reply is
+    requested again on the next run instead of being served from the cache.
+    """
+    instruction = config.system_instruction
+    span = current_span()
+    cached = lookup_response(model, instruction, contents)
+    if cached is not None:  # Cache hits skip the limiter entirely
+        if span is not None:
+            span.cache_hits += 1
+        return cached
+
+    estimated = estimate_tokens(instruction, contents) * 2  # prompt + a similarly sized reply
+
+    async with semaphore:
+        for attempt in range(max_retries + 1):
+            await limiter.acquire(estimated)
+            # Without an explicit client, each attempt takes the next pooled client, so retries move to another key
+            request_client = client or get_genai_client()
+            try:
+                if stream:
+                    parser = make_parser() if make_parser is not None else None
+                    response = await asyncio.to_thread(stream_generate, request_client, model, contents, config,
+                                                       parser.feed if parser is not None else None, stall_timeout)
+                else:
+                    response = await gemini_financial_extraction_async(contents, model=model, client=request_client, config=config)
+            except Exception as e:
+                record_client_error(request_client, e)
+                if isinstance(e, StreamAbortedError) and span is not None:
+                    span.aborted_streams += 1
+                if not is_retryable_error(e) or attempt == max_retries:
+                    print(f"❌ Extraction failed for {label}: {e}")
+                    return None
+                delay = backoff_delay(attempt)
+                if span is not None:
+                    span.retries += 1
+                print(f"⏳ {label.capitalize()} hit {type(e).__name__}, retrying in {delay:.1f}s (attempt {attempt+1}/{max_retries})")
+                await asyncio.sleep(delay)
+                continue
+
+            usage = getattr(response, "usage_metadata", None)
+            actual = getattr(usage, "total_token_count", 0) or 0
+            limiter.record_usage(estimated, actual)
+            record_client_usage(request_client, actual)
+            if span is not None:
+                span.record_llm_call(usage)
+            if accept is None or accept(response):
+                store_response(model, instruction, contents, response)
+            return response
+
+
+async def _extract_with_retry(idx, tabular_text, client, limiter, semaphore, max_retries, model,
+                              stream=False, stall_timeout=STALL_TIMEOUT):
+    """Extracts one table, waiting on the rate limiter and backing off on 429/5xx errors."""
+    import google.genai.types as types
+
+    config = types.GenerateContentConfig(system_instruction=EXTRACTION_INSTRUCTION)
+    return await _generate_with_retry(f"table {idx+1}", tabular_text, config, client, limiter, semaphore,
+                                      max_retries, model, stream, stall_timeout,
+                                      functools.partial(ExtractionStreamParser, tabular_text),
+                                      accept=lambda response: has_table(response.text))
+
+
+async def extract_tables_async(segmented_tables, client=None, limiter=None, max_concurrency: int = 4,
+                               max_retries: int = 5, model: str = EXTRACTION_MODEL, stream: bool = False,
+                               stall_timeout: float = STALL_TIMEOUT):
+    """
+    Sends every table to GenAI concurrently, bounded by a concurrency cap and a RPM/TPM rate limiter.
+
+    `segmented_tables` may be a list or a lazy iterator (e.g. `stream_sections(...)`); iterators are pulled
+    in a worker thread so each table's request starts as soon as it is produced, while the iterator keeps
+    parsing the rest of the document.
+
+    Args:
+        segmented_tables (iterable): Table text segments to process.
+        client: GenAI client (or a compatible fake) exposing `client.aio.models.generate_content`, or
+            `client.models.generate_content_stream` with `stream` (default: a pooled client per request,
+            rotating across API keys).
+        limiter (RateLimiter): Rate limiter to respect (default: the shared process-wide limiter).
+        max_concurrency (int): Maximum number of requests in flight at once.
+        max_retries (int): Retries per table on rate limit / server errors.
+        model (str): The AI model to use.
+        stream (bool): Stream each reply, checking it as it arrives (see `ExtractionStreamParser`).
+        stall_timeout (float): With `stream`, seconds without a chunk before a reply is abandoned and retried.
+
+    Returns:
+        list: One response per table, in section order (None for tables that failed).
+    """
+    limiter = limiter or get_default_limiter()
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    if isinstance(segmented_tables, (list, tuple)):
+        tasks = [
+            _extract_with_retry(idx, table_text, client, limiter, semaphore, max_retries, model, stream, stall_timeout)
+            for idx, table_text in enumerate(segmented_tables)
+        ]
+        return await asyncio.gather(*tasks)  # gather preserves input order
+
+    tasks = []
+    iterator = iter(segmented_tables)
+    while True:
+        table_text = await asyncio.to_thread(next, iterator, None)
+        if table_text is None:
+            break
+        tasks.append(asyncio.create_task(
+            _extract_with_retry(len(tasks), table_text, client, limiter, semaphore, max_retries, model, stream,
+                                stall_timeout)
+        ))
+    return await asyncio.gather(*tasks)
+
+
+def _batch_sections(segmented_tables, max_tokens: int = BATCH_MAX_TOKENS):
+    """Groups consecutive section indices so each group's text stays under `max_tokens` (one section minimum)."""
+    groups, current, current_tokens = [], [], 0
+    for idx, table_text in enumerate(segmented_tables):
+        tokens = estimate_tokens(table_text)
+        if current and current_tokens + tokens > max_tokens:
+            groups.append(current)
+            current, current_tokens = [], 0
+        current.append(idx)
+        current_tokens += tokens
+    if current:
+        groups.append(current)
+    return groups
+
+
+def parse_batched_response(text: str, section_indices):
+    """
+    Parses a batched extraction reply (a JSON list matching `batch_response_schema()`) without any regex scraping.
+
+    Args:
+        text (str): The reply text.
+        section_indices (list): The section indices that were sent in the request.
+
+    Returns:
+        dict: section index -> list of (table_name, csv_data). Sections with no usable table are absent.
+    """
+    try:
+        items = json.loads(text)
+    except (TypeError, json.JSONDecodeError):
+        return {}
+    if not isinstance(items, list):
+        return {}
+
+    tables = {}
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        idx, table_name, csv_data = item.get("section_index"), item.get("table_name"), item.get("csv_data")
+        if idx not in section_indices or not isinstance(table_name, str) or not isinstance(csv_data, str):
+            continue
+        if csv_data.strip():
+            tables.setdefault(idx, []).append((table_name, csv_data))
+    return tables
+
+
+async def extract_tables_batched_async(segmented_tables, client=None, limiter=None, max_concurrency: int = 4,
+                                       max_retries: int = 5, model: str = EXTRACTION_MODEL,
+                                       max_batch_tokens: int = BATCH_MAX_TOKENS, stream: bool = False,
+                                       stall_timeout: float = STALL_TIMEOUT):
+    """
+    Extracts every table in as few requests as possible: all sections go in one request (or one per
+    `max_batch_tokens` of text) with a declared JSON response schema, so the reply parses directly.
+    Sections missing from (or malformed in) a batched reply are retried one at a time with the
+    per-section prompt.
+
+    Args:
+        segmented_tables (iterable): Table text segments to process (materialised into a list).
+        client, limiter, max_concurrency, max_retries, model, stream, stall_timeout: As for `extract_tables_async`
+            (batched replies are only checked for stalls while streaming, as they are parsed once complete).
+        max_batch_tokens (int): Approximate maximum section text per batched request.
+
+    Returns:
+        list: One list of (table_name, csv_data) per section, in section order (empty for tables that failed).
+    """
+    import google.genai.types as types
+
+    segmented_tables = list(segmented_tables)
+    limiter = limiter or get_default_limiter()
+    semaphore = asyncio.Semaphore(max_concurrency)
+    config = types.GenerateContentConfig(
+        system_instruction=BATCH_EXTRACTION_INSTRUCTION,
+        response_mime_type="application/json",
+        response_schema=batch_response_schema(),
+    )
+
+    async def extract_group(indices):
+        contents = "\n".join(f"=== SECTION {idx} ===\n{segmented_tables[idx]}" for idx in indices)
+        label = f"tables {indices[0]+1}-{indices[-1]+1}"
+        response = await _generate_with_retry(label, contents, config, client, limiter, semaphore, max_retries, model,
+                                              stream, stall_timeout,
+                                              accept=lambda response: bool(parse_batched_response(response.text, indices)))
+        return parse_batched_response(response.text, indices) if response is not None else {}
+
+    tables = {}
+    for group_tables in await asyncio.gather(*(extract_group(g) for g in _batch_sections(segmented_tables, max_batch_tokens))):
+        tables.update(group_tables)
+
+    missing = [idx for idx in range(len(segmented_tables)) if idx not in tables]
+    if missing:
+        print(f"⚠️ {len(missing)} of {len(segmented_tables)} tables missing from the batched reply, "
+              f"extracting them one at a time.")
+        responses = await asyncio.gather(*(
+            _extract_with_retry(idx, segmented_tables[idx], client, limiter, semaphore, max_retries, model, stream,
+                                stall_timeout)
+            for idx in missing
+        ))
+        for idx, response in zip(missing, responses):
+            table = _parse_table_response(idx, response)
+            if table is not None:
+                tables[idx] = [table]
+
+    return [tables.get(idx, []) for idx in range(len(segmented_tables))]
+
+
 def clean_json_response(text):
     """
     Extracts valid JSON content from AI-generated text by removing markdown code blocks and unnecessary formatting.
@@ -74,8 +395,29 @@ def clean_json_response(text):
     return None
 
 
+def has_table(text) -> bool:
+    """True if a per-section extraction reply holds a JSON object with a non-empty `csv_data`."""
+    json_data = clean_json_response(text or "")
+    if not json_data:
+        return False
+    try:
+        parsed_data = json.loads(json_data)
+    except json.JSONDecodeError:
+        return False
+    return isinstance(parsed_data, dict) and bool(str(parsed_data.get("csv_data") or "").strip())
+
+
+def _store_location(directory: str):
+    """Returns (company, store root) of the statement store partitions for an output directory."""
+    directory = os.path.normpath(directory)
+    return os.path.basename(directory), os.path.join(os.path.dirname(directory), "statement_store")
+
+
 def save_csv(table_name: str, csv_content: str, directory: str):
-    """Saves extracted CSV data to a file in the specified directory."""
+    """
+    Saves extracted CSV data to a file in the specified directory, and adds it to the columnar
+    statement store next to it (`<directory>/../statement_store/`) for cross-company queries.
+    """
     safe_table_name = table_name.replace(" ", "_").lower()
     file_path = os.path.join(directory, f"{safe_table_name}.csv")
 
@@ -84,29 +426,204 @@ def save_csv(table_name: str, csv_content: str, directory: str):
 
     print(f"✅ Saved: {file_path}")
 
-def process_and_save_tables(segmented_tables, output_dir: str):
+    company, store_root = _store_location(directory)
+    try:
+        write_statement(company, safe_table_name, csv_content, root=store_root)
+    except ImportError:
+        print("⚠️ pyarrow is not installed, so the table was not added to the statement store.")
+
+def _parse_table_response(idx, response):
+    """Parses a per-section extraction reply into (table_name, csv_data), or None if it has no usable JSON."""
+    if response is None:
+        return None
+
+    json_data = clean_json_response(response.text)
+
+    if not json_data:
+        print(f"❌ No valid JSON found for table {idx+1}")
+        return None
+
+    try:
+        parsed_data = json.loads(json_data)
+    except json.JSONDecodeError:
+        print(f"❌ Failed to parse JSON for table {idx+1}")
+        return None
+    return parsed_data.get("table_name", f"financial_table_{idx+1}"), parsed_data.get("csv_data", "")
+
+
+def _split_local_sections(segmented_tables, local_tables: dict, remote_indices: list, min_confidence: float):
+    """
+    Parses each section locally, keeping confident parses in `local_tables` (section index -> LocalTable)
+    and yielding the remaining sections for GenAI, whose indices are appended to `remote_indices`.
+    Lazy, so streamed sections still reach GenAI as soon as they are produced.
+    """
+    for idx, table_text in enumerate(segmented_tables):
+        table = parse_section(table_text)
+        if table.confidence >= min_confidence:
+            local_tables[idx] = table
+        else:
+            remote_indices.append(idx)
+            yield table_text
+
+
+def _split_reused_sections(sections, section_indices, reused: dict, plans: dict, texts: dict, sent_indices: list,
+                           diff_prompts: bool):
+    """
+    Looks each GenAI-bound section up in the section index (`scripts/section_index.py`). Tables rebuilt
+    entirely from a near-duplicate go in `reused` (section index -> (table_name, csv_data)); with `diff_prompts`,
+    sections needing only some lines re-extracted are sent as a diff prompt, keeping their ReusePlan in `plans`.
+    Yields what to send to GenAI, recording each section's index in `sent_indices` and its text in `texts`.
+
+    `section_indices` is the list `_split_local_sections` appends to (its last entry is the section just
+    yielded), or None when every section comes through.
+    """
+    for position, table_text in enumerate(sections):
+        idx = position if section_indices is None else section_indices[-1]
+        plan = plan_reuse(table_text)
+        if plan is not None and not plan.changed_lines:
+            csv_data = plan.merge([])
+            if _row_count(csv_data) >= plan.expected_rows:
+                reused[idx] = (plan.table_name, csv_data)
+                continue
+            plan = None  # Rows went missing in the rebuild; extract the section in full
+        texts[idx] = table_text
+        sent_indices.append(idx)
+        if plan is not None and diff_prompts:
+            plans[idx] = plan
+            yield plan.diff_prompt()
+        else:
+            yield table_text
+
+
+def _row_count(csv_data: str) -> int:
+    """Rows of a CSV table, not counting its header."""
+    return max(sum(1 for row in csv.reader(io.StringIO(csv_data)) if row) - 1, 0)
+
+
+def _merge_diff_replies(plans: dict, tables_per_section: dict) -> list:
+    """
+    Merges the rows GenAI returned for each diff prompt into its rebuilt table, in place.
+
+    Returns:
+        list: Section indices whose diff prompt got no usable reply, or whose merged table has fewer rows than
+            the plan expects, to be extracted in full.
+    """
+    failed = []
+    for idx, plan in plans.items():
+        tables = tables_per_section.get(idx)
+        if not tables:
+            failed.append(idx)
+            continue
+        rows = [row for row in csv.reader(io.StringIO(tables[0][1])) if row]
+        csv_data = plan.merge(rows)
+        if _row_count(csv_data) < plan.expected_rows:
+            failed.append(idx)  # Fewer rows than the table it was rebuilt from: some were lost in the merge
+            continue
+        tables_per_section[idx] = [(plan.table_name, csv_data)]
+    return failed
+
+
+def process_and_save_tables(segmented_tables, output_dir: str, max_concurrency: int = 4, client=None, limiter=None,
+                            mode: str = "per-section", local_parser: bool = True,
+                            min_confidence: float = MIN_CONFIDENCE, stream: bool = False,
+                            stall_timeout: float = STALL_TIMEOUT):
     """
     Processes segmented tables and saves CSVs to the specified output directory.
+
+    Sections the local parser is confident about (see `scripts/local_tables.py`) are converted without
+    GenAI, and so are near-duplicates of sections extracted before whose values can all be placed (see
+    `scripts/section_index.py`); in per-section mode, near-duplicates with a few changed lines send just those
+    lines. The rest are extracted concurrently (see `extract_tables_async`). Tables are written in section order.
     
     Args:
-        segmented_tables (list): List of table text segments to process
+        segmented_tables (iterable): Table text segments to process (a list, or a generator such as `stream_sections`)
         output_dir (str): Directory where CSV files should be saved
+        max_concurrency (int): Maximum number of GenAI requests in flight at once
+        client: Optional GenAI client (or fake) to use instead of `get_genai_client()`
+        limiter (RateLimiter): Optional rate limiter (default: the shared process-wide limiter)
+        mode (str): "per-section" sends one request per table; "batched" sends all tables in one schema-constrained
+            request (see `extract_tables_batched_async`)
+        local_parser (bool): Parse well-formed sections locally instead of sending them to GenAI
+        min_confidence (float): Lowest local parse confidence accepted without GenAI
+        stream (bool): Stream GenAI replies, abandoning and retrying stalled or malformed ones early
+        stall_timeout (float): With `stream`, seconds without a chunk before a reply is abandoned
+
+    Returns:
+        dict: {"sections": count, "local": count parsed locally, "reused": count rebuilt from a near-duplicate
+               without GenAI, "diff_prompts": count sent as a diff prompt, "failed": count with no usable table}
     """
+    if mode not in EXTRACTION_MODES:
+        raise ValueError(f"❌ Unknown extraction mode '{mode}', expected one of {EXTRACTION_MODES}.")
     os.makedirs(output_dir, exist_ok=True)
-    
-    for idx, table_text in enumerate(segmented_tables):
-        response = gemini_financial_extraction(table_text)
-        json_data = clean_json_response(response.text)
 
-        if not json_data:
-            print(f"❌ No valid JSON found for table {idx+1}")
-            continue
+    local_tables, remote_indices = {}, []
+    if local_parser:
+        remote_sections = _split_local_sections(segmented_tables, local_tables, remote_indices, min_confidence)
+    else:
+        remote_sections = segmented_tables
+        remote_indices = None  # Every section is GenAI-bound, in order
+
+    reused, plans, texts, sent_indices = {}, {}, {}, []
+    remote_sections = _split_reused_sections(remote_sections, remote_indices, reused, plans, texts, sent_indices,
+                                             diff_prompts=mode == "per-section")
+    if isinstance(segmented_tables, (list, tuple)):
+        remote_sections = list(remote_sections)
 
-        try:
-            parsed_data = json.loads(json_data)
-            table_name = parsed_data.get("table_name", f"financial_table_{idx+1}")
-            csv_content = parsed_data.get("csv_data", "")
+    if isinstance(remote_sections, list) and not remote_sections:
+        remote_tables = []  # Everything parsed locally; don't even load the GenAI SDK
+    elif mode == "batched":
+        remote_tables = asyncio.run(
+            extract_tables_batched_async(remote_sections, client=client, limiter=limiter, max_concurrency=max_concurrency,
+                                         stream=stream, stall_timeout=stall_timeout)
+        )
+    else:
+        responses = asyncio.run(
+            extract_tables_async(remote_sections, client=client, limiter=limiter, max_concurrency=max_concurrency,
+                                 stream=stream, stall_timeout=stall_timeout)
+        )
+        remote_tables = [[table] if table is not None else []
+                         for table in (_parse_table_response(idx, r) for idx, r in enumerate(responses))]
+
+    tables_per_section = dict(zip(sent_indices, remote_tables))
+    failed_diffs = _merge_diff_replies(plans, tables_per_section)
+    if failed_diffs:
+        print(f"⚠️ {len(failed_diffs)} diff prompts got no usable reply; extracting those tables in full.")
+        responses = asyncio.run(
+            extract_tables_async([texts[idx] for idx in failed_diffs], client=client, limiter=limiter,
+                                 max_concurrency=max_concurrency, stream=stream, stall_timeout=stall_timeout)
+        )
+        for idx, response in zip(failed_diffs, responses):
+            table = _parse_table_response(idx, response)
+            tables_per_section[idx] = [table] if table is not None else []
+    for idx, tables in tables_per_section.items():
+        # Only full extractions whose totals add up become references for later near-duplicates
+        if len(tables) == 1 and (idx not in plans or idx in failed_diffs) and validate_csv_data(tables[0][1]).ok:
+            remember_section(texts[idx], *tables[0])
+    tables_per_section.update((idx, [table]) for idx, table in reused.items())
+    tables_per_section.update((idx, [(table.table_name, table.csv_data)]) for idx, table in local_tables.items())
+
+    remove_company(*_store_location(output_dir))  # Drop partitions of tables this run no longer produces
+    for idx in sorted(tables_per_section):
+        for table_name, csv_content in tables_per_section[idx]:
             save_csv(table_name, csv_content, output_dir)
-        except json.JSONDecodeError:
-            print(f"❌ Failed to parse JSON for table {idx+1}")
-            continue
\ No newline at end of file
+
+    counts = {"sections": len(tables_per_section), "local": len(local_tables), "reused": len(reused),
+              "diff_prompts": len(plans), "failed": sum(not tables for tables in tables_per_section.values())}
+    if counts["failed"]:
+        print(f"⚠️ {counts['failed']} of {counts['sections']} tables could not be extracted; "
+              f"the tables stage will be retried on the next run.")
+    if local_parser and counts["sections"]:
+        print(f"🧮 {counts['local']} of {counts['sections']} tables parsed locally "
+              f"({counts['local'] / counts['sections']:.0%}), {counts['sections'] - counts['local'] - counts['reused']} "
+              f"sent to GenAI.")
+    if reused or plans:
+        genai_bound = len(sent_indices) + len(reused)
+        print(f"♻️ {len(reused) + len(plans)} of {genai_bound} GenAI-bound tables matched a section extracted before: "
+              f"{len(reused)} rebuilt without GenAI, {len(plans)} sent as a diff prompt "
+              f"({sum(len(plan.changed_lines) for plan in plans.values())} changed lines).")
+    record_reuse(len(sent_indices) + len(reused), len(reused), len(plans))
+    span = current_span()
+    if span is not None:
+        span.local_tables += counts["local"]
+        span.reused_tables += counts["reused"]
+    return counts
\ No newline at end of file
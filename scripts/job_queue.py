@@ -0,0 +1,388 @@
+"""
+job_queue.py
+
+This script handles:
+- A work queue of PDFs shared by any number of worker processes on any number of hosts, stored in one SQLite
+  file (default: `data/jobs.sqlite`).
+- Claiming jobs under a lease that the worker renews with a heartbeat while it processes the PDF. If a worker
+  crashes or loses its host, its lease runs out and another worker picks the job up again, up to `max_attempts`.
+- Stopping a worker whose lease has run out: the pipeline calls `check_lease()` between stages and before
+  writing outputs, so a stalled worker that wakes up doesn't write alongside the job's new owner.
+- Keeping outputs apart: each job writes only `data/<base_name>/` and `reports/<base_name>/`, and a PDF whose
+  base name is already queued from another path is refused, so two PDFs never share an output folder.
+- Reporting queue depth, in-flight jobs and throughput per worker.
+
+For workers on several hosts, put the queue file, the PDFs and the working directory (`data/`, `reports/`) on a
+shared filesystem, and run every worker from that directory. SQLite's WAL mode doesn't work over network
+filesystems, so the queue keeps the default rollback journal and relies on the filesystem's file locks.
+
+Classes:
+- JobQueue: The SQLite-backed queue (enqueue, claim, heartbeat, complete, fail, status).
+- LeaseLost: Raised by `check_lease()` once the current job's lease has expired or passed to another worker.
+
+Functions:
+- run_worker(queue, process_fn, ...): Claims and processes jobs until the queue is empty or interrupted.
+- check_lease(): Raises LeaseLost if the job this worker is processing is no longer its own (no-op otherwise).
+- print_status(status): Prints the queue depth, in-flight jobs and per-worker throughput.
+
+Usage:
+>>> from scripts.job_queue import JobQueue, run_worker
+>>> queue = JobQueue("data/jobs.sqlite")
+>>> queue.enqueue(["pdf_inputs/a.pdf", "pdf_inputs/b.pdf"])
+>>> run_worker(queue, process_financial_statement)   # on every worker, on every host
+"""
+
+import contextvars
+import os
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+
+from scripts.path_utils import get_base_name
+
+DEFAULT_QUEUE_PATH = os.path.join("data", "jobs.sqlite")
+DEFAULT_LEASE_SECONDS = 300  # A job whose worker hasn't sent a heartbeat for this long is handed to another worker
+DEFAULT_MAX_ATTEMPTS = 3
+JOB_STATUSES = ("queued", "running", "done", "failed")
+
+
+class LeaseLost(Exception):
+    """The worker's lease on its job expired or was taken over, so it must stop writing the job's outputs."""
+
+
+class _Lease:
+    """This worker's hold on the job it is processing, kept up to date by the heartbeat thread."""
+
+    def __init__(self, lease_seconds: float):
+        self.expires_at = time.time() + lease_seconds
+        self.lost = threading.Event()
+
+
+_current_lease = contextvars.ContextVar("current_lease", default=None)
+
+
+def check_lease():
+    """
+    Raises LeaseLost if the job being processed in this context is no longer this worker's: another worker
+    reclaimed it, or the lease ran out without a heartbeat (e.g. the host was suspended) and may be reclaimed
+    at any moment. Does nothing outside `run_worker`.
+    """
+    lease = _current_lease.get()
+    if lease is not None and (lease.lost.is_set() or time.time() >= lease.expires_at):
+        raise LeaseLost("The job's lease expired or was taken over by another worker")
+
+
+def default_worker_id() -> str:
+    """`<host>:<pid>`, unique across the hosts sharing a queue."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class JobQueue:
+    """
+    SQLite-backed PDF work queue with leases.
+
+    Args:
+        path (str): SQLite file holding the queue.
+        lease_seconds (float): How long a claim lasts without a heartbeat.
+        max_attempts (int): Attempts per job (failures and expired leases both count) before it is marked failed.
+    """
+
+    def __init__(self, path: str = DEFAULT_QUEUE_PATH, lease_seconds: float = DEFAULT_LEASE_SECONDS,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Autocommit mode; claims take the write lock up front with BEGIN IMMEDIATE
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=60, isolation_level=None)
+        self._conn.executescript(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                pdf_path TEXT UNIQUE,
+                base_name TEXT,
+                status TEXT,
+                attempts INTEGER DEFAULT 0,
+                worker TEXT,
+                lease_until REAL,
+                enqueued_at REAL,
+                started_at REAL,
+                finished_at REAL,
+                error TEXT
+            );
+            CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id);
+            CREATE TABLE IF NOT EXISTS workers (
+                worker TEXT PRIMARY KEY,
+                started_at REAL,
+                last_seen REAL,
+                jobs_done INTEGER DEFAULT 0,
+                jobs_failed INTEGER DEFAULT 0,
+                busy_seconds REAL DEFAULT 0
+            );"""
+        )
+
+    def _transaction(self, statements):
+        """Runs `statements(conn)` in one write transaction and returns its result."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = statements(self._conn)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return result
+
+    def enqueue(self, pdf_paths, retry: bool = False) -> int:
+        """
+        Adds PDFs to the queue. PDFs already in it are left alone, unless `retry` re-queues finished
+        or failed ones (e.g. after fixing the cause of a failure). PDFs whose output name is taken by another
+        PDF in the queue are skipped with a warning.
+
+        Returns:
+            int: Number of jobs added or re-queued.
+        """
+        now = time.time()
+
+        def add(conn):
+            added = 0
+            for pdf_path in pdf_paths:
+                pdf_path = os.path.abspath(pdf_path)
+                base_name = get_base_name(pdf_path)
+                taken = conn.execute("SELECT pdf_path FROM jobs WHERE base_name = ? AND pdf_path != ?",
+                                     (base_name, pdf_path)).fetchone()
+                if taken:
+                    print(f"⚠️ Skipping {pdf_path}: {taken[0]} already writes to data/{base_name}/")
+                    continue
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO jobs (pdf_path, base_name, status, enqueued_at) VALUES (?, ?, 'queued', ?)",
+                    (pdf_path, base_name, now))
+                if not cursor.rowcount and retry:
+                    cursor = conn.execute(
+                        "UPDATE jobs SET status = 'queued', attempts = 0, error = NULL, enqueued_at = ? "
+                        "WHERE pdf_path = ? AND status IN ('done', 'failed')", (now, pdf_path))
+                added += cursor.rowcount
+            return added
+
+        return self._transaction(add)
+
+    def claim(self, worker: str):
+        """
+        Claims the oldest runnable job for `worker`: queued, or running under a lease that has expired.
+
+        Returns:
+            dict: The job's row ("id", "pdf_path", "base_name", "attempts", ...), or None if nothing is runnable.
+        """
+        now = time.time()
+
+        def claim_next(conn):
+            # Expired leases that have used up their attempts won't be retried again
+            conn.execute("UPDATE jobs SET status = 'failed', finished_at = ?, "
+                         "error = COALESCE(error, 'Lease expired on every attempt (worker crashed or hung)') "
+                         "WHERE status = 'running' AND lease_until < ? AND attempts >= ?",
+                         (now, now, self.max_attempts))
+            row = conn.execute(
+                """SELECT id, pdf_path, base_name, attempts, worker FROM jobs
+                   WHERE status = 'queued' OR (status = 'running' AND lease_until < ?)
+                   ORDER BY id LIMIT 1""", (now,)).fetchone()
+            if row is None:
+                return None
+            job_id, pdf_path, base_name, attempts, previous_worker = row
+            conn.execute("UPDATE jobs SET status = 'running', worker = ?, attempts = attempts + 1, "
+                         "lease_until = ?, started_at = ? WHERE id = ?",
+                         (worker, now + self.lease_seconds, now, job_id))
+            self._touch_worker(conn, worker, now)
+            return {"id": job_id, "pdf_path": pdf_path, "base_name": base_name, "attempts": attempts + 1,
+                    "previous_worker": previous_worker}
+
+        return self._transaction(claim_next)
+
+    def heartbeat(self, job_id: int, worker: str) -> bool:
+        """Renews `worker`'s lease on a job. Returns False if the lease was lost to another worker."""
+        now = time.time()
+
+        def renew(conn):
+            renewed = conn.execute("UPDATE jobs SET lease_until = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                                   (now + self.lease_seconds, job_id, worker)).rowcount
+            self._touch_worker(conn, worker, now)
+            return bool(renewed)
+
+        return self._transaction(renew)
+
+    def complete(self, job_id: int, worker: str, seconds: float) -> bool:
+        """Marks a job done. Returns False if the lease was lost, in which case the job is left to its new owner."""
+        return self._finish(job_id, worker, seconds, None)
+
+    def fail(self, job_id: int, worker: str, seconds: float, error: str) -> bool:
+        """
+        Records a failed attempt: the job is queued again until it has used `max_attempts`, then marked failed.
+        Returns False if the lease was lost.
+        """
+        return self._finish(job_id, worker, seconds, error)
+
+    def _finish(self, job_id, worker, seconds, error):
+        now = time.time()
+
+        def finish(conn):
+            if error is None:
+                status = "done"
+            else:
+                attempts = conn.execute("SELECT attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()[0]
+                status = "failed" if attempts >= self.max_attempts else "queued"
+            owned = conn.execute("UPDATE jobs SET status = ?, finished_at = ?, error = ?, lease_until = NULL "
+                                 "WHERE id = ? AND worker = ? AND status = 'running'",
+                                 (status, now, error, job_id, worker)).rowcount
+            if not owned:  # The lease was lost and the job reclaimed, so its result belongs to the new owner
+                conn.execute("UPDATE workers SET last_seen = ? WHERE worker = ?", (now, worker))
+                return False
+            conn.execute("UPDATE workers SET jobs_done = jobs_done + ?, jobs_failed = jobs_failed + ?, "
+                         "busy_seconds = busy_seconds + ?, last_seen = ? WHERE worker = ?",
+                         (error is None, error is not None, seconds, now, worker))
+            return True
+
+        return self._transaction(finish)
+
+    @staticmethod
+    def _touch_worker(conn, worker, now):
+        conn.execute("INSERT OR IGNORE INTO workers (worker, started_at, last_seen) VALUES (?, ?, ?)",
+                     (worker, now, now))
+        conn.execute("UPDATE workers SET last_seen = ? WHERE worker = ?", (now, worker))
+
+    def status(self) -> dict:
+        """
+        Returns:
+            dict: {"counts": {status: jobs}, "in_flight": [job dicts with elapsed/lease seconds],
+                   "workers": [worker dicts with jobs/min], "failed": [(pdf_path, error) of failed jobs]}
+        """
+        now = time.time()
+        with self._lock:
+            counts = dict(self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+            in_flight = self._conn.execute(
+                "SELECT pdf_path, worker, attempts, started_at, lease_until FROM jobs WHERE status = 'running' "
+                "ORDER BY started_at").fetchall()
+            workers = self._conn.execute(
+                "SELECT worker, started_at, last_seen, jobs_done, jobs_failed, busy_seconds FROM workers "
+                "ORDER BY worker").fetchall()
+            failed = self._conn.execute("SELECT pdf_path, error FROM jobs WHERE status = 'failed' ORDER BY id").fetchall()
+
+        return {
+            "counts": {status: counts.get(status, 0) for status in JOB_STATUSES},
+            "in_flight": [{"pdf_path": pdf_path, "worker": worker, "attempt": attempts,
+                           "elapsed_seconds": now - started_at, "lease_seconds_left": lease_until - now}
+                          for pdf_path, worker, attempts, started_at, lease_until in in_flight],
+            "workers": [{"worker": worker, "last_seen_seconds_ago": now - last_seen, "jobs_done": done,
+                         "jobs_failed": failed_count,
+                         "jobs_per_minute": done / max(last_seen - started_at, 1) * 60,
+                         "seconds_per_job": busy / max(done + failed_count, 1)}
+                        for worker, started_at, last_seen, done, failed_count, busy in workers],
+            "failed": failed,
+        }
+
+    def close(self):
+        self._conn.close()
+
+
+def _keep_lease(queue: JobQueue, job_id: int, worker: str, stop: threading.Event, lease: _Lease):
+    """Heartbeat thread: renews the lease every third of its length until `stop` is set."""
+    while not stop.wait(queue.lease_seconds / 3):
+        try:
+            renewed_at = time.time()
+            if not queue.heartbeat(job_id, worker):
+                lease.lost.set()
+                return
+            lease.expires_at = renewed_at + queue.lease_seconds
+        except sqlite3.Error as e:  # e.g. the shared filesystem is briefly unavailable; try again next beat
+            print(f"⚠️ Heartbeat for job {job_id} failed: {e}")
+
+
+def run_worker(queue: JobQueue, process_fn, worker: str = None, poll_interval: float = 5.0,
+               until_empty: bool = False, on_processed=None) -> dict:
+    """
+    Claims and processes jobs one at a time until interrupted (Ctrl+C), renewing each job's lease from a
+    heartbeat thread while `process_fn` runs. `check_lease()` calls inside `process_fn` raise LeaseLost once the
+    lease is gone, and the job is then left to whichever worker holds it.
+
+    Args:
+        queue (JobQueue): The queue to take jobs from.
+        process_fn (callable): `process_fn(pdf_path)`, e.g. `process_financial_statement`.
+        worker (str): This worker's id (default: `<host>:<pid>`).
+        poll_interval (float): Seconds to wait before asking again when no job is runnable.
+        until_empty (bool): Stop once no job is queued or running, instead of waiting for more.
+        on_processed (callable): Optional `on_processed(pdf_path, ok)` called after each job.
+
+    Returns:
+        dict: {"done": count, "failed": count}
+    """
+    worker = worker or default_worker_id()
+    counts = {"done": 0, "failed": 0}
+    print(f"🧵 Worker {worker} taking jobs from {queue.path} (Ctrl+C to stop)...")
+
+    try:
+        while True:
+            job = queue.claim(worker)
+            if job is None:
+                pending = queue.status()["counts"]
+                if until_empty and not pending["queued"] and not pending["running"]:
+                    break
+                time.sleep(poll_interval)
+                continue
+
+            pdf_path, filename = job["pdf_path"], os.path.basename(job["pdf_path"])
+            if job["attempts"] > 1:
+                print(f"🔁 Retrying {filename} (attempt {job['attempts']}/{queue.max_attempts}, "
+                      f"previously {job['previous_worker']})")
+            stop, lease = threading.Event(), _Lease(queue.lease_seconds)
+            heartbeat = threading.Thread(target=_keep_lease, args=(queue, job["id"], worker, stop, lease), daemon=True)
+            heartbeat.start()
+            token = _current_lease.set(lease)
+            start = time.perf_counter()
+            try:
+                process_fn(pdf_path)
+            except LeaseLost:
+                ok = False
+                owned = queue.fail(job["id"], worker, time.perf_counter() - start, traceback.format_exc())
+                print(f"⚠️ Stopped {filename}: the lease ran out before it was finished.")
+            except Exception as e:
+                ok = False
+                owned = queue.fail(job["id"], worker, time.perf_counter() - start, traceback.format_exc())
+                print(f"❌ {filename} failed ({type(e).__name__}: {e})")
+            else:
+                ok = True
+                owned = queue.complete(job["id"], worker, time.perf_counter() - start)
+                print(f"📦 {filename} done in {time.perf_counter() - start:.1f}s")
+            finally:
+                _current_lease.reset(token)
+                stop.set()
+                heartbeat.join()
+            if owned:
+                counts["done" if ok else "failed"] += 1
+            else:
+                print(f"⚠️ Lost the lease on {filename} while processing it; the job was left to its new owner.")
+            if on_processed is not None:
+                on_processed(pdf_path, ok)
+    except KeyboardInterrupt:
+        print(f"\n🛑 Worker {worker} stopped.")
+
+    print(f"✅ Worker {worker} processed {counts['done']} PDFs ({counts['failed']} failed).")
+    return counts
+
+
+def print_status(status: dict):
+    """Prints the queue depth, in-flight jobs, per-worker throughput and failed jobs."""
+    counts = status["counts"]
+    print(f"📋 {counts['queued']} queued, {counts['running']} running, {counts['done']} done, {counts['failed']} failed")
+    for job in status["in_flight"]:
+        print(f"   ⏳ {os.path.basename(job['pdf_path'])} on {job['worker']} for {job['elapsed_seconds']:.0f}s "
+              f"(attempt {job['attempt']}, lease {job['lease_seconds_left']:.0f}s left)")
+    if status["workers"]:
+        print(f"   {'worker':<28} {'done':>5} {'failed':>6} {'jobs/min':>9} {'s/job':>7} {'last seen':>10}")
+    for worker in status["workers"]:
+        print(f"   {worker['worker']:<28} {worker['jobs_done']:5d} {worker['jobs_failed']:6d} "
+              f"{worker['jobs_per_minute']:9.1f} {worker['seconds_per_job']:7.1f} "
+              f"{worker['last_seen_seconds_ago']:9.0f}s")
+    for pdf_path, error in status["failed"]:
+        last_line = (error or "").strip().splitlines()[-1:] or [""]
+        print(f"   ❌ {os.path.basename(pdf_path)}: {last_line[0]}")
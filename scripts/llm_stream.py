@@ -0,0 +1,202 @@
+"""
+llm_stream.py
+
+This script handles:
+- Streaming GenAI replies (`generate_content_stream`), so output can be written or parsed while the rest of the
+  reply is still being generated instead of after the whole response has arrived.
+- Aborting streams that stall: if no chunk arrives for `stall_timeout` seconds the stream is abandoned with a
+  `StreamStalledError`. The same timeout is set as the request's HTTP read timeout, so the stalled
+  connection is dropped too rather than left hanging in the background.
+- Spotting bad extraction replies from their first chunks (no JSON object, an empty CSV, or a reply running on far
+  longer than its table), so they can be retried before the rest of the response is paid for.
+
+The SDK's async stream (google-genai 1.1.0) reads each chunk with a blocking call on the event loop, so the
+async pipeline runs `stream_generate` in a worker thread (`asyncio.to_thread`) instead.
+
+Classes:
+- StreamedResponse: A finished streamed reply. Mirrors the `.text`/`.usage_metadata` parts of the SDK response,
+  so it can be cached like one.
+- StreamAbortedError: Raised when a stream is abandoned early; `StreamStalledError` and `BadStreamError` narrow it down.
+- ExtractionStreamParser: Checks a per-section extraction reply chunk by chunk, counting its CSV rows as they complete.
+
+Functions:
+- stream_generate(client, model, contents, config, on_text, stall_timeout): Streams one request, passing each
+  chunk of text to `on_text`.
+
+Usage:
+>>> from scripts.llm_stream import stream_generate
+>>> with open("summary.md", "w", encoding="utf-8") as f:
+...     response = stream_generate(client, "gemini-2.0-flash", tables, config, on_text=f.write)
+>>> response.usage_metadata.total_token_count
+"""
+
+import queue
+import re
+import threading
+import time
+
+STALL_TIMEOUT = 30.0  # Seconds without a chunk before a stream is abandoned
+JSON_START_CHARS = 200  # An extraction reply with no "{" in this many characters isn't going to be JSON
+MAX_REPLY_RATIO = 4  # An extraction reply this many times longer than its section has gone off the rails
+MIN_MAX_REPLY_CHARS = 2000
+
+# The `csv_data` string of an extraction reply so far: escapes are kept whole, so a chunk ending half way
+# through one simply stops the match early
+CSV_DATA_PATTERN = re.compile(r'"csv_data"\s*:\s*"((?:[^"\\]|\\.)*)("?)', re.DOTALL)
+ESCAPE_PATTERN = re.compile(r"\\.", re.DOTALL)
+
+_END = object()
+
+
+class StreamAbortedError(Exception):
+    """A streamed reply abandoned before it finished. Retryable, like a rate limit or server error."""
+    retryable = True
+
+
+class StreamStalledError(StreamAbortedError, TimeoutError):
+    """No chunk arrived within the stall timeout."""
+
+
+class BadStreamError(StreamAbortedError, ValueError):
+    """The reply so far already shows it won't be usable."""
+
+
+class StreamedResponse:
+    """A streamed reply put back together. Mirrors the `.text`/`.usage_metadata` parts of the SDK response."""
+
+    def __init__(self):
+        self.text = ""
+        self.usage_metadata = None
+        self.chunks = 0
+        self.first_chunk_seconds = None  # Time to first output
+
+    def add(self, chunk, elapsed: float) -> str:
+        """Appends a streamed chunk and returns its text."""
+        text = getattr(chunk, "text", None) or ""
+        self.text += text
+        self.chunks += 1
+        if self.first_chunk_seconds is None and text:
+            self.first_chunk_seconds = elapsed
+        usage = getattr(chunk, "usage_metadata", None)
+        if usage is not None:
+            self.usage_metadata = usage  # Each chunk reports the usage so far; the last one has the totals
+        return text
+
+
+def _with_read_timeout(config, stall_timeout: float):
+    """A copy of `config` whose HTTP timeout (in ms, applied per socket read) is the stall timeout."""
+    import google.genai.types as types
+
+    http_options = config.http_options.model_copy() if config.http_options else types.HttpOptions()
+    http_options.timeout = int(stall_timeout * 1000)
+    return config.model_copy(update={"http_options": http_options})
+
+
+def stream_generate(client, model: str, contents, config, on_text=None, stall_timeout: float = STALL_TIMEOUT):
+    """
+    Sends one request with `generate_content_stream`, passing each chunk of text to `on_text` as it arrives.
+
+    The chunks are read in a background thread, so a stream that stops sending can be abandoned after
+    `stall_timeout` seconds even while the read itself is still blocked. `on_text` may raise (e.g.
+    `BadStreamError`) to abandon the stream early.
+
+    Args:
+        client: GenAI client (or a compatible fake) exposing `client.models.generate_content_stream`.
+        model (str): The AI model to use.
+        contents: The request contents.
+        config (google.genai.types.GenerateContentConfig): The request config.
+        on_text (callable): Called with the text of every chunk, in order.
+        stall_timeout (float): Seconds to wait for the first/next chunk before giving up.
+
+    Returns:
+        StreamedResponse: The whole reply.
+
+    Raises:
+        StreamStalledError: If no chunk arrived for `stall_timeout` seconds.
+    """
+    chunks = queue.Queue()
+    abandoned = threading.Event()
+    config = _with_read_timeout(config, stall_timeout)
+
+    def read():
+        try:
+            stream = client.models.generate_content_stream(model=model, contents=contents, config=config)
+            try:
+                for chunk in stream:
+                    if abandoned.is_set():
+                        break
+                    chunks.put(chunk)
+            finally:
+                close = getattr(stream, "close", None)
+                if close is not None:
+                    close()  # Releases the HTTP connection when the stream is abandoned part way
+        except Exception as e:
+            chunks.put(e)
+        else:
+            chunks.put(_END)
+
+    response = StreamedResponse()
+    start = time.perf_counter()
+    threading.Thread(target=read, daemon=True).start()
+    try:
+        while True:
+            try:
+                item = chunks.get(timeout=stall_timeout)
+            except queue.Empty:
+                raise StreamStalledError(f"no output for {stall_timeout:.0f}s "
+                                         f"after {len(response.text)} characters") from None
+            if item is _END:
+                return response
+            if isinstance(item, Exception):
+                raise item
+            text = response.add(item, time.perf_counter() - start)
+            if text and on_text is not None:
+                on_text(text)
+    finally:
+        abandoned.set()
+
+
+class ExtractionStreamParser:
+    """
+    Follows a per-section extraction reply (a JSON object with `table_name` and `csv_data`, usually in a
+    ```json fence) as it streams, and raises `BadStreamError` as soon as the reply can't be used:
+    - no "{" within the first `JSON_START_CHARS` characters (e.g. a refusal or prose),
+    - `csv_data` closed without a single row,
+    - the reply running past `max_chars` (e.g. the model repeating itself).
+
+    `rows` counts the CSV rows of `csv_data` completed so far.
+
+    Args:
+        section_text (str): The section being extracted, used to bound the reply length.
+    """
+
+    def __init__(self, section_text: str = ""):
+        self.max_chars = max(MAX_REPLY_RATIO * len(section_text), MIN_MAX_REPLY_CHARS)
+        self.text = ""
+        self.rows = 0
+        self._json_started = False
+
+    def feed(self, text: str):
+        """Adds the next chunk of reply text."""
+        self.text += text
+        if len(self.text) > self.max_chars:
+            raise BadStreamError(f"reply passed {self.max_chars} characters after {self.rows} CSV rows")
+
+        if not self._json_started:
+            self._json_started = "{" in self.text
+            if not self._json_started:
+                if len(self.text) >= JSON_START_CHARS:
+                    raise BadStreamError(f"reply isn't JSON: {self.text[:60].strip()!r}...")
+                return
+
+        match = CSV_DATA_PATTERN.search(self.text)
+        if match is None:
+            return
+        csv_escaped, closed = match.groups()
+        newlines = sum(escape == "\\n" for escape in ESCAPE_PATTERN.findall(csv_escaped))
+        if closed:
+            if not csv_escaped.strip():
+                raise BadStreamError("reply has an empty csv_data")
+            self.rows = newlines + 1
+        else:
+            self.rows = newlines  # Rows whose line break has arrived
@@ -0,0 +1,135 @@
+"""
+local_tables.py
+
+This script handles:
+- Parsing well-formed statement sections ("label [note] number number" rows, as in the FWC statements)
+  into the same CSV shape GenAI extraction produces, without a GenAI request.
+- Scoring how much that parse can be trusted, so only low-confidence sections are sent to GenAI.
+
+A parse is scored on three things, each between 0 and 1, and its confidence is their product:
+- Columns: the share of rows with exactly one value per column header ("Last Year", "Previous Year").
+  Without a recognised column header this is halved, since the columns can't be named.
+- Totals: the share of "Total ..." rows that equal the sum of their line items (0.5 when there are none to check).
+- Coverage: the share of lines with digits in them that were parsed as rows.
+
+Classes:
+- LocalTable: A parsed section: table name, CSV text, confidence and the scores behind it.
+
+Functions:
+- parse_section(section_text): Parses one section from `split_into_sections_regex`.
+
+Usage:
+>>> from scripts.local_tables import parse_section, MIN_CONFIDENCE
+>>> table = parse_section(segmented_tables[0])
+>>> if table.confidence >= MIN_CONFIDENCE:
+...     save_csv(table.table_name, table.csv_data, output_dir)
+"""
+
+import csv
+import io
+import math
+import re
+from dataclasses import dataclass, field
+
+from scripts.statement_store import parse_number
+from scripts.validate import check_sums
+
+LOCAL_PARSER_VERSION = "1"  # Part of the tables stage version; bump when parse_section's output changes
+MIN_CONFIDENCE = 0.9  # Sections scoring below this are sent to GenAI
+
+AMOUNT = r"\(?-?\$?\d[\d,]*(?:\.\d+)?\)?|-|–"
+ROW_PATTERN = re.compile(rf"^(?P<label>.*?[A-Za-z].*?)(?:\s+(?P<note>\d{{1,2}}[A-Z]))?(?P<amounts>(?:\s+(?:{AMOUNT}))+)$")
+TITLE_PATTERN = re.compile(r"^(statement of|balance sheet|income statement|cash flow statement)", re.IGNORECASE)
+PERIOD_PATTERN = re.compile(r"^(for the (year|period|half[- ]year)|as at)\b", re.IGNORECASE)
+CURRENCY_PATTERN = re.compile(r"^(notes\s*)?(\$\s*)+$", re.IGNORECASE)
+COLUMN_HEADER_PATTERN = re.compile(r"(last|previous|current|prior) (financial )?year", re.IGNORECASE)
+
+
+@dataclass
+class LocalTable:
+    """A section parsed without GenAI."""
+    table_name: str
+    csv_data: str
+    confidence: float
+    scores: dict = field(default_factory=dict)  # "columns", "totals", "coverage"
+
+
+def _format_amount(value: float) -> str:
+    """Writes amounts the way the extraction prompt asks for: no separators, "-" as 0, "(x)" as -x."""
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def parse_section(section_text: str) -> LocalTable:
+    """
+    Parses a statement section into CSV rows: a header row ("Item", then one column per period), one row
+    per line item, and label-only rows for subtable headers (e.g. "Current Assets,,").
+
+    Note references ("5A") are dropped, "-" becomes 0 and "(1,000)" becomes -1000. Lines that continue
+    the previous row's label (starting in lower case, e.g. "reporting period") are joined onto it, and so are
+    numbers beyond the column count at the start of a row's values.
+
+    Args:
+        section_text (str): One section from `split_into_sections_regex` / `stream_sections`.
+
+    Returns:
+        LocalTable: The parse and its confidence (see the module docstring).
+    """
+    lines = [line.strip() for line in section_text.splitlines() if line.strip()]
+    title_index = next((idx for idx, line in enumerate(lines) if TITLE_PATTERN.match(line)), 0)
+    table_name = lines[title_index] if lines else "Financial Table"
+
+    columns, rows, unparsed, numeric_lines = [], [], 0, 0
+    for line in lines[title_index + 1:]:
+        if PERIOD_PATTERN.match(line) or CURRENCY_PATTERN.match(line):
+            continue
+        if not rows and COLUMN_HEADER_PATTERN.search(line):
+            columns = [match.group(0) for match in COLUMN_HEADER_PATTERN.finditer(line)]
+            continue
+
+        has_digits = any(char.isdigit() for char in line)
+        numeric_lines += has_digits
+        match = ROW_PATTERN.match(line)
+        if match:
+            label, tokens = match["label"].strip(), match["amounts"].split()
+            if columns and len(tokens) > len(columns) and not match["note"]:
+                # Surplus leading numbers belong to the label (e.g. "Interest item 2 2,121,000 3,317,000")
+                label = " ".join([label] + tokens[:-len(columns)])
+                tokens = tokens[-len(columns):]
+            rows.append([label, [parse_number(token) for token in tokens]])
+        elif rows and (line[0].islower() or line[0].isdigit()):
+            rows[-1][0] += " " + line  # The rest of a label that wrapped onto the next line
+        elif has_digits:
+            unparsed += 1
+            rows.append([line, []])
+        else:
+            rows.append([line, []])  # A subtable header
+
+    value_counts = [len(amounts) for _, amounts in rows if amounts]
+    header_found = bool(columns)
+    if not header_found:
+        width = max(set(value_counts), key=value_counts.count) if value_counts else 0
+        columns = [f"Column {idx + 1}" for idx in range(width)]
+
+    consistent = sum(count == len(columns) for count in value_counts)
+    column_score = consistent / len(value_counts) if value_counts else 0.0
+    if not header_found:
+        column_score *= 0.5
+
+    width = len(columns)
+    labels = [label for label, _ in rows]
+    values = [(amounts + [math.nan] * width)[:width] if amounts else [math.nan] * width for _, amounts in rows]
+    sums = check_sums(labels, values, columns) if width else None
+    checks = (sums.sum_checks_passed + len(sums.sum_check_failures)) if sums else 0
+    totals_score = sums.sum_checks_passed / checks if checks else 0.5
+
+    coverage_score = 1 - unparsed / numeric_lines if numeric_lines else 0.0
+
+    output = io.StringIO()
+    writer = csv.writer(output, lineterminator="\n")
+    writer.writerow(["Item"] + columns)
+    for label, row_values in zip(labels, values):
+        writer.writerow([label] + ["" if math.isnan(value) else _format_amount(value) for value in row_values])
+
+    scores = {"columns": column_score, "totals": totals_score, "coverage": coverage_score}
+    return LocalTable(table_name=table_name, csv_data=output.getvalue().strip(),
+                      confidence=column_score * totals_score * coverage_score, scores=scores)
@@ -0,0 +1,136 @@
+"""
+manifest.py
+
+This script handles:
+- Recording, per processed PDF, what each pipeline stage consumed and produced (`data/<base_name>/manifest.json`).
+- Deciding whether a stage can be skipped on a rerun because neither its input nor its
+  prompt/model/code version has changed and its outputs are still on disk, unmodified.
+
+Each stage's input hash is derived from the previous stage's output hash (or the PDF's own hash for the
+first stage) combined with the stage's version string, so changing e.g. only the summary prompt invalidates
+just the summary and render stages.
+
+Classes:
+- PipelineManifest: Loads, queries and updates the manifest for one PDF.
+
+Functions:
+- hash_text(text): SHA-256 of a string.
+- hash_file(path): SHA-256 of a file's bytes.
+- hash_files(paths): Combined SHA-256 of several files (order independent).
+
+Usage:
+>>> manifest = PipelineManifest(data_dir)
+>>> input_hash = manifest.input_hash("clean", upstream_hash, version="1")
+>>> if not manifest.is_fresh("clean", input_hash):
+...     ...  # run the stage
+...     manifest.record("clean", input_hash, [cleaned_path])
+"""
+
+import hashlib
+import json
+import os
+import time
+
+PIPELINE_STAGES = ("extract", "clean", "split", "tables", "summary", "render")
+MANIFEST_FILENAME = "manifest.json"
+
+
+def hash_text(text: str) -> str:
+    """Returns the SHA-256 hex digest of a string."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def hash_file(path: str) -> str:
+    """Returns the SHA-256 hex digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_files(paths) -> str:
+    """Returns one digest covering several files, independent of the order they are listed in."""
+    digest = hashlib.sha256()
+    for path in sorted(paths):
+        digest.update(os.path.basename(path).encode("utf-8"))
+        digest.update(hash_file(path).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class PipelineManifest:
+    """
+    The stage manifest for a single PDF.
+
+    Args:
+        data_dir (str): The PDF's data directory (`data/<base_name>/`); the manifest is stored inside it.
+    """
+
+    def __init__(self, data_dir: str):
+        self.path = os.path.join(data_dir, MANIFEST_FILENAME)
+        self.data = {"stages": {}}
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.data = json.load(f)
+
+    @staticmethod
+    def input_hash(stage: str, upstream_hash: str, version: str) -> str:
+        """Combines the upstream hash with the stage's version string into the stage's input hash."""
+        return hash_text(f"{stage}|{upstream_hash}|{version}")
+
+    def stage(self, stage: str) -> dict:
+        """Returns the recorded entry for a stage (empty if it has never run)."""
+        return self.data["stages"].get(stage, {})
+
+    def output_hash(self, stage: str):
+        """Returns the recorded output hash of a stage, or None."""
+        return self.stage(stage).get("output_hash")
+
+    def outputs(self, stage: str) -> list:
+        """Returns the recorded output paths of a stage."""
+        return self.stage(stage).get("outputs", [])
+
+    def is_fresh(self, stage: str, input_hash: str) -> bool:
+        """
+        True if the stage last ran with this exact input hash, without failures, and its outputs still exist
+        unmodified.
+        """
+        entry = self.stage(stage)
+        if not entry or entry.get("input_hash") != input_hash or entry.get("failed"):
+            return False
+        outputs = entry.get("outputs", [])
+        if not all(os.path.exists(path) for path in outputs):
+            return False
+        return hash_files(outputs) == entry.get("output_hash")
+
+    def record(self, stage: str, input_hash: str, outputs: list, failed: int = 0) -> str:
+        """
+        Records a completed stage, saves the manifest and returns the stage's output hash.
+
+        `failed` counts the parts of the stage that produced nothing (e.g. tables GenAI couldn't extract);
+        a stage recorded with failures is never fresh, so the next run retries it.
+        """
+        output_hash = hash_files(outputs)
+        self.data["stages"][stage] = {
+            "input_hash": input_hash,
+            "output_hash": output_hash,
+            "outputs": list(outputs),
+            "completed_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        if failed:
+            self.data["stages"][stage]["failed"] = failed
+        self.save()
+        return output_hash
+
+    def remove_outputs(self, stage: str):
+        """Deletes the files a stage produced last time (e.g. CSVs whose table names may change on rerun)."""
+        for path in self.outputs(stage):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def save(self):
+        """Writes the manifest atomically (write to a temp file, then rename)."""
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, indent=2)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,142 @@
+"""
+pdf_backends.py
+
+This script handles:
+- Page text extraction behind one interface, with interchangeable PDF libraries:
+  - "pdfplumber": the original backend. Slowest, but its line layout is what the cleaning/splitting regexes were written against.
+  - "pymupdf": PyMuPDF words regrouped into visual lines, which reproduces pdfplumber's lines at a fraction of the cost.
+  - "pypdfium2": PDFium's own text layout. Fastest, but it breaks some header rows differently.
+
+Each library is imported only when its backend is first used.
+
+Classes:
+- PDFBackend: The interface (count_pages, iter_page_text) every backend implements.
+
+Functions:
+- get_backend(name): Returns the backend registered under `name`.
+
+Usage:
+>>> from scripts.pdf_backends import get_backend
+>>> backend = get_backend("pymupdf")
+>>> texts = list(backend.iter_page_text("../pdf_inputs/sample.pdf"))
+"""
+
+from abc import ABC, abstractmethod
+
+LINE_TOLERANCE = 3  # Points two words' vertical centres may differ by and still share a line
+
+
+class PDFBackend(ABC):
+    """Extracts the text of a PDF one page at a time."""
+
+    name = ""
+
+    @abstractmethod
+    def count_pages(self, pdf_path: str) -> int:
+        """Returns the number of pages in a PDF."""
+
+    @abstractmethod
+    def iter_page_text(self, pdf_path: str, start: int = 0, end: int = None):
+        """
+        Yields the text of each page in [start, end) (without a trailing newline), one page at a time.
+
+        Args:
+            pdf_path (str): Path to the PDF file.
+            start (int): Index of the first page to extract.
+            end (int): Index one past the last page to extract (default: the last page).
+        """
+
+
+class PdfplumberBackend(PDFBackend):
+    name = "pdfplumber"
+
+    def count_pages(self, pdf_path):
+        import pdfplumber
+        with pdfplumber.open(pdf_path) as pdf:
+            return len(pdf.pages)
+
+    def iter_page_text(self, pdf_path, start=0, end=None):
+        import pdfplumber # pdfplumber IS SLOWER BTW by a fair bit, but it also does give much nicer formatting.
+        with pdfplumber.open(pdf_path) as pdf:
+            pages = pdf.pages
+            for idx in range(start, len(pages) if end is None else min(end, len(pages))):
+                page = pages[idx]
+                text = page.extract_text()
+                page.close()  # Drops the page's cached layout/chars so they can be garbage collected
+                yield text
+
+
+def _words_to_lines(words) -> str:
+    """
+    Regroups PyMuPDF words into lines by their vertical centre, left to right, the way pdfplumber lays text out.
+
+    PyMuPDF's plain "text" mode puts every table cell on its own line, which breaks the row-per-line layout
+    that cleaning, splitting and the extraction prompt rely on.
+    """
+    lines, current, line_y = [], [], None
+    for word in sorted(words, key=lambda word: ((word[1] + word[3]) / 2, word[0])):
+        middle = (word[1] + word[3]) / 2
+        if current and abs(middle - line_y) > LINE_TOLERANCE:
+            lines.append(" ".join(text for *_, text in sorted(current)))
+            current = []
+        if not current:
+            line_y = middle
+        current.append((word[0], word[4]))
+    if current:
+        lines.append(" ".join(text for *_, text in sorted(current)))
+    return "\n".join(lines)
+
+
+class PyMuPDFBackend(PDFBackend):
+    name = "pymupdf"
+
+    def count_pages(self, pdf_path):
+        import fitz
+        with fitz.open(pdf_path) as doc:
+            return doc.page_count
+
+    def iter_page_text(self, pdf_path, start=0, end=None):
+        import fitz
+        with fitz.open(pdf_path) as doc:
+            for idx in range(start, doc.page_count if end is None else min(end, doc.page_count)):
+                yield _words_to_lines(doc[idx].get_text("words"))
+
+
+class Pypdfium2Backend(PDFBackend):
+    name = "pypdfium2"
+
+    def count_pages(self, pdf_path):
+        import pypdfium2
+        doc = pypdfium2.PdfDocument(pdf_path)
+        try:
+            return len(doc)
+        finally:
+            doc.close()
+
+    def iter_page_text(self, pdf_path, start=0, end=None):
+        import pypdfium2
+        doc = pypdfium2.PdfDocument(pdf_path)
+        try:
+            for idx in range(start, len(doc) if end is None else min(end, len(doc))):
+                page = doc[idx]
+                text_page = page.get_textpage()
+                text = text_page.get_text_bounded()
+                text_page.close()
+                page.close()
+                # PDFium separates lines with "\r\n" and pads some with spaces
+                yield "\n".join(line.rstrip() for line in text.splitlines())
+        finally:
+            doc.close()
+
+
+BACKENDS = {backend.name: backend for backend in (PdfplumberBackend(), PyMuPDFBackend(), Pypdfium2Backend())}
+DEFAULT_BACKEND = "pdfplumber"
+FAST_BACKEND = "pymupdf"  # Tried first in "auto" mode
+PDF_BACKENDS = ("auto",) + tuple(BACKENDS)
+
+
+def get_backend(name: str) -> PDFBackend:
+    """Returns the backend registered under `name` ("pdfplumber", "pymupdf" or "pypdfium2")."""
+    if name not in BACKENDS:
+        raise ValueError(f"❌ Unknown PDF backend '{name}'. Choose one of: {', '.join(BACKENDS)}")
+    return BACKENDS[name]
@@ -7,9 +7,13 @@ This script handles:
 - Splitting the document into separate financial tables.
 
 Functions:
-- extract_full_text(pdf_path): Extracts text from a given PDF file.
+- iter_page_text(pdf_path, start, end, backend): Yields the text of each page, releasing each page's layout after use.
+- extract_full_text(pdf_path, workers, backend): Extracts text from a given PDF file, optionally fanning page ranges out across processes.
+- choose_backend(pdf_path): Picks the fast PDF backend when it matches pdfplumber on sample pages, else pdfplumber ("auto" mode).
+- profile_extraction(pdf_path, workers, backend): Extracts text and reports pages/sec and peak RSS.
 - clean_text(raw_text): Cleans extracted text (removes headers, footers, and formatting issues).
 - split_into_sections_regex(cleaned_text): Splits cleaned text into individual financial tables.
+- stream_sections(pages): Cleans and splits page texts incrementally, yielding each table as soon as it ends.
 
 Usage:
 >>> from scripts.preprocess_data import extract_full_text, clean_text, split_into_sections_regex
@@ -19,23 +23,133 @@ Usage:
 """
 
 import re
-import pdfplumber # pdfplumber IS SLOWER BTW by a fair bit, but it also does give much nicer formatting.
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from scripts.pdf_backends import get_backend, DEFAULT_BACKEND, FAST_BACKEND
+from scripts.tracing import peak_rss_mb
 
-def extract_full_text(pdf_path):
+PAGES_PER_CHUNK = 25  # Page range handed to each worker process in parallel extraction
+PROBE_PAGES = 3  # Sample pages extracted with both backends to decide "auto" mode
+
+# Compiled once and shared by the batch (clean_text/split_into_sections_regex) and streaming paths
+HEADER_FOOTER_PATTERN = re.compile(r"FS 023|Fact Sheet FS 023|p\.\s*\d+", re.IGNORECASE)
+COPYRIGHT_START = "© Commonwealth of Australia"
+COPYRIGHT_PATTERN = re.compile(r'© Commonwealth of Australia.*?legal advice\.', re.DOTALL) # DOTALL allows the match to continue across multiple lines
+BLANK_LINES_PATTERN = re.compile(r'\n+')
+# Regex pattern to match variations like:
+# - "The above statement should be read in conjunction with the notes."
+# - "Above statement must be considered along with the notes."
+# - "above statement should be read carefully with the notes."
+SECTION_END_PATTERN = re.compile(r"(?:The\s*)?above statement .*? with the notes\.?", re.IGNORECASE)
+EXPECTED_SECTIONS = 4
+
+def count_pages(pdf_path, backend=DEFAULT_BACKEND):
+    """Returns the number of pages in a PDF."""
+    return get_backend(backend).count_pages(pdf_path)
+
+def iter_page_text(pdf_path, start=0, end=None, backend=DEFAULT_BACKEND):
+    """
+    Yields the extracted text of each page in [start, end), one page at a time.
+
+    Each page's parsed layout objects are released as soon as its text has been extracted,
+    so memory stays flat regardless of document length.
+
+    Args:
+        pdf_path (str): Path to the PDF file.
+        start (int): Index of the first page to extract.
+        end (int): Index one past the last page to extract (default: the last page).
+        backend (str): PDF library to extract with (see `scripts/pdf_backends.py`).
+
+    Yields:
+        str: Text of each page (without a trailing newline).
+    """
+    yield from get_backend(backend).iter_page_text(pdf_path, start, end)
+
+def _extract_page_range(pdf_path, start, end, backend=DEFAULT_BACKEND):
+    """Worker for parallel extraction: returns the text of pages [start, end) in the `extract_full_text` format."""
+    return "".join(text + "\n" for text in iter_page_text(pdf_path, start, end, backend))
+
+def _probe_pages(page_count):
+    """Indexes of the pages `choose_backend` compares: spread from the first page to the last."""
+    if page_count <= PROBE_PAGES:
+        return list(range(page_count))
+    return sorted({round(i * (page_count - 1) / (PROBE_PAGES - 1)) for i in range(PROBE_PAGES)})
+
+def choose_backend(pdf_path):
+    """
+    Picks the backend for "auto" mode: the fast backend if its cleaned text matches pdfplumber's on a few
+    sample pages, otherwise pdfplumber.
+
+    Only the sample pages are extracted twice, so the chosen backend can start on the full document (or a
+    stream) straight away.
+
+    Returns:
+        str: The backend name.
+    """
+    for idx in _probe_pages(count_pages(pdf_path, FAST_BACKEND)):
+        fast = next(iter_page_text(pdf_path, idx, idx + 1, FAST_BACKEND), "")
+        reference = next(iter_page_text(pdf_path, idx, idx + 1, DEFAULT_BACKEND), "")
+        if clean_text(fast) != clean_text(reference):
+            print(f"⚠️ {FAST_BACKEND} text differs from {DEFAULT_BACKEND}'s on page {idx + 1}, falling back to {DEFAULT_BACKEND}.")
+            return DEFAULT_BACKEND
+    return FAST_BACKEND
+
+def extract_full_text(pdf_path, workers=1, backend=DEFAULT_BACKEND):
     """
     Extracts full text from a given PDF file.
+
+    With `workers > 1`, page ranges are extracted in separate processes and stitched back together in order.
+    Either way the result is identical to extracting every page in sequence.
     
     Args:
         pdf_path (str): Path to the PDF file.
+        workers (int): Number of processes to spread page ranges across (default: 1, no extra processes).
+        backend (str): PDF library to extract with, or "auto" (see `choose_backend`).
 
     Returns:
         str: Extracted text from the PDF.
     """
-    full_text = ""
-    with pdfplumber.open(pdf_path) as pdf:
-        for page in pdf.pages:
-            full_text += page.extract_text() + "\n"  # Append text from each page and add a newline
-    return full_text
+    if backend == "auto":
+        backend = choose_backend(pdf_path)
+
+    if workers <= 1:
+        return _extract_page_range(pdf_path, 0, None, backend)  # Text from each page followed by a newline
+
+    page_count = count_pages(pdf_path, backend)
+    ranges = [(start, min(start + PAGES_PER_CHUNK, page_count)) for start in range(0, page_count, PAGES_PER_CHUNK)]
+    if len(ranges) <= 1:
+        return _extract_page_range(pdf_path, 0, page_count, backend)
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(ranges))) as pool:
+        chunks = pool.map(_extract_page_range, [pdf_path] * len(ranges), *zip(*ranges), [backend] * len(ranges))
+        return "".join(chunks)
+
+def profile_extraction(pdf_path, workers=1, backend=DEFAULT_BACKEND):
+    """
+    Extracts a PDF's text and reports how fast and how memory hungry it was.
+
+    Args:
+        pdf_path (str): Path to the PDF file.
+        workers (int): Passed through to `extract_full_text`.
+        backend (str): Passed through to `extract_full_text`.
+
+    Returns:
+        dict: pages, seconds, pages_per_sec, peak_rss_mb and the extracted text.
+    """
+    pages = count_pages(pdf_path, FAST_BACKEND if backend == "auto" else backend)
+    start = time.perf_counter()
+    text = extract_full_text(pdf_path, workers=workers, backend=backend)
+    seconds = time.perf_counter() - start
+    stats = {
+        "pages": pages,
+        "seconds": seconds,
+        "pages_per_sec": pages / seconds if seconds > 0 else float("inf"),
+        "peak_rss_mb": peak_rss_mb(),
+        "text": text,
+    }
+    print(f"📄 Extracted {pages} pages in {seconds:.2f}s ({stats['pages_per_sec']:.1f} pages/sec, peak RSS {stats['peak_rss_mb']:.0f} MB)")
+    return stats
 
 def clean_text(raw_text):
     """
@@ -50,13 +164,13 @@ def clean_text(raw_text):
     lines = raw_text.splitlines()
     cleaned_lines = []
     for line in lines:
-        if not re.search(r"FS 023|Fact Sheet FS 023|p\.\s*\d+", line, re.IGNORECASE): # Improved condition
+        if not HEADER_FOOTER_PATTERN.search(line): # Improved condition
             cleaned_lines.append(line)
 
     cleaned_text = "\n".join(cleaned_lines)
     # Get rid of end of document text
-    cleaned_text = re.sub(r'© Commonwealth of Australia.*?legal advice\.', '', cleaned_text, flags=re.DOTALL) # DOTALL allows the match to continue across multiple lines
-    cleaned_text = re.sub(r'\n+', '\n', cleaned_text).strip()
+    cleaned_text = COPYRIGHT_PATTERN.sub('', cleaned_text)
+    cleaned_text = BLANK_LINES_PATTERN.sub('\n', cleaned_text).strip()
     return cleaned_text
 
 
@@ -70,28 +184,76 @@ def split_into_sections_regex(cleaned_text):
     Returns:
         list: A list of text sections corresponding to financial tables.
     """
-    
-    # Regex pattern to match variations like:
-    # - "The above statement should be read in conjunction with the notes."
-    # - "Above statement must be considered along with the notes."
-    # - "above statement should be read carefully with the notes."
-    stop_pattern = r"(?:The\s*)?above statement .*? with the notes\.?"
 
     # Split using regex
-    sections = re.split(stop_pattern, cleaned_text, flags=re.IGNORECASE)
+    sections = SECTION_END_PATTERN.split(cleaned_text)
 
     # Remove extra whitespace and filter empty sections
     sections = [sec.strip() for sec in sections if sec.strip()]
 
-    if len(sections) != 4:
-        print(f"Warning: Expected 4 sections, but found {len(sections)}")
+    if len(sections) != EXPECTED_SECTIONS:
+        print(f"Warning: Expected {EXPECTED_SECTIONS} sections, but found {len(sections)}")
 
     return sections
 
 
+def _finish_section(text):
+    """Collapses blank lines and trims a section, as `clean_text` + `split_into_sections_regex` would."""
+    return BLANK_LINES_PATTERN.sub('\n', text).strip()
+
+
+def stream_sections(pages):
+    """
+    Cleans and splits page texts incrementally, yielding each financial table as soon as its
+    "above statement ... with the notes" marker has been seen.
+
+    Produces the same sections as `split_into_sections_regex(clean_text(raw_text))` on the joined pages,
+    but the first table is available while later pages are still being extracted.
+
+    Args:
+        pages (iterable): Text of each page, in order (e.g. `iter_page_text(pdf_path)`).
+
+    Yields:
+        str: Each cleaned section of text corresponding to a financial table.
+    """
+    pending = ""  # Cleaned text that has not been emitted as part of a section yet
+    count = 0
+
+    for page_text in pages:
+        kept = [line for line in (page_text + "\n").splitlines() if not HEADER_FOOTER_PATTERN.search(line)]
+        pending += "\n".join(kept) + "\n"
+        pending = COPYRIGHT_PATTERN.sub('', pending)
+
+        # An unterminated copyright block may still swallow text on later pages, so hold it back
+        hold = pending.find(COPYRIGHT_START)
+        ready = pending if hold == -1 else pending[:hold]
+
+        consumed = 0
+        for match in SECTION_END_PATTERN.finditer(ready):
+            if match.end() >= len(ready):  # The optional trailing '.' may not have arrived yet
+                break
+            section = _finish_section(ready[consumed:match.start()])
+            consumed = match.end()
+            if section:
+                count += 1
+                yield section
+        pending = pending[consumed:]
+
+    for part in SECTION_END_PATTERN.split(pending):
+        section = _finish_section(part)
+        if section:
+            count += 1
+            yield section
+
+    if count != EXPECTED_SECTIONS:
+        print(f"Warning: Expected {EXPECTED_SECTIONS} sections, but found {count}")
+
+
 if __name__ == "__main__":
-    pdf_path = "../pdf_inputs/fwc_sample_financial_statement 1.pdf"
-    full_text = extract_full_text(pdf_path)
+    pdf_path = sys.argv[1] if len(sys.argv) > 1 else "../pdf_inputs/fwc_sample_financial_statement 1.pdf"
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    backend = sys.argv[3] if len(sys.argv) > 3 else DEFAULT_BACKEND
+    full_text = profile_extraction(pdf_path, workers=workers, backend=backend)["text"]
     print(full_text)
 
 
@@ -0,0 +1,123 @@
+"""
+rate_limit.py
+
+This script handles:
+- Keeping GenAI calls under the provider's requests-per-minute (RPM) and tokens-per-minute (TPM) limits.
+- Deciding whether a failed call is worth retrying, and how long to back off before doing so.
+
+Classes:
+- TokenBucket: A thread-safe token bucket with an async `acquire`, refilling continuously up to a fixed capacity.
+- RateLimiter: Combines an RPM bucket and a TPM bucket so a call waits until both allow it.
+
+Functions:
+- is_retryable_error(error): True for rate limit (429), server side (5xx) and aborted stream errors.
+- is_rate_limit_error(error): True for rate limit (429) errors only.
+- backoff_delay(attempt, base, cap): Exponential backoff with jitter for a given retry attempt.
+- estimate_tokens(*texts): Cheap token estimate (~4 characters per token) used before a call is made.
+
+Usage:
+>>> limiter = RateLimiter(requests_per_minute=15, tokens_per_minute=1_000_000)
+>>> await limiter.acquire(estimate_tokens(prompt))
+"""
+
+import asyncio
+import random
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    A continuously refilling token bucket.
+
+    The bucket starts full. `acquire(amount)` reserves `amount` tokens straight away and then sleeps until the
+    bucket has refilled enough to cover the reservation, so waiters are served in arrival order. State is
+    guarded by a thread lock rather than an asyncio lock, so one bucket can be shared by event loops running
+    in different threads (e.g. several PDFs being extracted at once in batch mode).
+    """
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self._tokens = capacity
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.refill_per_second)
+        self._last_refill = now
+
+    def _reserve(self, amount: float) -> float:
+        """Takes `amount` tokens (possibly going negative) and returns how long the caller must wait."""
+        amount = min(amount, self.capacity)  # A single oversized request must still be able to run
+        with self._lock:
+            self._refill()
+            self._tokens -= amount
+            return max(0.0, -self._tokens / self.refill_per_second)
+
+    async def acquire(self, amount: float = 1):
+        """Waits until `amount` tokens are available and consumes them."""
+        wait = self._reserve(amount)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def adjust(self, delta: float):
+        """Removes (positive delta) or returns (negative delta) tokens without waiting."""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens - delta)
+
+
+class RateLimiter:
+    """Limits calls to both a requests-per-minute and a tokens-per-minute budget."""
+
+    def __init__(self, requests_per_minute: float = 15, tokens_per_minute: float = 1_000_000):
+        self.requests = TokenBucket(requests_per_minute, requests_per_minute / 60)
+        self.tokens = TokenBucket(tokens_per_minute, tokens_per_minute / 60)
+
+    async def acquire(self, estimated_tokens: int):
+        """Waits until one request and `estimated_tokens` tokens fit in the current minute."""
+        await self.requests.acquire(1)
+        await self.tokens.acquire(estimated_tokens)
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: int):
+        """Corrects the token budget once a response reports how many tokens it really used."""
+        if actual_tokens:
+            self.tokens.adjust(actual_tokens - estimated_tokens)
+
+
+def estimate_tokens(*texts: str) -> int:
+    """Rough token count (~4 characters per token), good enough for budgeting before a call."""
+    return max(1, sum(len(text) for text in texts if text) // 4)
+
+
+def _status_code(error):
+    """Pulls an HTTP status code out of an SDK or HTTP client exception, if it carries one."""
+    for attr in ("code", "status_code"):
+        code = getattr(error, attr, None)
+        if isinstance(code, int):
+            return code
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None)
+
+
+def is_retryable_error(error) -> bool:
+    """
+    Returns True for errors worth retrying: rate limiting (429), server errors (5xx) and errors that mark
+    themselves `retryable` (e.g. streams abandoned by `scripts/llm_stream.py`).
+    """
+    if getattr(error, "retryable", False):
+        return True
+    code = _status_code(error)
+    return code is not None and (code == 429 or 500 <= code < 600)
+
+
+def is_rate_limit_error(error) -> bool:
+    """Returns True if the error is a rate limit / quota exhaustion (429)."""
+    return _status_code(error) == 429
+
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 60.0) -> float:
+    """Exponential backoff with full jitter: a random delay in [0, min(cap, base * 2**attempt)]."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
@@ -0,0 +1,201 @@
+"""
+render.py
+
+This script handles:
+- Rendering summary reports from Markdown to PDF or HTML, or keeping them as Markdown only.
+- Sharing one stylesheet (and, for HTML, one Markdown parser) across every render in a process.
+- Claiming unique output names atomically, so concurrent renders never write to the same file.
+- Rendering in a pool of worker processes in batch mode. Layout is CPU bound and holds the GIL, so otherwise
+  the batch's GenAI threads would render one report at a time, mostly after extraction has finished.
+
+Functions:
+- render_report(markdown_text, output_path, fmt, unique): Renders one report (in the render pool if one is running).
+- render_reports(jobs, fmt, workers, unique): Renders many reports in parallel.
+- start_render_pool(workers) / stop_render_pool(): Starts/stops the shared render pool used by `render_report`.
+
+Usage:
+>>> from scripts.render import render_report
+>>> render_report(markdown_text, "reports/sample/sample_summary.pdf", fmt="html")
+'reports/sample/sample_summary.html'
+
+Or from the repository root, to re-render every saved summary:
+>>> python -m scripts.render --format html --workers 4
+"""
+
+import argparse
+import functools
+import glob
+import html
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+REPORT_FORMATS = ("pdf", "html", "md")
+REPORT_STYLE_VERSION = "1"  # Part of the render stage version; bump when REPORT_CSS changes
+REPORT_CSS = """
+body { font-family: sans-serif; font-size: 11px; }
+h1 { font-size: 20px; } h2 { font-size: 16px; } h3 { font-size: 13px; }
+table { border-collapse: collapse; margin: 6px 0; }
+th, td { border: 1px solid #999; padding: 2px 6px; }
+th { background-color: #eee; }
+"""
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=None)
+def _markdown_parser():
+    """The Markdown parser for HTML output, set up like markdown_pdf's (CommonMark plus tables)."""
+    from markdown_it import MarkdownIt
+    return MarkdownIt("commonmark").enable("table")
+
+
+def _warm_up():
+    """Worker initializer: loads the renderers once per process instead of once per report."""
+    import markdown_pdf  # noqa: F401  (pulls in PyMuPDF)
+    _markdown_parser()
+
+
+def _with_title(markdown_text: str) -> str:
+    # Ensure the markdown starts with a Level 1 header (H1) to prevent TOC errors
+    if not markdown_text.strip().startswith("# "):
+        return "# Financial Summary Report\n\n" + markdown_text  # Add default title
+    return markdown_text
+
+
+def claim_output_path(output_path: str, unique: bool = False) -> str:
+    """
+    Returns the path to write to. With `unique`, the first free name out of `output_path`, `<base>1<ext>`,
+    `<base>2<ext>`, ... is claimed by creating it exclusively (O_EXCL), so two processes can never claim
+    the same name.
+    """
+    directory = os.path.dirname(output_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    if not unique:
+        return output_path
+
+    base, ext = os.path.splitext(output_path)
+    counter = 0
+    while True:
+        candidate = f"{base}{counter or ''}{ext}"
+        try:
+            os.close(os.open(candidate, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return candidate
+        except FileExistsError:
+            counter += 1
+
+
+def _render_pdf(markdown_text: str, path: str):
+    from markdown_pdf import MarkdownPdf, Section  # Pulls in PyMuPDF, so only loaded when rendering
+
+    pdf = MarkdownPdf(toc_level=3)  # Include headings up to level 3 in TOC
+    pdf.add_section(Section(markdown_text), user_css=REPORT_CSS)
+    pdf.save(path)
+
+
+def _render_html(markdown_text: str, path: str):
+    title = markdown_text.strip().splitlines()[0].lstrip("# ").strip()
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"<!DOCTYPE html>\n<html>\n<head>\n<meta charset=\"utf-8\">\n<title>{html.escape(title)}</title>\n"
+                f"<style>{REPORT_CSS}</style>\n</head>\n<body>\n{_markdown_parser().render(markdown_text)}</body>\n</html>\n")
+
+
+def _render_md(markdown_text: str, path: str):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(markdown_text)
+
+
+RENDERERS = {"pdf": _render_pdf, "html": _render_html, "md": _render_md}
+
+
+def _render(markdown_text: str, output_path: str, fmt: str, unique: bool) -> str:
+    path = claim_output_path(f"{os.path.splitext(output_path)[0]}.{fmt}", unique)
+    tmp_path = f"{path}.tmp"
+    try:
+        RENDERERS[fmt](_with_title(markdown_text), tmp_path)
+    except Exception:
+        for leftover in (tmp_path, path) if unique else (tmp_path,):  # Don't leave an empty claimed name behind
+            if os.path.exists(leftover):
+                os.remove(leftover)
+        raise
+    os.replace(tmp_path, path)  # Readers never see a half-written report
+    return path
+
+
+def render_report(markdown_text: str, output_path: str, fmt: str = "pdf", unique: bool = False) -> str:
+    """
+    Renders a Markdown report to `fmt`, in the shared render pool if one is running (see `start_render_pool`).
+
+    Args:
+        markdown_text (str): The markdown-formatted summary report.
+        output_path (str): Where to save it; its extension is replaced by `fmt`.
+        fmt (str): "pdf", "html" or "md".
+        unique (bool): Never overwrite an existing report; claim the next free numbered name instead.
+
+    Returns:
+        str: The path the report was actually saved to.
+    """
+    if fmt not in REPORT_FORMATS:
+        raise ValueError(f"❌ Unknown report format '{fmt}', expected one of {REPORT_FORMATS}.")
+    pool = _pool
+    if pool is not None:
+        path = pool.submit(_render, markdown_text, output_path, fmt, unique).result()
+    else:
+        path = _render(markdown_text, output_path, fmt, unique)
+    print(f"✅ Summary saved as {path}")
+    return path
+
+
+def render_reports(jobs, fmt: str = "pdf", workers: int = 4, unique: bool = False) -> list:
+    """
+    Renders many reports in parallel worker processes.
+
+    Args:
+        jobs (list): (markdown_text, output_path) pairs.
+        fmt, unique: As for `render_report`.
+        workers (int): Number of worker processes.
+
+    Returns:
+        list: The paths written, in the order of `jobs`.
+    """
+    if fmt not in REPORT_FORMATS:
+        raise ValueError(f"❌ Unknown report format '{fmt}', expected one of {REPORT_FORMATS}.")
+    if not jobs:
+        return []
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs)), initializer=_warm_up) as pool:
+        paths = list(pool.map(_render, *zip(*jobs), [fmt] * len(jobs), [unique] * len(jobs)))
+    print(f"✅ Rendered {len(paths)} reports as {fmt.upper()}.")
+    return paths
+
+
+def start_render_pool(workers: int = 4):
+    """Starts the shared render pool, so `render_report` calls from any thread render in parallel processes."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=workers, initializer=_warm_up)
+
+
+def stop_render_pool():
+    """Waits for pending renders and shuts the shared render pool down."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-render saved summary reports (reports/*/*_summary.md).")
+    parser.add_argument("--reports-dir", default="reports")
+    parser.add_argument("--format", default="pdf", choices=("pdf", "html"))
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    jobs = []
+    for md_path in sorted(glob.glob(os.path.join(args.reports_dir, "*", "*_summary.md"))):
+        with open(md_path, "r", encoding="utf-8") as f:
+            jobs.append((f.read(), md_path))
+    render_reports(jobs, fmt=args.format, workers=args.workers)
@@ -0,0 +1,208 @@
+"""
+response_cache.py
+
+This script handles:
+- Caching GenAI responses on disk so re-running the pipeline on the same PDF does not re-send identical prompts.
+- Keying each response on a hash of (model, system instruction, contents).
+- Expiring entries after a TTL and evicting the least recently used entries once the cache exceeds a size limit.
+- Counting hits and misses for the current run.
+
+The cache is a single SQLite file (default: `.cache/genai_responses.sqlite`), shared by `generate_tables.py`
+and `genai_summary.py`.
+
+Classes:
+- CachedResponse: A stored response exposing `.text` and `.usage_metadata` like the SDK response.
+- ResponseCache: The SQLite-backed store.
+
+Functions:
+- configure_cache(enabled, refresh, path, max_bytes, ttl_seconds): Sets the cache options for this process.
+- lookup_response(model, system_instruction, contents): Returns a cached response, or None.
+- store_response(model, system_instruction, contents, response): Saves a fresh response.
+- cache_stats(): Returns the hit/miss counters for this process.
+
+Usage:
+>>> cached = lookup_response(model, instruction, contents)
+>>> if cached is None:
+...     response = client.models.generate_content(...)
+...     store_response(model, instruction, contents, response)
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from types import SimpleNamespace
+
+DEFAULT_CACHE_PATH = os.path.join(".cache", "genai_responses.sqlite")
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024  # 200 MB of response text
+DEFAULT_TTL_SECONDS = 30 * 24 * 60 * 60  # 30 days
+
+_USAGE_FIELDS = ("prompt_token_count", "candidates_token_count", "total_token_count")
+
+
+def make_key(model: str, system_instruction: str, contents) -> str:
+    """Hashes the parts of a request that determine its response."""
+    payload = json.dumps([model, system_instruction, contents], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CachedResponse:
+    """A response loaded from the cache. Mirrors the `.text`/`.usage_metadata` parts of the SDK response."""
+
+    from_cache = True
+
+    def __init__(self, text: str, usage: dict):
+        self.text = text
+        self.usage_metadata = SimpleNamespace(**{name: usage.get(name) for name in _USAGE_FIELDS})
+
+
+class ResponseCache:
+    """
+    SQLite-backed response store with TTL expiry and least-recently-used eviction by total size.
+
+    Args:
+        path (str): SQLite file to store responses in.
+        max_bytes (int): Evict least recently used entries once stored text exceeds this size.
+        ttl_seconds (float): Entries older than this are treated as missing and removed.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_bytes: int = DEFAULT_MAX_BYTES,
+                 ttl_seconds: float = DEFAULT_TTL_SECONDS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT,
+                text TEXT,
+                usage TEXT,
+                size INTEGER,
+                created_at REAL,
+                last_access REAL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+        self._conn.commit()
+
+    def get(self, key: str):
+        """Returns the cached response for `key`, or None if missing or expired."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT text, usage, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[2] > self.ttl_seconds:
+                if row is not None:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return CachedResponse(row[0], json.loads(row[1]))
+
+    def put(self, key: str, model: str, text: str, usage: dict):
+        """Stores a response, then evicts expired and least recently used entries if over the size limit."""
+        now = time.time()
+        size = len(text.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, model, text, json.dumps(usage), size, now, now),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float):
+        self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY last_access").fetchall():
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def clear(self):
+        """Removes every cached response."""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+
+# Process-wide settings, set from the command line via `configure_cache`
+_settings = {
+    "enabled": True,
+    "refresh": False,
+    "path": DEFAULT_CACHE_PATH,
+    "max_bytes": DEFAULT_MAX_BYTES,
+    "ttl_seconds": DEFAULT_TTL_SECONDS,
+}
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def configure_cache(enabled: bool = True, refresh: bool = False, path: str = DEFAULT_CACHE_PATH,
+                    max_bytes: int = DEFAULT_MAX_BYTES, ttl_seconds: float = DEFAULT_TTL_SECONDS):
+    """
+    Sets the cache options for this process.
+
+    Args:
+        enabled (bool): If False, never read or write the cache (`--no-cache`).
+        refresh (bool): If True, ignore cached entries but store the fresh responses (`--refresh`).
+        path (str): SQLite file to use.
+        max_bytes (int): Size limit before least recently used entries are evicted.
+        ttl_seconds (float): Age after which entries expire.
+    """
+    global _cache
+    with _cache_lock:
+        _settings.update(enabled=enabled, refresh=refresh, path=path, max_bytes=max_bytes, ttl_seconds=ttl_seconds)
+        _cache = None
+
+
+def get_cache():
+    """Returns the process-wide cache, or None when caching is disabled."""
+    global _cache
+    if not _settings["enabled"]:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache(_settings["path"], _settings["max_bytes"], _settings["ttl_seconds"])
+        return _cache
+
+
+def lookup_response(model: str, system_instruction: str, contents):
+    """Returns a cached response for this request, or None (always None with `--no-cache`/`--refresh`)."""
+    cache = get_cache()
+    if cache is None or _settings["refresh"]:
+        return None
+    return cache.get(make_key(model, system_instruction, contents))
+
+
+def store_response(model: str, system_instruction: str, contents, response):
+    """Saves a fresh GenAI response so identical requests can be served from disk."""
+    cache = get_cache()
+    text = getattr(response, "text", None)
+    if cache is None or text is None or getattr(response, "from_cache", False):
+        return
+    usage_metadata = getattr(response, "usage_metadata", None)
+    usage = {name: getattr(usage_metadata, name, None) for name in _USAGE_FIELDS}
+    cache.put(make_key(model, system_instruction, contents), model, text, usage)
+
+
+def cache_stats() -> dict:
+    """Returns this process's hit/miss counters (zeros when caching is disabled)."""
+    cache = _cache
+    if cache is None:
+        return {"hits": 0, "misses": 0}
+    return {"hits": cache.hits, "misses": cache.misses}
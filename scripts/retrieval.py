@@ -0,0 +1,314 @@
+"""
+retrieval.py
+
+This script handles:
+- Building a local BM25 retrieval index over each processed PDF's statement sections and CSV rows, saved as
+  `data/<base_name>/retrieval_index.json`. No network access or extra dependencies are needed.
+- Searching one PDF's index, or every PDF's at once (the BM25 statistics are pooled across companies).
+- Building prompts from only the top-k most relevant chunks, for the "retrieval" summary mode and for ad-hoc
+  questions, so prompt size stays flat however long the filings get.
+
+Chunks come in two kinds:
+- "row": one CSV row with at least one value, kept with its table name and header row so it can be quoted on
+  its own. Label-only subtable headers ("Current Assets,,") are left out: being short, they would otherwise
+  outrank the totals they head.
+- "section": a window of `SECTION_CHUNK_LINES` lines of a statement section (this also covers tables whose
+  extraction failed).
+
+Classes:
+- RetrievalIndex: The chunks and their BM25 postings.
+
+Functions:
+- build_index(data_dir, sections): Indexes a PDF's sections and CSVs and saves the index.
+- load_index(data_dir): Loads a PDF's index, building it first if it is missing or outdated.
+- search(query, data_root, companies, k, kinds): The top-k chunks across every (or the given) PDF.
+- format_chunks(chunks): Formats retrieved chunks per company and table as a compact prompt.
+- build_retrieval_prompt(directory, queries, k): The summary prompt for one PDF.
+- build_question_prompt(question, data_root, companies, k): The prompt for an ad-hoc question.
+
+Usage:
+>>> from scripts.retrieval import search
+>>> for chunk in search("total liabilities", k=5):
+...     print(chunk["company"], chunk["table"], chunk["text"])
+
+Or from the command line (repository root):
+>>> python -m scripts.retrieval "total liabilities" --k 5
+>>> python -m scripts.retrieval "Which company holds the most cash?" --ask
+"""
+
+import argparse
+import csv
+import glob
+import heapq
+import io
+import json
+import math
+import os
+import re
+
+RETRIEVAL_INDEX_VERSION = "1"  # Stored in every index; bump when chunking or tokenising changes
+INDEX_FILENAME = "retrieval_index.json"
+SECTION_CHUNK_LINES = 12
+RETRIEVAL_TOP_K = 4  # Chunks retrieved per summary query
+QUESTION_TOP_K = 12  # Chunks retrieved for an ad-hoc question
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# One query per thing the summary instruction asks for
+SUMMARY_QUERIES = (
+    "total revenue income",
+    "total expenses",
+    "surplus deficit net profit for the year",
+    "total comprehensive income",
+    "total current assets total assets",
+    "total current liabilities total liabilities",
+    "net assets total equity",
+    "cash and cash equivalents",
+    "net cash from operating activities",
+    "net cash investing financing activities",
+)
+
+TOKEN_PATTERN = re.compile(r"[a-z]+|\d[\d,]*(?:\.\d+)?")
+STOPWORDS = frozenset("a an and are as at be by for from in is it of on or the to was were which with".split())
+
+
+def tokenize(text: str) -> list:
+    """Lower-cased words and numbers (thousands separators dropped), without stopwords."""
+    return [token.replace(",", "") for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class RetrievalIndex:
+    """
+    Chunks plus BM25 postings (term -> [[chunk index, term frequency], ...]).
+
+    Args:
+        chunks (list): Dicts with "company", "kind", "table", "text" (and "header", "row" for CSV rows).
+        postings (dict): Precomputed postings (default: computed from the chunk texts).
+        lengths (list): Token count of each chunk (computed along with the postings).
+    """
+
+    def __init__(self, chunks: list, postings: dict = None, lengths: list = None):
+        self.chunks = chunks
+        if postings is None:
+            postings, lengths = {}, []
+            for idx, chunk in enumerate(chunks):
+                tokens = tokenize(f"{chunk['table']} {chunk['text']}")
+                lengths.append(len(tokens))
+                counts = {}
+                for token in tokens:
+                    counts[token] = counts.get(token, 0) + 1
+                for token, count in counts.items():
+                    postings.setdefault(token, []).append([idx, count])
+        self.postings = postings
+        self.lengths = lengths
+
+    def save(self, path: str):
+        """Writes the index as JSON (via a temporary file, so readers never see half an index)."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": RETRIEVAL_INDEX_VERSION, "chunks": self.chunks, "lengths": self.lengths,
+                       "postings": self.postings}, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str):
+        """Reads an index saved by `save`, or returns None if it is missing or from another index version."""
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != RETRIEVAL_INDEX_VERSION:
+            return None
+        return cls(data["chunks"], data["postings"], data["lengths"])
+
+    @classmethod
+    def merge(cls, indexes):
+        """Combines several indexes into one, so BM25 statistics are computed over all their chunks."""
+        chunks, postings, lengths = [], {}, []
+        for index in indexes:
+            offset = len(chunks)
+            chunks.extend(index.chunks)
+            lengths.extend(index.lengths)
+            for term, entries in index.postings.items():
+                postings.setdefault(term, []).extend([idx + offset, count] for idx, count in entries)
+        return cls(chunks, postings, lengths)
+
+    def search(self, query: str, k: int = QUESTION_TOP_K, kinds=None) -> list:
+        """
+        Scores every chunk sharing a term with `query` by BM25 and returns the best `k`.
+
+        Args:
+            query (str): Free text query.
+            k (int): Number of chunks to return.
+            kinds (iterable): Only chunks of these kinds ("row", "section"); default: both.
+
+        Returns:
+            list: Chunk dicts with an added "score", best first.
+        """
+        if not self.chunks:
+            return []
+        count = len(self.chunks)
+        average_length = sum(self.lengths) / count or 1
+        scores = {}
+        for term in set(tokenize(query)):
+            entries = self.postings.get(term, [])
+            idf = math.log(1 + (count - len(entries) + 0.5) / (len(entries) + 0.5))
+            for idx, frequency in entries:
+                if kinds is not None and self.chunks[idx]["kind"] not in kinds:
+                    continue
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[idx] / average_length)
+                scores[idx] = scores.get(idx, 0.0) + idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [dict(self.chunks[idx], score=score) for idx, score in best]
+
+
+def _csv_line(row) -> str:
+    output = io.StringIO()
+    csv.writer(output, lineterminator="").writerow(row)
+    return output.getvalue()
+
+
+def _chunks_for(data_dir: str, sections) -> list:
+    company = os.path.basename(os.path.normpath(data_dir))
+    chunks = []
+    for path in sorted(glob.glob(os.path.join(data_dir, "*.csv"))):
+        with open(path, "r", encoding="utf-8") as f:
+            rows = [row for row in csv.reader(f) if any(cell.strip() for cell in row)]
+        if not rows:
+            continue
+        table = os.path.splitext(os.path.basename(path))[0].replace("_", " ").title()
+        header = _csv_line(rows[0])
+        for number, row in enumerate(rows[1:], start=1):
+            if not any(cell.strip() for cell in row[1:]):
+                continue
+            chunks.append({"company": company, "kind": "row", "table": table, "header": header, "row": number,
+                           "text": _csv_line(row)})
+
+    for section in sections:
+        lines = [line for line in section.splitlines() if line.strip()]
+        title = lines[0] if lines else ""
+        for start in range(0, len(lines), SECTION_CHUNK_LINES):
+            chunks.append({"company": company, "kind": "section", "table": title, "row": start,
+                           "text": "\n".join(lines[start:start + SECTION_CHUNK_LINES])})
+    return chunks
+
+
+def build_index(data_dir: str, sections=None) -> RetrievalIndex:
+    """
+    Indexes a PDF's CSV rows and sections and saves the index to `<data_dir>/retrieval_index.json`.
+
+    Args:
+        data_dir (str): The PDF's data directory (`data/<base_name>`).
+        sections (list): The PDF's sections (default: read from `<data_dir>/sections.json`, if present).
+
+    Returns:
+        RetrievalIndex: The new index.
+    """
+    if sections is None:
+        sections_path = os.path.join(data_dir, "sections.json")
+        sections = []
+        if os.path.exists(sections_path):
+            with open(sections_path, "r", encoding="utf-8") as f:
+                sections = json.load(f)
+    index = RetrievalIndex(_chunks_for(data_dir, sections))
+    index.save(os.path.join(data_dir, INDEX_FILENAME))
+    rows = sum(chunk["kind"] == "row" for chunk in index.chunks)
+    print(f"🔎 Indexed {rows} CSV rows and {len(index.chunks) - rows} section chunks for retrieval.")
+    return index
+
+
+def load_index(data_dir: str) -> RetrievalIndex:
+    """Loads a PDF's saved index, building it first if it is missing or from an older index version."""
+    index = RetrievalIndex.load(os.path.join(data_dir, INDEX_FILENAME))
+    return index if index is not None else build_index(data_dir)
+
+
+def _indexed_dirs(data_root: str, companies=None) -> list:
+    """PDF data directories under `data_root` that have an index or CSVs to build one from."""
+    if not os.path.isdir(data_root):
+        raise FileNotFoundError(f"❌ No data directory at {data_root}. Run the pipeline first.")
+    dirs = []
+    for name in sorted(os.listdir(data_root)):
+        path = os.path.join(data_root, name)
+        if companies and name not in companies:
+            continue
+        if os.path.exists(os.path.join(path, INDEX_FILENAME)) or glob.glob(os.path.join(path, "*.csv")):
+            dirs.append(path)
+    return dirs
+
+
+def search(query: str, data_root: str = "data", companies=None, k: int = QUESTION_TOP_K, kinds=None) -> list:
+    """
+    Searches every processed PDF under `data_root` (or just `companies`) at once.
+
+    Returns:
+        list: The best `k` chunk dicts (with "company", "table", "text" and "score"), best first.
+    """
+    index = RetrievalIndex.merge(load_index(path) for path in _indexed_dirs(data_root, companies))
+    return index.search(query, k, kinds)
+
+
+def format_chunks(chunks) -> str:
+    """
+    Formats chunks as a compact prompt: one block per company and table, CSV rows under their header row,
+    all in document order.
+    """
+    groups = {}
+    for chunk in sorted(chunks, key=lambda chunk: (chunk["kind"] != "row", chunk["row"])):
+        groups.setdefault((chunk["company"], chunk["kind"], chunk["table"]), []).append(chunk)
+
+    blocks = []
+    for (company, kind, table), group in sorted(groups.items(), key=lambda item: item[0]):
+        lines = [f"### {table} ({company}{', statement text' if kind == 'section' else ''}) ###"]
+        if kind == "row":
+            lines.append(group[0]["header"])
+        lines += [chunk["text"] for chunk in group]
+        blocks.append("\n".join(lines))
+    return "\n\n".join(blocks) + "\n"
+
+
+def _unique(chunks) -> list:
+    seen, unique = set(), []
+    for chunk in chunks:
+        key = (chunk["company"], chunk["kind"], chunk["table"], chunk["row"])
+        if key not in seen:
+            seen.add(key)
+            unique.append(chunk)
+    return unique
+
+
+def build_retrieval_prompt(directory: str, queries=SUMMARY_QUERIES, k: int = RETRIEVAL_TOP_K) -> str:
+    """
+    Builds one PDF's summary prompt from the top `k` chunks for each query, instead of every table in full.
+    Only CSV rows are used when the PDF has any, since the sections hold the same figures.
+    """
+    index = load_index(directory)
+    kinds = ("row",) if any(chunk["kind"] == "row" for chunk in index.chunks) else None
+    return format_chunks(_unique(chunk for query in queries for chunk in index.search(query, k, kinds)))
+
+
+def build_question_prompt(question: str, data_root: str = "data", companies=None, k: int = QUESTION_TOP_K) -> str:
+    """Builds the prompt for an ad-hoc question: the question and its top `k` chunks across every company."""
+    chunks = search(question, data_root, companies, k)
+    return f"Question: {question}\n\n{format_chunks(chunks) if chunks else 'No matching excerpts.'}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search (or ask GenAI about) every processed PDF's tables.")
+    parser.add_argument("query", help='What to look for, e.g. "total liabilities", or a question with --ask.')
+    parser.add_argument("--k", type=int, default=QUESTION_TOP_K, help="Number of chunks to retrieve.")
+    parser.add_argument("--company", action="append", help="Only search this company's data (repeatable).")
+    parser.add_argument("--data-root", default="data")
+    parser.add_argument("--ask", action="store_true", help="Send the question and its top-k chunks to GenAI.")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild every index before searching.")
+    args = parser.parse_args()
+
+    if args.rebuild:
+        for data_dir in _indexed_dirs(args.data_root, args.company):
+            build_index(data_dir)
+    if args.ask:
+        from scripts.genai_summary import answer_question
+        print(answer_question(args.query, args.data_root, args.company, args.k).text)
+    else:
+        for chunk in search(args.query, args.data_root, args.company, args.k):
+            print(f"{chunk['score']:6.2f}  {chunk['company']} / {chunk['table']}: {chunk['text']}")
@@ -0,0 +1,466 @@
+"""
+section_index.py
+
+This script handles:
+- Fingerprinting every section extracted by GenAI, so a near-duplicate section in a later filing (the same
+  statement a year on, or a sister entity's) can reuse that extraction's table layout instead of a fresh request.
+- Comparing sections by structure rather than by values: amounts are masked out ("Revenue 1,200 900" ->
+  "Revenue # #"), and a MinHash signature over word shingles of the masked text, split into LSH bands,
+  finds previous sections with a similar layout without comparing against every one.
+- Rebuilding the table for a near-duplicate:
+  - Lines are aligned with their previous version.
+  - Each CSV row of the previous extraction is traced back to its source line, and that row's values are
+    replaced with the aligned line's new amounts.
+  - When every row can be rebuilt this way and no line is new, no GenAI request is needed.
+  - Otherwise only the changed lines are sent, as a diff prompt, and the rows GenAI returns for them are
+    merged in.
+  - If any row can't be traced to a line, or its amounts can't be placed on a line whose layout is
+    unchanged, the section is extracted in full rather than risk losing rows.
+- Counting reused tables, diff prompts and GenAI calls saved for the current run.
+
+The index is a single SQLite file (default: `.cache/section_index.sqlite`), next to the response cache. Deleting
+it only means sections are extracted afresh.
+
+Classes:
+- ReusePlan: How a section's table is rebuilt from a previous extraction, and the diff prompt for the lines that aren't.
+- SectionIndex: The SQLite-backed MinHash/LSH index.
+
+Functions:
+- configure_section_index(enabled, path): Sets the index options for this process.
+- plan_reuse(section_text): Returns a ReusePlan for a near-duplicate of a previously extracted section, or None.
+- remember_section(section_text, table_name, csv_data): Adds an extracted section to the index.
+- record_reuse(sections, reused, diff_prompts): Adds a PDF's counts to this process's totals.
+- reuse_stats(): Returns this process's reuse counters.
+
+Usage:
+>>> plan = plan_reuse(section_text)
+>>> if plan is not None and not plan.changed_lines:
+...     save_csv(plan.table_name, plan.merge([]), output_dir)   # no GenAI request at all
+"""
+
+import csv
+import difflib
+import hashlib
+import io
+import json
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+
+from scripts.statement_store import parse_number
+
+DEFAULT_INDEX_PATH = os.path.join(".cache", "section_index.sqlite")
+NUM_PERMUTATIONS = 64
+LSH_BANDS = 16  # 4 signature values per band: sections with ~50% shingle overlap usually share a band
+SHINGLE_WORDS = 3
+MIN_SIMILARITY = 0.8  # Estimated Jaccard similarity of masked shingles for a section to count as a near-duplicate
+MAX_CHANGED_SHARE = 0.5  # Past this share of changed lines a diff prompt isn't worth it; extract the whole section
+
+AMOUNT = r"\(?-?\$?\d[\d,]*(?:\.\d+)?\)?|-|–"
+AMOUNT_PATTERN = re.compile(rf"(?<!\S)(?:{AMOUNT})(?!\S)")
+NOTE_PATTERN = re.compile(r"\d{1,2}[A-Z]")  # A note reference ("3A") between a line's label and its amounts
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(20240601)  # Fixed, so signatures stay comparable across runs
+_PERMUTATIONS = [(_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+                 for _ in range(NUM_PERMUTATIONS)]
+
+
+def _lines(section_text: str) -> list:
+    return [line.strip() for line in section_text.splitlines() if line.strip()]
+
+
+def mask_line(line: str) -> str:
+    """The layout of a line: its amounts replaced by "#"."""
+    return AMOUNT_PATTERN.sub("#", line)
+
+
+def _amounts(line: str) -> list:
+    return [parse_number(amount) for amount in AMOUNT_PATTERN.findall(line)]
+
+
+def _label_key(text: str) -> str:
+    """Letters and digits only, lower case, so "Total  Revenue" matches "total revenue"."""
+    return re.sub(r"[^a-z0-9]", "", text.lower())
+
+
+def minhash_signature(masked_lines) -> list:
+    """MinHash signature of the word shingles of a section's masked lines."""
+    words = " ".join(masked_lines).lower().split()
+    shingles = {" ".join(words[idx:idx + SHINGLE_WORDS]) for idx in range(max(len(words) - SHINGLE_WORDS + 1, 1))}
+    hashes = [int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+              for shingle in shingles]
+    return [min((a * value + b) % _MERSENNE_PRIME for value in hashes) for a, b in _PERMUTATIONS]
+
+
+def _band_keys(signature) -> list:
+    rows = NUM_PERMUTATIONS // LSH_BANDS
+    return [f"{band}:" + hashlib.blake2b(json.dumps(signature[band * rows:(band + 1) * rows]).encode("ascii"),
+                                         digest_size=8).hexdigest()
+            for band in range(LSH_BANDS)]
+
+
+def _similarity(signature, other) -> float:
+    return sum(a == b for a, b in zip(signature, other)) / NUM_PERMUTATIONS
+
+
+def _format_amount(value: float, like: str) -> str:
+    """Writes a new amount in the style of the text it replaces ("-" for 0, separators, "$", brackets for negatives)."""
+    like = like.strip()
+    if value == 0 and like in ("-", "–"):
+        return like
+    text = f"{abs(value):,.0f}" if value.is_integer() else f"{abs(value):,}"
+    if "," not in like:
+        text = text.replace(",", "")
+    if "$" in like:
+        text = f"${text}"
+    if value < 0:
+        return f"({text})" if like.startswith("(") else f"-{text}"
+    return text
+
+
+def _wrapped_label(key: str, line: str, next_line: str) -> bool:
+    """True if a row label (`key`) is the label of `line` continued on `next_line`, as when a long label wraps."""
+    words = line.split()
+    while words and (AMOUNT_PATTERN.fullmatch(words[-1]) or NOTE_PATTERN.fullmatch(words[-1])):
+        words.pop()
+    label = _label_key(" ".join(words))
+    rest = key[len(label):]
+    return bool(label and rest) and key.startswith(label) and _label_key(next_line).startswith(rest)
+
+
+def _row_line(row, lines, start: int):
+    """
+    Finds the first line from `start` on that starts with the row's label, or that starts it and wraps onto the
+    next line (e.g. "Closing balance as at 342,000" + "30 June previous year").
+
+    Returns:
+        tuple: (line index, number of lines the label spans), or None. Labels without letters (e.g. an amount
+            in the label column) can't be traced to a line.
+    """
+    key = _label_key(row[0]) if row else ""
+    if not re.search(r"[a-z]", key):
+        return None
+    for idx in range(start, len(lines)):
+        if _label_key(lines[idx]).startswith(key):
+            return idx, 1
+        if idx + 1 < len(lines) and _wrapped_label(key, lines[idx], lines[idx + 1]):
+            return idx, 2
+    return None
+
+
+def _span_amounts(lines, line: int, span: int) -> list:
+    """The amounts of a row's lines, those of a wrapped label's continuation first, so the row's values come last."""
+    return [amount for idx in reversed(range(line, line + span)) for amount in _amounts(lines[idx])]
+
+
+def _rebuild_row(row, old_amounts, new_amounts):
+    """
+    Replaces a row's values with the new line's amounts, matching each value to its position among the old
+    line's amounts. Usually the values are the line's last amounts, in order; otherwise each value is matched
+    by what it was (so "-" values, which are all 0, only line up in the usual case). Numbers in the label
+    itself (e.g. "30 June 2023") are matched the same way. Returns None if a number can't be placed
+    unambiguously.
+    """
+    if len(new_amounts) != len(old_amounts):
+        return None
+    values = [parse_number(cell) if cell.strip() else None for cell in row]
+    cell_values = [value for value in values[1:] if value is not None]
+    in_order = len(cell_values) <= len(old_amounts) and old_amounts[len(old_amounts) - len(cell_values):] == cell_values
+    label_amounts = len(old_amounts) - len(cell_values) if in_order else len(old_amounts)
+
+    def placed(value, like, positions):
+        candidates = {new_amounts[pos] for pos in positions if old_amounts[pos] == value}
+        if len(candidates) != 1:
+            raise LookupError(like)
+        return _format_amount(candidates.pop(), like)
+
+    try:
+        rebuilt = [AMOUNT_PATTERN.sub(lambda match: placed(parse_number(match.group()), match.group(),
+                                                           range(label_amounts)), row[0])]
+        position = label_amounts
+        for cell, value in zip(row[1:], values[1:]):
+            if value is None:
+                rebuilt.append(cell)
+            elif in_order:  # The usual case: one cell per remaining amount on the line, in the same order
+                rebuilt.append(placed(value, cell, [position]))
+                position += 1
+            else:
+                rebuilt.append(placed(value, cell, range(len(old_amounts))))
+    except LookupError:
+        return None
+    return rebuilt
+
+
+class ReusePlan:
+    """
+    How to rebuild a section's table from a previous extraction of a near-duplicate section.
+
+    Attributes:
+        table_name (str): The previous extraction's table name (updated if it is a line of the section).
+        similarity (float): Estimated Jaccard similarity of the two sections' masked shingles.
+        changed_lines (list): Lines of the new section the previous table can't account for (new or edited).
+            Empty when the whole table was rebuilt locally.
+        expected_rows (int): The fewest rows the merged table can have: the previous table's, less those of
+            lines the new section no longer has. A merge with fewer rows has lost some and shouldn't be used.
+    """
+
+    def __init__(self, section_text: str, table_name: str, header: list, rows: list, changed_lines: list,
+                 similarity: float, expected_rows: int):
+        self.section_text = section_text
+        self.table_name = table_name
+        self.header = header
+        self._rows = rows  # (new line index, row) for every rebuilt row
+        self.changed_lines = changed_lines  # (new line index, text)
+        self.similarity = similarity
+        self.expected_rows = expected_rows
+
+    def diff_prompt(self) -> str:
+        """Extraction prompt contents for just the changed lines, with the table's title and columns for context."""
+        lines = [self.table_name, "Columns: " + ",".join(self.header),
+                 "Extract only these rows:"] + [text for _, text in self.changed_lines]
+        return "\n".join(lines)
+
+    def merge(self, csv_rows) -> str:
+        """
+        The rebuilt table with `csv_rows` (the CSV rows GenAI returned for the changed lines) put back at
+        their lines' positions.
+        """
+        merged = list(self._rows)
+        changed = [(idx, _label_key(text)) for idx, text in self.changed_lines]
+        position = changed[0][0] if changed else len(_lines(self.section_text))
+        for row in csv_rows:
+            if not row or _label_key(row[0]) == _label_key(self.header[0]):
+                continue
+            key = _label_key(row[0])
+            match = next((idx for idx, line_key in changed if idx >= position and key and line_key.startswith(key)),
+                         None)
+            if match is None and not any(parse_number(cell) is not None for cell in row[1:] if cell.strip()):
+                continue  # Not one of the lines asked about (e.g. the prompt's "Columns:" line)
+            position = match if match is not None else position
+            merged.append((position + 0.5, row))  # After any rebuilt row from the same line
+        merged.sort(key=lambda item: item[0])
+
+        output = io.StringIO()
+        writer = csv.writer(output, lineterminator="\n")
+        writer.writerow(self.header)
+        writer.writerows(row for _, row in merged)
+        return output.getvalue().rstrip("\n")
+
+
+def _plan(section_text, similarity, old_text, table_name, csv_data):
+    """Aligns a section with a previously extracted one and rebuilds what it can of its table."""
+    old_lines, new_lines = _lines(old_text), _lines(section_text)
+    table = [row for row in csv.reader(io.StringIO(csv_data)) if row]
+    if len(table) < 2:
+        return None
+    header, rows = table[0], table[1:]
+
+    # Old line -> new line, for lines whose layout is unchanged
+    matcher = difflib.SequenceMatcher(None, [mask_line(line) for line in old_lines],
+                                      [mask_line(line) for line in new_lines], autojunk=False)
+    aligned, changed, deleted = {}, set(), set()
+    for tag, old_start, old_end, new_start, new_end in matcher.get_opcodes():
+        if tag == "equal":
+            aligned.update(zip(range(old_start, old_end), range(new_start, new_end)))
+        else:
+            changed.update(range(new_start, new_end))
+            if tag == "delete":
+                deleted.update(range(old_start, old_end))
+
+    # A title taken from a line of the section follows that line: its numbers (e.g. "... 2023") are updated,
+    # and if it was edited this is a different statement. Invented names ("Income Statement") are kept.
+    title = next((idx for idx, line in enumerate(old_lines) if line.lower() == table_name.strip().lower()), None)
+    if title is not None:
+        if title not in aligned:
+            return None
+        table_name = new_lines[aligned[title]]
+    elif AMOUNT_PATTERN.search(table_name):
+        return None
+
+    if any(parse_number(cell) is not None for cell in header[1:]):
+        # Numbered columns (e.g. years) come from a header line, which has new numbers too
+        header_line = next((idx for idx in sorted(aligned) if _rebuild_row(header, _amounts(old_lines[idx]),
+                                                                          _amounts(new_lines[aligned[idx]]))), None)
+        if header_line is None:
+            return None
+        header = _rebuild_row(header, _amounts(old_lines[header_line]), _amounts(new_lines[aligned[header_line]]))
+
+    rebuilt, start, removed = [], 0, 0
+    for row in rows:
+        if not _label_key(row[0]) and all(parse_number(cell) is None for cell in row[1:] if cell.strip()):
+            rebuilt.append((rebuilt[-1][0] if rebuilt else -1, row))  # e.g. a "$,$" units row: keep it where it was
+            continue
+        found = _row_line(row, old_lines, start)
+        if found is None:
+            return None  # A row we can't trace back to the text; don't guess at the layout
+        line, span = found
+        start = line + span
+        if not all(idx in aligned for idx in range(line, line + span)):
+            # The line was edited or removed. An edited one is in `changed`, and so is the rest of a wrapped label.
+            removed += line in deleted
+            changed.update(aligned[idx] for idx in range(line, line + span) if idx in aligned)
+            continue
+        new_row = _rebuild_row(row, _span_amounts(old_lines, line, span),
+                               _span_amounts([new_lines[aligned[idx]] for idx in range(line, line + span)], 0, span))
+        if new_row is None:
+            return None  # The line's layout is unchanged, yet its amounts can't be placed: the row was misread
+        rebuilt.append((aligned[line], new_row))
+
+    # Drop rows whose line is being re-extracted, so it isn't in the table twice
+    rebuilt = [(line, row) for line, row in rebuilt if line not in changed]
+    changed_lines = [(idx, new_lines[idx]) for idx in sorted(changed)]
+    if len(changed_lines) > MAX_CHANGED_SHARE * len(new_lines):
+        return None
+    return ReusePlan(section_text, table_name, header, rebuilt, changed_lines, similarity, len(rows) - removed)
+
+
+class SectionIndex:
+    """
+    SQLite-backed MinHash/LSH index of extracted sections.
+
+    Args:
+        path (str): SQLite file to store the index in.
+    """
+
+    def __init__(self, path: str = DEFAULT_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """CREATE TABLE IF NOT EXISTS sections (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                layout_hash TEXT UNIQUE,
+                signature TEXT,
+                section_text TEXT,
+                table_name TEXT,
+                csv_data TEXT,
+                created_at REAL
+            );
+            CREATE TABLE IF NOT EXISTS bands (
+                band_key TEXT,
+                section_id INTEGER
+            );
+            CREATE INDEX IF NOT EXISTS bands_key ON bands (band_key);"""
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def _layout_hash(masked_lines) -> str:
+        return hashlib.sha256("\n".join(masked_lines).encode("utf-8")).hexdigest()
+
+    def add(self, section_text: str, table_name: str, csv_data: str):
+        """Adds an extracted section. A section with the same layout as an indexed one replaces it (newer values)."""
+        masked = [mask_line(line) for line in _lines(section_text)]
+        signature = minhash_signature(masked)
+        layout_hash = self._layout_hash(masked)
+        with self._lock:
+            self._conn.execute("DELETE FROM bands WHERE section_id IN (SELECT id FROM sections WHERE layout_hash = ?)",
+                               (layout_hash,))
+            cursor = self._conn.execute(
+                "INSERT OR REPLACE INTO sections (layout_hash, signature, section_text, table_name, csv_data, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (layout_hash, json.dumps(signature), section_text, table_name, csv_data, time.time()))
+            self._conn.executemany("INSERT INTO bands VALUES (?, ?)",
+                                   [(key, cursor.lastrowid) for key in _band_keys(signature)])
+            self._conn.commit()
+
+    def nearest(self, section_text: str):
+        """
+        Returns:
+            tuple: (similarity, section_text, table_name, csv_data) of the most similar indexed section with an
+                estimated similarity of at least `MIN_SIMILARITY` (an identical layout first), or None.
+        """
+        masked = [mask_line(line) for line in _lines(section_text)]
+        with self._lock:
+            row = self._conn.execute("SELECT section_text, table_name, csv_data FROM sections WHERE layout_hash = ?",
+                                     (self._layout_hash(masked),)).fetchone()
+            if row is not None:
+                return (1.0,) + row
+            signature = minhash_signature(masked)
+            keys = _band_keys(signature)
+            candidates = self._conn.execute(
+                f"SELECT DISTINCT s.signature, s.section_text, s.table_name, s.csv_data FROM bands b "
+                f"JOIN sections s ON s.id = b.section_id WHERE b.band_key IN ({','.join('?' * len(keys))})",
+                keys).fetchall()
+        scored = [(_similarity(signature, json.loads(candidate[0])),) + candidate[1:] for candidate in candidates]
+        best = max(scored, key=lambda item: item[0], default=None)
+        return best if best is not None and best[0] >= MIN_SIMILARITY else None
+
+
+# Process-wide settings, set from the command line via `configure_section_index`
+_settings = {"enabled": True, "path": DEFAULT_INDEX_PATH}
+_index = None
+_index_lock = threading.Lock()
+_stats = {"sections": 0, "reused": 0, "diff_prompts": 0}
+
+
+def configure_section_index(enabled: bool = True, path: str = DEFAULT_INDEX_PATH):
+    """
+    Sets the index options for this process.
+
+    Args:
+        enabled (bool): If False, neither reuse previous extractions nor index new ones (`--no-section-reuse`).
+        path (str): SQLite file to use.
+    """
+    global _index
+    with _index_lock:
+        _settings.update(enabled=enabled, path=path)
+        _index = None
+
+
+def get_section_index():
+    """Returns the process-wide index, or None when reuse is disabled."""
+    global _index
+    if not _settings["enabled"]:
+        return None
+    with _index_lock:
+        if _index is None:
+            _index = SectionIndex(_settings["path"])
+        return _index
+
+
+def plan_reuse(section_text: str):
+    """
+    Looks for a previously extracted near-duplicate of a section.
+
+    Returns:
+        ReusePlan: How to rebuild its table, or None if there is no near-duplicate (or its table can't be
+            traced back to its text), or reuse is disabled.
+    """
+    index = get_section_index()
+    if index is None:
+        return None
+    nearest = index.nearest(section_text)
+    return _plan(section_text, *nearest) if nearest is not None else None
+
+
+def remember_section(section_text: str, table_name: str, csv_data: str):
+    """Adds an extracted section to the index, so later near-duplicates can reuse its layout."""
+    index = get_section_index()
+    if index is not None and csv_data:
+        index.add(section_text, table_name, csv_data)
+
+
+def record_reuse(sections: int, reused: int, diff_prompts: int):
+    """Adds a PDF's GenAI-bound sections, tables rebuilt without GenAI, and diff prompts sent to this run's totals."""
+    with _index_lock:
+        _stats["sections"] += sections
+        _stats["reused"] += reused
+        _stats["diff_prompts"] += diff_prompts
+
+
+def reuse_stats() -> dict:
+    """
+    Returns:
+        dict: {"sections": GenAI-bound sections seen, "reused": tables rebuilt without GenAI (one GenAI call saved
+            each in per-section mode), "diff_prompts": sections sent as a diff prompt instead of in full}
+    """
+    with _index_lock:
+        return dict(_stats)
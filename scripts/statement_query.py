@@ -0,0 +1,111 @@
+"""
+statement_query.py
+
+Portfolio-level queries over the columnar statement store written by `statement_store.py`, without
+opening any per-PDF CSVs.
+
+Functions:
+- load_store(root, companies, statements, line_items, max_period_index): Scans the store into a DataFrame,
+  pushing the filters down to the Parquet partitions/row groups.
+- query_line_item(line_item, periods, root, companies): One line item for every company, one column per period.
+- list_companies(root): Companies present in the store.
+
+Usage:
+>>> from scripts.statement_query import query_line_item
+>>> query_line_item("Total Assets", periods=2)   # Total Assets for every company, last two years
+
+Or from the command line (repository root):
+>>> python -m scripts.statement_query "Total Assets" --periods 2
+"""
+
+import argparse
+import os
+
+from scripts.statement_store import STORE_ROOT, normalise_line_item, partition_value
+
+
+def _dataset(root: str):
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    # Declare the partition keys as strings so company names that look like numbers aren't parsed as ints
+    partitioning = ds.partitioning(pa.schema([("company", pa.string()), ("statement", pa.string())]), flavor="hive")
+    return ds.dataset(root, format="parquet", partitioning=partitioning)
+
+
+def load_store(root: str = STORE_ROOT, companies=None, statements=None, line_items=None, max_period_index=None):
+    """
+    Scans the store into a pandas DataFrame, reading only the partitions and rows that match the filters.
+
+    Args:
+        root (str): Root directory of the store.
+        companies (list): Only these companies (default: all).
+        statements (list): Only these statement types (default: all).
+        line_items (list): Only these line items, matched case/punctuation-insensitively (default: all).
+        max_period_index (int): Only periods with index <= this (0 is the most recent period).
+
+    Returns:
+        pandas.DataFrame: company, statement, line_item, row_number, period, period_index, value.
+    """
+    import pyarrow.dataset as ds
+
+    if not os.path.isdir(root):
+        raise FileNotFoundError(f"❌ No statement store at {root}. Run the pipeline first.")
+
+    conditions = []
+    # Partitions are named after the sanitised company/statement names, so filter on those
+    if companies:
+        conditions.append(ds.field("company").isin([partition_value(company) for company in companies]))
+    if statements:
+        conditions.append(ds.field("statement").isin([partition_value(statement) for statement in statements]))
+    if line_items:
+        conditions.append(ds.field("line_item_key").isin([normalise_line_item(item) for item in line_items]))
+    if max_period_index is not None:
+        conditions.append(ds.field("period_index") <= max_period_index)
+
+    condition = None
+    for expr in conditions:
+        condition = expr if condition is None else condition & expr
+
+    columns = ["company", "statement", "line_item", "row_number", "period", "period_index", "value"]
+    return _dataset(root).to_table(columns=columns, filter=condition).to_pandas()
+
+
+def query_line_item(line_item: str, periods: int = 2, root: str = STORE_ROOT, companies=None):
+    """
+    Returns one line item for every company, one column per period.
+
+    Args:
+        line_item (str): The line item to look up, e.g. "Total Assets".
+        periods (int): How many of the most recent periods to include.
+        root (str): Root directory of the store.
+        companies (list): Only these companies (default: all).
+
+    Returns:
+        pandas.DataFrame: Indexed by (company, statement), one column per period label.
+    """
+    df = load_store(root, companies=companies, line_items=[line_item], max_period_index=periods - 1)
+    if df.empty:
+        return df
+    # If a label repeats within a statement (e.g. "Total Cash Received" per activity), keep its first occurrence
+    df = df.sort_values("row_number").drop_duplicates(["company", "statement", "period_index"])
+    pivot = df.pivot_table(index=["company", "statement"], columns="period_index", values="value", aggfunc="first")
+    labels = df.drop_duplicates("period_index").set_index("period_index")["period"]
+    pivot = pivot.rename(columns=labels.to_dict())
+    pivot.columns.name = "period"
+    return pivot
+
+
+def list_companies(root: str = STORE_ROOT) -> list:
+    """Returns the companies present in the store."""
+    if not os.path.isdir(root):
+        return []
+    return sorted(name.split("=", 1)[1] for name in os.listdir(root) if name.startswith("company="))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query a line item across every company in the statement store.")
+    parser.add_argument("line_item", help='Line item to look up, e.g. "Total Assets".')
+    parser.add_argument("--periods", type=int, default=2, help="Number of most recent periods to show.")
+    parser.add_argument("--root", default=STORE_ROOT)
+    args = parser.parse_args()
+    print(query_line_item(args.line_item, periods=args.periods, root=args.root).to_string())
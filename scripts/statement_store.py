@@ -0,0 +1,140 @@
+"""
+statement_store.py
+
+This script handles:
+- Writing every extracted table into a columnar Parquet store, in long format:
+  (company, statement, line_item, row_number, period, period_index, value).
+- Partitioning the store by company and statement type, so a query for one line item across thousands
+  of filings only scans the columns and partitions it needs.
+
+The store lives under `data/statement_store/` as `company=<base_name>/statement=<table>/part-0.parquet`.
+Re-saving a table overwrites its partition, and a rerun first clears the company's earlier partitions (table
+names come from the model and may change), so reruns never duplicate or leave behind rows.
+
+Functions:
+- csv_to_records(company, statement, csv_content): Converts a CSV table to long-format records.
+- write_statement(company, statement, csv_content, root): Writes (or replaces) one table's partition.
+- remove_company(company, root): Deletes every partition of one company.
+- parse_number(value): Parses a CSV cell as a number ("1,000", "(500)" and "-" are understood).
+- normalise_line_item(label): Case/punctuation-insensitive key used to match line items across filings.
+- partition_value(value): The partition directory name a company or statement is stored under.
+
+Usage:
+>>> from scripts.statement_store import write_statement
+>>> write_statement("fwc_sample_financial_statement_1", "statement_of_financial_position", csv_text)
+"""
+
+import csv
+import io
+import os
+import re
+import shutil
+
+STORE_ROOT = os.path.join("data", "statement_store")
+
+
+def normalise_line_item(label: str) -> str:
+    """Lowercases a line item and collapses punctuation/whitespace ("Non -Current  Assets" -> "non current assets")."""
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", str(label).lower()).split())
+
+
+def parse_number(value: str):
+    """Parses a CSV cell as a float, or returns None if it isn't a number."""
+    value = value.strip().replace(",", "").replace("$", "")
+    if value in ("-", "–"):
+        return 0.0
+    if value.startswith("(") and value.endswith(")"):
+        value = "-" + value[1:-1]
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def csv_to_records(company: str, statement: str, csv_content: str) -> dict:
+    """
+    Converts a CSV table into long-format columns, one row per (line item, period) value.
+
+    The first CSV column holds line item labels; every other column is a period (e.g. "Last Year",
+    "Previous Year"), with `period_index` 0 for the first (most recent) one. Subtable header rows, which
+    have no values, are dropped.
+
+    Returns:
+        dict: Column name -> list of values, ready for `pyarrow.Table.from_pydict`.
+    """
+    columns = {name: [] for name in
+               ("company", "statement", "line_item", "line_item_key", "row_number", "period", "period_index", "value")}
+    rows = list(csv.reader(io.StringIO(csv_content)))
+    if not rows:
+        return columns
+
+    periods = [header.strip() for header in rows[0][1:]]
+    for row_number, row in enumerate(rows[1:], start=2):
+        if not row:
+            continue
+        label = row[0].strip()
+        for period_index, period in enumerate(periods):
+            cell = row[period_index + 1] if period_index + 1 < len(row) else ""
+            if not cell.strip():
+                continue
+            columns["company"].append(company)
+            columns["statement"].append(statement)
+            columns["line_item"].append(label)
+            columns["line_item_key"].append(normalise_line_item(label))
+            columns["row_number"].append(row_number)
+            columns["period"].append(period)
+            columns["period_index"].append(period_index)
+            columns["value"].append(parse_number(cell))
+    return columns
+
+
+def partition_value(value: str) -> str:
+    """Makes a value safe to use as a hive partition directory name (queries must filter on this form too)."""
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", value)
+
+
+def _company_dir(company: str, root: str) -> str:
+    return os.path.join(root, f"company={partition_value(company)}")
+
+
+def remove_company(company: str, root: str = STORE_ROOT):
+    """Deletes every statement partition of a company, so tables that were renamed or dropped on a rerun don't linger."""
+    shutil.rmtree(_company_dir(company, root), ignore_errors=True)
+
+
+def write_statement(company: str, statement: str, csv_content: str, root: str = STORE_ROOT) -> str:
+    """
+    Writes one table into the store, replacing any earlier version of the same (company, statement).
+
+    Args:
+        company (str): Company/filing identifier (the PDF's base name).
+        statement (str): Statement type (the saved CSV's name, e.g. "statement_of_cash_flows").
+        csv_content (str): The table as CSV text.
+        root (str): Root directory of the store.
+
+    Returns:
+        str: Path of the Parquet file written.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    partition_dir = os.path.join(_company_dir(company, root), f"statement={partition_value(statement)}")
+    os.makedirs(partition_dir, exist_ok=True)
+
+    records = csv_to_records(company, statement, csv_content)
+    # company/statement are encoded in the partition path, so they're not repeated inside the file
+    del records["company"], records["statement"]
+    table = pa.table({
+        "line_item": pa.array(records["line_item"], pa.string()),
+        "line_item_key": pa.array(records["line_item_key"], pa.string()),
+        "row_number": pa.array(records["row_number"], pa.int32()),
+        "period": pa.array(records["period"], pa.string()),
+        "period_index": pa.array(records["period_index"], pa.int8()),
+        "value": pa.array(records["value"], pa.float64()),
+    })
+
+    path = os.path.join(partition_dir, "part-0.parquet")
+    tmp_path = os.path.join(partition_dir, ".part-0.parquet.tmp")  # Dot-prefixed, so dataset scans skip it
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, path)  # Readers never see a half-written file
+    return path
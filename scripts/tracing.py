@@ -0,0 +1,286 @@
+"""
+tracing.py
+
+This script handles:
+- Recording what each pipeline stage cost for each PDF: wall time, CPU time of the thread(s) running it, peak
+  memory growth, bytes read and written, GenAI calls, prompt/response tokens, cache hits, retries, aborted
+  streams and tables parsed without GenAI.
+- Appending one JSON line per stage to a trace file, from the main process and from batch worker processes alike.
+- Exporting a run's totals as a Prometheus text-format file.
+- Optionally profiling the CPU-bound stages with cProfile.
+
+Tracing is configured through environment variables (set by `configure_tracing`), so worker processes
+started by batch mode pick up the same settings.
+
+Classes:
+- StageSpan: The measurements of one stage for one PDF.
+
+Functions:
+- configure_tracing(trace_file, profile_dir, run_id): Enables tracing for this process and its children.
+- trace_stage(pdf_path, stage): Context manager that measures a stage and writes its JSON line.
+- current_span(): The span of the stage running in this context (None outside a stage).
+- new_span(pdf_path, stage) / write_span(span): Creates and writes a span by hand, for stages that don't run in one block.
+- traced_iter(iterable, span): Yields from an iterable, adding the time spent producing each item to a span.
+- write_prometheus_metrics(trace_file, metrics_file, run_id): Aggregates a run's spans into Prometheus text format.
+- peak_rss_mb(): Peak resident set size of this process and its finished children, in MB.
+
+Usage:
+>>> from scripts.tracing import configure_tracing, trace_stage, write_prometheus_metrics
+>>> run_id = configure_tracing("data/trace.jsonl")
+>>> with trace_stage(pdf_path, "extract") as span:
+...     span.bytes_in = os.path.getsize(pdf_path)
+>>> write_prometheus_metrics("data/trace.jsonl", "data/metrics.prom", run_id)
+"""
+
+import contextlib
+import contextvars
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass
+
+try:
+    import resource
+except ImportError:  # Not available on Windows; psutil is used there instead
+    resource = None
+
+TRACE_FILE_ENV = "PIPELINE_TRACE_FILE"
+PROFILE_DIR_ENV = "PIPELINE_PROFILE_DIR"
+RUN_ID_ENV = "PIPELINE_RUN_ID"
+PROFILED_STAGES = ("extract", "clean", "split", "render")  # The CPU-bound stages
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+_write_lock = threading.Lock()
+_profiler_lock = threading.Lock()  # cProfile can only profile one stage at a time per process
+
+
+@dataclass
+class StageSpan:
+    """The measurements of one stage for one PDF (one JSON line in the trace file)."""
+    run_id: str
+    pdf: str
+    stage: str
+    status: str = "ran"  # "ran", "skipped" or "failed"
+    started_at: float = 0.0
+    wall_seconds: float = 0.0
+    cpu_seconds: float = 0.0  # Per-thread, so stages running concurrently in one process don't count each other's CPU
+    peak_rss_growth_mb: float = 0.0  # How far the stage raised the process's peak RSS (0 if it stayed below an earlier peak)
+    bytes_in: int = 0
+    bytes_out: int = 0
+    llm_calls: int = 0
+    prompt_tokens: int = 0
+    response_tokens: int = 0
+    cache_hits: int = 0
+    retries: int = 0
+    aborted_streams: int = 0  # Streamed replies abandoned early (stalled or unusable)
+    local_tables: int = 0  # Tables parsed locally instead of by GenAI
+    reused_tables: int = 0  # Tables rebuilt from a near-duplicate section extracted before, without GenAI
+    error: str = ""
+
+    def record_llm_call(self, usage):
+        """Adds a GenAI response's token usage (its `usage_metadata`)."""
+        self.llm_calls += 1
+        self.prompt_tokens += getattr(usage, "prompt_token_count", 0) or 0
+        self.response_tokens += getattr(usage, "candidates_token_count", 0) or 0
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process and its finished children, in MB."""
+    if resource is None:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / (1024 * 1024)
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    peak_bytes = peak if sys.platform == "darwin" else peak * 1024  # ru_maxrss is bytes on macOS, KB on Linux
+    return peak_bytes / (1024 * 1024)
+
+
+def file_size(*paths) -> int:
+    """Total size in bytes of the given files (missing files count as 0)."""
+    return sum(os.path.getsize(path) for path in paths if path and os.path.isfile(path))
+
+
+def configure_tracing(trace_file: str, profile_dir: str = None, run_id: str = None) -> str:
+    """
+    Enables tracing for this process and any worker processes it starts.
+
+    Args:
+        trace_file (str): JSON lines file that every stage's span is appended to.
+        profile_dir (str): If set, the CPU-bound stages are profiled with cProfile and dumped here.
+        run_id (str): Identifier stamped on every span of this run (default: a new random one).
+
+    Returns:
+        str: The run id.
+    """
+    run_id = run_id or uuid.uuid4().hex[:12]
+    os.environ[TRACE_FILE_ENV] = trace_file
+    os.environ[RUN_ID_ENV] = run_id
+    if profile_dir:
+        os.makedirs(profile_dir, exist_ok=True)
+        os.environ[PROFILE_DIR_ENV] = profile_dir
+    else:
+        os.environ.pop(PROFILE_DIR_ENV, None)
+    return run_id
+
+
+def current_span():
+    """Returns the span of the stage running in this context, or None (e.g. tracing is off)."""
+    return _current_span.get()
+
+
+def new_span(pdf_path: str, stage: str) -> StageSpan:
+    """Creates the span of one stage of one PDF, stamped with this run's id and the current time."""
+    return StageSpan(run_id=os.environ.get(RUN_ID_ENV, ""), pdf=os.path.basename(pdf_path), stage=stage,
+                     started_at=time.time())
+
+
+def write_span(span: StageSpan):
+    """Appends a span to the trace file (does nothing when tracing is not configured)."""
+    trace_file = os.environ.get(TRACE_FILE_ENV)
+    if not trace_file:
+        return
+    directory = os.path.dirname(trace_file)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    line = json.dumps(asdict(span)) + "\n"
+    with _write_lock, open(trace_file, "a", encoding="utf-8") as f:
+        f.write(line)  # One append per line, so lines from concurrent processes don't interleave
+
+
+@contextlib.contextmanager
+def trace_stage(pdf_path: str, stage: str):
+    """
+    Measures one stage of one PDF and appends its span to the trace file.
+
+    The span is yielded so the stage can fill in what only it knows (bytes, status), and is reachable
+    through `current_span()` from code running inside the stage, including asyncio tasks it starts.
+    When tracing is not configured the span is still yielded but nothing is written.
+
+    CPU time is that of the calling thread: work the stage hands to other threads or processes isn't counted.
+    """
+    span = new_span(pdf_path, stage)
+    token = _current_span.set(span)
+
+    profile_dir = os.environ.get(PROFILE_DIR_ENV)
+    profiler = None
+    if profile_dir and stage in PROFILED_STAGES and _profiler_lock.acquire(blocking=False):
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    wall_start, cpu_start, rss_start = time.perf_counter(), time.thread_time(), peak_rss_mb()
+    try:
+        yield span
+    except BaseException as e:
+        span.status, span.error = "failed", f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        span.wall_seconds = time.perf_counter() - wall_start
+        span.cpu_seconds = time.thread_time() - cpu_start
+        span.peak_rss_growth_mb = max(0.0, peak_rss_mb() - rss_start)  # The lifetime peak can't be reset per stage
+        _current_span.reset(token)
+
+        if profiler is not None:
+            profiler.disable()
+            _profiler_lock.release()
+            if span.status == "ran":
+                base_name = os.path.splitext(span.pdf)[0]
+                profile_path = os.path.join(profile_dir, f"{base_name}_{stage}.prof")
+                profiler.dump_stats(profile_path)
+                print(f"🔬 Saved {stage} profile to {profile_path} (view with `python -m pstats {profile_path}`)")
+
+        write_span(span)
+
+
+def traced_iter(iterable, span: StageSpan):
+    """
+    Yields the items of an iterable, adding the wall and CPU time spent producing each one to `span`.
+
+    Used for stages that run lazily inside another one (e.g. parsing pages while streaming tables); each item
+    is timed on the thread that asks for it, so the iterable may be consumed from worker threads.
+    """
+    iterator = iter(iterable)
+    while True:
+        wall_start, cpu_start = time.perf_counter(), time.thread_time()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            span.wall_seconds += time.perf_counter() - wall_start
+            span.cpu_seconds += time.thread_time() - cpu_start
+        yield item
+
+
+def read_spans(trace_file: str, run_id: str = None) -> list:
+    """Reads the spans in a trace file, optionally only those of one run."""
+    if not os.path.exists(trace_file):
+        return []
+    spans = []
+    with open(trace_file, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                span = json.loads(line)
+                if run_id is None or span.get("run_id") == run_id:
+                    spans.append(span)
+    return spans
+
+
+# Span field -> (Prometheus metric name, help text)
+PROMETHEUS_COUNTERS = {
+    "wall_seconds": ("pipeline_stage_wall_seconds_total", "Wall time spent in the stage."),
+    "cpu_seconds": ("pipeline_stage_cpu_seconds_total", "CPU time spent by the threads running the stage."),
+    "bytes_in": ("pipeline_stage_bytes_in_total", "Bytes read by the stage."),
+    "bytes_out": ("pipeline_stage_bytes_out_total", "Bytes written by the stage."),
+    "llm_calls": ("pipeline_stage_llm_calls_total", "GenAI requests made by the stage."),
+    "prompt_tokens": ("pipeline_stage_prompt_tokens_total", "GenAI prompt tokens used by the stage."),
+    "response_tokens": ("pipeline_stage_response_tokens_total", "GenAI response tokens used by the stage."),
+    "cache_hits": ("pipeline_stage_cache_hits_total", "GenAI requests answered from the response cache."),
+    "retries": ("pipeline_stage_retries_total", "GenAI requests retried after a rate limit or server error."),
+    "aborted_streams": ("pipeline_stage_aborted_streams_total", "Streamed GenAI replies abandoned as stalled or unusable."),
+    "local_tables": ("pipeline_stage_local_tables_total", "Tables parsed locally without a GenAI request."),
+    "reused_tables": ("pipeline_stage_reused_tables_total",
+                      "Tables rebuilt from a near-duplicate section extracted before, without a GenAI request."),
+}
+
+
+def write_prometheus_metrics(trace_file: str, metrics_file: str, run_id: str = None) -> str:
+    """
+    Aggregates the spans of a run by stage and writes them in Prometheus text format (e.g. for the node
+    exporter's textfile collector).
+
+    Returns:
+        str: The path written.
+    """
+    totals, runs, peak_memory = {}, {}, {}
+    for span in read_spans(trace_file, run_id):
+        stage = span["stage"]
+        runs[(stage, span["status"])] = runs.get((stage, span["status"]), 0) + 1
+        peak_memory[stage] = max(peak_memory.get(stage, 0.0), span.get("peak_rss_growth_mb", 0.0))
+        for field_name in PROMETHEUS_COUNTERS:
+            totals[(field_name, stage)] = totals.get((field_name, stage), 0) + span.get(field_name, 0)
+
+    lines = ["# HELP pipeline_stage_runs_total Stage executions per PDF, by outcome.",
+             "# TYPE pipeline_stage_runs_total counter"]
+    lines += [f'pipeline_stage_runs_total{{stage="{stage}",status="{status}"}} {count}'
+              for (stage, status), count in sorted(runs.items())]
+    for field_name, (metric, help_text) in PROMETHEUS_COUNTERS.items():
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+        lines += [f'{metric}{{stage="{stage}"}} {value:g}'
+                  for (name, stage), value in sorted(totals.items()) if name == field_name]
+    lines += ["# HELP pipeline_stage_peak_rss_growth_megabytes Largest rise in the process's peak RSS during one run of the stage.",
+              "# TYPE pipeline_stage_peak_rss_growth_megabytes gauge"]
+    lines += [f'pipeline_stage_peak_rss_growth_megabytes{{stage="{stage}"}} {value:.1f}'
+              for stage, value in sorted(peak_memory.items())]
+
+    directory = os.path.dirname(metrics_file)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = metrics_file + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp_path, metrics_file)  # Collectors never read a half-written file
+    return metrics_file
@@ -0,0 +1,140 @@
+"""
+watch.py
+
+This script handles:
+- Running the pipeline as a long-lived worker that watches a folder (e.g. `pdf_inputs/` or a spool directory)
+  and processes each PDF as it lands, so module imports and GenAI client setup are paid once, not per file.
+- Moving each processed PDF to a `done/` folder, or to `failed/` with the error next to it.
+
+Folders are polled rather than watched through OS notifications, so it works the same on every platform and
+on network shares. A PDF is only picked up once its size has stopped changing between two polls, so files
+that are still being copied in are left alone.
+
+Functions:
+- warm_up(): Imports the heavy modules and creates the GenAI client pool ahead of the first PDF.
+- watch_folder(watch_dir, process_fn, ...): Processes PDFs as they arrive until interrupted.
+
+Usage:
+>>> from scripts.watch import watch_folder
+>>> watch_folder("pdf_inputs", process_financial_statement, poll_interval=5)
+"""
+
+import importlib
+import os
+import shutil
+import time
+import traceback
+
+# Loaded lazily by the pipeline; the watcher imports them up front so the first PDF doesn't wait on them
+WARM_MODULES = ("pdfplumber", "google.genai", "google.genai.types", "markdown_pdf", "pandas")
+
+
+def warm_up():
+    """Imports the heavy modules and creates the GenAI client pool, so the first PDF starts as fast as the rest."""
+    start = time.perf_counter()
+    for module in WARM_MODULES:
+        try:
+            importlib.import_module(module)
+        except ImportError as e:
+            print(f"⚠️ Could not preload {module}: {e}")
+    try:
+        from scripts.config import get_genai_client
+        get_genai_client()
+    except ValueError as e:  # No API key yet; the first PDF will report it
+        print(f"⚠️ {e}")
+    print(f"🔥 Warmed up in {time.perf_counter() - start:.1f}s.")
+
+
+def _unique_path(directory: str, filename: str) -> str:
+    """A path in `directory` for `filename` that doesn't overwrite an existing file (adds a timestamp if needed)."""
+    path = os.path.join(directory, filename)
+    if not os.path.exists(path):
+        return path
+    base, ext = os.path.splitext(filename)
+    return os.path.join(directory, f"{base}_{time.strftime('%Y%m%d-%H%M%S')}{ext}")
+
+
+def _pending_pdfs(watch_dir: str, sizes: dict) -> list:
+    """
+    Returns the PDFs in `watch_dir` whose size hasn't changed since the previous poll.
+
+    `sizes` carries each file's last seen size from one poll to the next.
+    """
+    ready, seen = [], {}
+    for filename in sorted(os.listdir(watch_dir)):
+        path = os.path.join(watch_dir, filename)
+        if not filename.lower().endswith(".pdf") or not os.path.isfile(path):
+            continue
+        try:
+            size = os.path.getsize(path)
+        except OSError:  # Moved away between listdir and getsize
+            continue
+        seen[path] = size
+        if sizes.get(path) == size and size > 0:
+            ready.append(path)
+    sizes.clear()
+    sizes.update(seen)
+    return ready
+
+
+def watch_folder(watch_dir: str, process_fn, poll_interval: float = 5.0, done_dir: str = None,
+                 failed_dir: str = None, once: bool = False, on_processed=None):
+    """
+    Processes PDFs as they arrive in `watch_dir` until interrupted (Ctrl+C).
+
+    Args:
+        watch_dir (str): Folder to watch for new PDFs.
+        process_fn (callable): `process_fn(pdf_path)`, e.g. `process_financial_statement`.
+        poll_interval (float): Seconds between folder scans.
+        done_dir (str): Where processed PDFs are moved (default: `<watch_dir>/done`).
+        failed_dir (str): Where PDFs that raised are moved, with a `.error.txt` (default: `<watch_dir>/failed`).
+        once (bool): Stop once the folder has been drained instead of waiting for more PDFs.
+        on_processed (callable): Optional `on_processed(pdf_path, ok)` called after each PDF.
+
+    Returns:
+        dict: {"done": count, "failed": count}
+    """
+    done_dir = done_dir or os.path.join(watch_dir, "done")
+    failed_dir = failed_dir or os.path.join(watch_dir, "failed")
+    os.makedirs(done_dir, exist_ok=True)
+    os.makedirs(failed_dir, exist_ok=True)
+
+    counts = {"done": 0, "failed": 0}
+    sizes = {}
+    print(f"👀 Watching {watch_dir} for PDFs (every {poll_interval:g}s, Ctrl+C to stop)...")
+
+    try:
+        while True:
+            ready = _pending_pdfs(watch_dir, sizes)
+            for pdf_path in ready:
+                filename = os.path.basename(pdf_path)
+                start = time.perf_counter()
+                try:
+                    process_fn(pdf_path)
+                except Exception as e:
+                    counts["failed"] += 1
+                    destination = _unique_path(failed_dir, filename)
+                    shutil.move(pdf_path, destination)
+                    with open(destination + ".error.txt", "w", encoding="utf-8") as f:
+                        f.write(traceback.format_exc())
+                    print(f"❌ {filename} failed ({type(e).__name__}: {e}), moved to {destination}")
+                    ok = False
+                else:
+                    counts["done"] += 1
+                    destination = _unique_path(done_dir, filename)
+                    shutil.move(pdf_path, destination)
+                    print(f"📦 {filename} done in {time.perf_counter() - start:.1f}s, moved to {destination}")
+                    ok = True
+                sizes.pop(pdf_path, None)
+                if on_processed is not None:
+                    on_processed(pdf_path, ok)
+
+            # A file seen for the first time needs one more poll to prove it has finished copying
+            if once and not ready and not sizes:
+                break
+            time.sleep(poll_interval)
+    except KeyboardInterrupt:
+        print("\n🛑 Stopped watching.")
+
+    print(f"✅ Watcher processed {counts['done']} PDFs ({counts['failed']} failed).")
+    return counts
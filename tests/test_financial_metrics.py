@@ -0,0 +1,37 @@
+"""
+Tests for the locally computed metrics and the compact summary prompt (`scripts/financial_metrics.py`).
+"""
+
+import os
+
+from scripts.financial_metrics import build_compact_prompt, select_key_rows
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_DATA = os.path.join(ROOT, "data", "fwc_sample_financial_statement_1")
+
+BALANCE_SHEET = """,Last Year,Previous Year
+Current Assets,,
+Cash,100,90
+Receivables,50,40
+Total,150,130
+Non-Current Assets,,
+Buildings,700,650
+Total,700,650
+"""
+
+
+def test_repeated_total_labels_are_prefixed_with_their_group(tmp_path):
+    (tmp_path / "balance_sheet.csv").write_text(BALANCE_SHEET, encoding="utf-8")
+
+    _, rows = select_key_rows(str(tmp_path))["balance_sheet"]
+    assert [(group, label) for group, label, _ in rows] == [("Current Assets", "Total"), ("Non-Current Assets", "Total")]
+
+    prompt = build_compact_prompt(str(tmp_path))
+    assert '"Current Assets > Total",150,130' in prompt
+    assert '"Non-Current Assets > Total",700,650' in prompt
+
+
+def test_sample_cash_flow_totals_name_their_activity():
+    _, rows = select_key_rows(SAMPLE_DATA)["statement_of_cash_flows"]
+    received = [group for group, label, _ in rows if label == "Total Cash Received"]
+    assert received == ["CASH FLOWS FROM OPERATING ACTIVITIES", "INVESTING ACTIVITIES", "FINANCING ACTIVITIES"]
@@ -0,0 +1,57 @@
+"""
+Tests for handing a job to another worker when its lease runs out (`scripts/job_queue.py`), with leases short
+enough to expire within the test.
+"""
+
+import sqlite3
+import threading
+import time
+
+from scripts.job_queue import JobQueue, check_lease, run_worker
+
+LEASE_SECONDS = 0.5
+STAGES = 6
+STAGE_SECONDS = 0.2  # A stalled worker's job outlives its lease part way through
+
+
+def stage_writer(worker, writes, lock):
+    """A process_fn that writes one output per stage, checking its lease first as the pipeline does."""
+    def process(pdf_path):
+        for stage in range(STAGES):
+            check_lease()
+            with lock:
+                writes.append((worker, stage, time.monotonic()))
+            time.sleep(STAGE_SECONDS)
+    return process
+
+
+def unreachable(job_id, worker):
+    raise sqlite3.OperationalError("disk I/O error")
+
+
+def test_reclaimed_job_is_not_processed_twice_at_once(tmp_path):
+    path = str(tmp_path / "jobs.sqlite")
+    JobQueue(path, lease_seconds=LEASE_SECONDS).enqueue([str(tmp_path / "a.pdf")])
+    writes, lock = [], threading.Lock()
+
+    # Worker A's heartbeats can't get through (e.g. the shared filesystem is unreachable), so its lease runs out
+    # while it is still working
+    stalled = JobQueue(path, lease_seconds=LEASE_SECONDS)
+    stalled.heartbeat = unreachable
+    worker_a = threading.Thread(target=run_worker, args=(stalled, stage_writer("a", writes, lock)),
+                                kwargs={"worker": "a", "poll_interval": 0.05, "until_empty": True})
+    worker_a.start()
+    time.sleep(LEASE_SECONDS + 0.1)
+
+    queue_b = JobQueue(path, lease_seconds=LEASE_SECONDS)
+    claimed_at = time.monotonic()
+    counts = run_worker(queue_b, stage_writer("b", writes, lock), worker="b", poll_interval=0.05, until_empty=True)
+    worker_a.join(timeout=10)
+
+    assert counts == {"done": 1, "failed": 0}
+    assert queue_b.status()["counts"]["done"] == 1
+    assert [stage for worker, stage, _ in writes if worker == "b"] == list(range(STAGES))
+    a_writes = [at for worker, _, at in writes if worker == "a"]
+    assert 0 < len(a_writes) < STAGES  # A stopped part way through ...
+    assert max(a_writes) < claimed_at  # ... and wrote nothing once B had the job
+
@@ -0,0 +1,118 @@
+"""
+Tests for rebuilding near-duplicate sections' tables from a previous extraction (`scripts/section_index.py`),
+using the sample statement PDF's sections and the CSVs extracted from it in `data/`.
+"""
+
+import csv
+import io
+import os
+
+import pytest
+
+from scripts.generate_tables import _merge_diff_replies, _row_count
+from scripts.preprocess_data import clean_text, extract_full_text, split_into_sections_regex
+from scripts.section_index import _plan
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_PDF = os.path.join(ROOT, "pdf_inputs", "fwc_sample_financial_statement 1.pdf")
+SAMPLE_DATA = os.path.join(ROOT, "data", "fwc_sample_financial_statement_1")
+STATEMENTS = ["statement_of_comprehensive_income", "statement_of_financial_position",
+              "statement_of_changes_in_equity", "statement_of_cash_flows"]  # In section order
+
+# The changes in equity statement as GenAI extracts it when the wrapped "Closing balance as at" labels are joined
+EQUITY_CSV = """Item,Asset Revaluation Reserve,Retained Earnings,Total
+Balance as at 1 July previous year,0,6186000,5209000
+Revaluation increment,342000,0,342000
+Profit for the year,0,1367000,1367000
+Closing balance as at 30 June previous year,342000,6576000,6918000
+Revaluation increment,0,0,0
+Profit for the year,0,529000,529000
+Closing balance as at 30 June last year,342000,7105000,7447000"""
+
+
+def rows(csv_data):
+    return [row for row in csv.reader(io.StringIO(csv_data)) if row]
+
+
+def stored_table(name):
+    with open(os.path.join(SAMPLE_DATA, f"{name}.csv"), "r", encoding="utf-8") as f:
+        return f.read()
+
+
+@pytest.fixture(scope="module")
+def sections():
+    return dict(zip(STATEMENTS, split_into_sections_regex(clean_text(extract_full_text(SAMPLE_PDF)))))
+
+
+@pytest.mark.parametrize("name", ["statement_of_comprehensive_income", "statement_of_financial_position",
+                                  "statement_of_cash_flows"])
+def test_unchanged_section_rebuilds_the_stored_table(sections, name):
+    csv_data = stored_table(name)
+    plan = _plan(sections[name], 1.0, sections[name], name, csv_data)
+
+    assert plan is not None
+    assert plan.changed_lines == []
+    assert rows(plan.merge([]))[1:] == rows(csv_data)[1:]
+    assert _row_count(plan.merge([])) == plan.expected_rows
+
+
+def test_changed_amounts_are_placed_in_their_rows(sections):
+    name = "statement_of_comprehensive_income"
+    old_text = sections[name]
+    new_text = (old_text.replace("Interest 251,000 231,000", "Interest 260,000 251,000")
+                        .replace("Total revenue 7,797,000 7,701,000", "Total revenue 7,806,000 7,721,000"))
+    plan = _plan(new_text, 0.9, old_text, name, stored_table(name))
+
+    assert plan is not None and plan.changed_lines == []
+    merged = {row[0]: row[1:] for row in rows(plan.merge([]))}
+    assert merged["Interest"] == ["260000", "251000"]
+    assert merged["Total revenue"] == ["7806000", "7721000"]
+    assert merged["Membership subscriptions"] == ["6748000", "6571000"]
+
+
+def test_edited_line_is_sent_as_a_diff_prompt_and_merged_back(sections):
+    name = "statement_of_comprehensive_income"
+    old_text = sections[name]
+    new_text = old_text.replace("Legal costs 4F 296,000 62,000", "Legal and advisory costs 4F 296,000 62,000")
+    plan = _plan(new_text, 0.9, old_text, name, stored_table(name))
+
+    assert [text for _, text in plan.changed_lines] == ["Legal and advisory costs 4F 296,000 62,000"]
+    assert "Legal and advisory costs 4F 296,000 62,000" in plan.diff_prompt()
+    merged = rows(plan.merge([["Legal and advisory costs", "296000", "62000"]]))
+    labels = [row[0] for row in merged]
+    assert labels.index("Legal and advisory costs") == labels.index("Administration expenses") + 1
+    assert len(merged) - 1 == plan.expected_rows
+
+
+def test_merge_missing_rows_is_extracted_in_full(sections):
+    name = "statement_of_comprehensive_income"
+    old_text = sections[name]
+    new_text = old_text.replace("Legal costs 4F 296,000 62,000", "Legal and advisory costs 4F 296,000 62,000")
+    plan = _plan(new_text, 0.9, old_text, name, stored_table(name))
+
+    # A reply with just the columns would leave the table one row short
+    tables_per_section = {0: [(name, ",Last Year,Previous Year")]}
+    assert _merge_diff_replies({0: plan}, tables_per_section) == [0]
+
+
+def test_stored_table_without_labels_is_not_reused(sections):
+    # The stored CSV has no label column, so its rows can't be traced back to the text; a label like "0"
+    # must not be matched to "For the year ended 30 June"
+    name = "statement_of_changes_in_equity"
+    assert _plan(sections[name], 1.0, sections[name], "Statement of changes in equity", stored_table(name)) is None
+
+
+def test_wrapped_labels_are_traced_over_both_lines(sections):
+    name = "statement_of_changes_in_equity"
+    old_text = sections[name]
+    new_text = (old_text.replace("Profit for the year - 529,000 529,000", "Profit for the year - 600,000 600,000")
+                        .replace("Closing balance as at 342,000 7,105,000 7,447,000",
+                                 "Closing balance as at 342,000 7,176,000 7,518,000"))
+    plan = _plan(new_text, 0.9, old_text, "Statement of changes in equity", EQUITY_CSV)
+
+    assert plan is not None and plan.changed_lines == []
+    merged = rows(plan.merge([]))
+    assert merged[1:4] == rows(EQUITY_CSV)[1:4]
+    assert merged[4] == ["Closing balance as at 30 June previous year", "342000", "6576000", "6918000"]
+    assert merged[6] == ["Profit for the year", "0", "600000", "600000"]
+    assert merged[7] == ["Closing balance as at 30 June last year", "342000", "7176000", "7518000"]
@@ -0,0 +1,38 @@
+"""
+Tests for writing tables to the columnar statement store (`scripts/statement_store.py`) and querying them back
+(`scripts/statement_query.py`).
+"""
+
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from scripts.statement_query import list_companies, load_store, query_line_item
+from scripts.statement_store import partition_value, write_statement
+
+BALANCE_SHEET = """,Last Year,Previous Year
+Current Assets,,
+Cash and cash equivalents,"3,093,000","4,955,000"
+Total Current Assets,4029000,5564000
+TOTAL ASSETS,16444000,7843000"""
+
+
+def test_company_with_spaces_and_punctuation_round_trips(tmp_path):
+    company = "Acme Pty. Ltd (FY 2024)"
+    write_statement(company, "Statement of financial position", BALANCE_SHEET, root=str(tmp_path))
+
+    assert list_companies(str(tmp_path)) == [partition_value(company)]
+    result = query_line_item("Total Assets", root=str(tmp_path), companies=[company])
+    assert result.loc[(partition_value(company), partition_value("Statement of financial position"))].tolist() == \
+        [16444000.0, 7843000.0]
+
+    rows = load_store(str(tmp_path), companies=[company], statements=["Statement of financial position"])
+    assert sorted(rows["value"]) == [3093000.0, 4029000.0, 4955000.0, 5564000.0, 7843000.0, 16444000.0]
+
+
+def test_other_companies_are_filtered_out(tmp_path):
+    write_statement("Acme Pty. Ltd", "balance_sheet", BALANCE_SHEET, root=str(tmp_path))
+    write_statement("Other Co", "balance_sheet", BALANCE_SHEET, root=str(tmp_path))
+
+    rows = load_store(str(tmp_path), companies=["Other Co"])
+    assert set(rows["company"]) == {partition_value("Other Co")}